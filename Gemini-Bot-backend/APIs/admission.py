@@ -0,0 +1,173 @@
+"""
+Admission control for the Gemini-bound bot views.
+
+Each worker admits at most ADMISSION_MAX_IN_FLIGHT requests at a time. A request
+that finds no free slot waits only if its estimated queue wait (queue position x
+recent service time / slots) fits its priority class's wait budget; otherwise it is
+rejected at once with 503 and a Retry-After computed from the same estimate, instead
+of sitting in the gunicorn backlog until the client times out. This only works if
+the worker has more threads than slots: a request can only be queued or shed by a
+thread that picked it up. Under gunicorn (GUNICORN_THREADS, see gunicorn.conf.py)
+ADMISSION_MAX_IN_FLIGHT is therefore capped one below the thread count.
+
+Priority classes: lower classes may only use part of the slots and have shorter
+wait budgets, and a freed slot always goes to the highest-priority waiter, so
+interactive chat keeps flowing while PDF and batch work is shed first.
+"""
+
+import functools
+import logging
+import math
+import threading
+import time
+from typing import Dict, NamedTuple, Optional
+
+from decouple import config
+from rest_framework.response import Response
+
+from APIs.metrics import ADMISSION_DECISIONS, ADMISSION_WAIT, tag_outcome
+
+
+ADMISSION_CONTROL = config("ADMISSION_CONTROL", default=True, cast=bool)
+ADMISSION_MAX_IN_FLIGHT = config("ADMISSION_MAX_IN_FLIGHT", default=8, cast=int)
+# Set by gunicorn.conf.py; 0 when not running under gunicorn.
+GUNICORN_THREADS = config("GUNICORN_THREADS", default=0, cast=int)
+ADMISSION_MAX_WAIT = config("ADMISSION_MAX_WAIT", default=15.0, cast=float)
+# Service time assumed until real requests have been measured.
+ADMISSION_INITIAL_SERVICE_TIME = config("ADMISSION_INITIAL_SERVICE_TIME", default=8.0, cast=float)
+ADMISSION_MAX_RETRY_AFTER = config("ADMISSION_MAX_RETRY_AFTER", default=60, cast=int)
+
+
+logger = logging.getLogger(__name__)
+
+
+def max_in_flight_for(threads: int, configured: int = ADMISSION_MAX_IN_FLIGHT) -> int:
+    """Slots per worker: the configured value, kept below the worker's thread count if known."""
+    if threads and configured >= threads:
+        capped = max(1, threads - 1)
+        logger.warning(
+            "ADMISSION_MAX_IN_FLIGHT=%s leaves no thread to queue or shed requests with %s threads; using %s.",
+            configured, threads, capped,
+        )
+        return capped
+    return configured
+
+
+class PriorityClass(NamedTuple):
+    rank: int            # lower wins
+    slot_share: float    # fraction of ADMISSION_MAX_IN_FLIGHT the class may occupy
+    wait_share: float    # fraction of ADMISSION_MAX_WAIT the class may queue for
+
+
+PRIORITY_CLASSES: Dict[str, PriorityClass] = {
+    "interactive": PriorityClass(0, 1.0, 1.0),   # /chat/
+    "standard": PriorityClass(1, 0.75, 0.5),     # /image/
+    "bulk": PriorityClass(2, 0.5, 0.0),          # /pdf/, batch work
+}
+
+
+class Rejected(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__(f"Overloaded; retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        *,
+        max_in_flight: int = ADMISSION_MAX_IN_FLIGHT,
+        max_wait: float = ADMISSION_MAX_WAIT,
+        initial_service_time: float = ADMISSION_INITIAL_SERVICE_TIME,
+        alpha: float = 0.2,
+    ):
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_wait = max_wait
+        self.service_time = initial_service_time
+        self.alpha = alpha
+        self.in_flight = 0
+        self._waiting = {name: 0 for name in PRIORITY_CLASSES}
+        self._cond = threading.Condition()
+
+    def _slots(self, priority: str) -> int:
+        return max(1, int(self.max_in_flight * PRIORITY_CLASSES[priority].slot_share))
+
+    def _can_start(self, priority: str) -> bool:
+        rank = PRIORITY_CLASSES[priority].rank
+        if any(n and PRIORITY_CLASSES[p].rank < rank for p, n in self._waiting.items()):
+            return False
+        return self.in_flight < self._slots(priority)
+
+    def estimated_wait(self, priority: str) -> float:
+        """Seconds until a new request of this class would start, at the recent service time."""
+        rank = PRIORITY_CLASSES[priority].rank
+        ahead = sum(n for p, n in self._waiting.items() if PRIORITY_CLASSES[p].rank <= rank)
+        excess = self.in_flight + ahead + 1 - self._slots(priority)
+        return max(0.0, excess) * self.service_time / self._slots(priority)
+
+    def _retry_after(self, wait: float) -> int:
+        return max(1, min(ADMISSION_MAX_RETRY_AFTER, math.ceil(wait)))
+
+    def acquire(self, priority: str) -> float:
+        """Take a slot, waiting within the class budget; returns seconds waited or raises Rejected."""
+        with self._cond:
+            if self._can_start(priority):
+                self.in_flight += 1
+                return 0.0
+            wait = self.estimated_wait(priority)
+            budget = self.max_wait * PRIORITY_CLASSES[priority].wait_share
+            if wait > budget:
+                raise Rejected(self._retry_after(wait))
+            start = time.monotonic()
+            deadline = start + budget
+            self._waiting[priority] += 1
+            try:
+                while not self._can_start(priority):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise Rejected(self._retry_after(self.estimated_wait(priority)))
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting[priority] -= 1
+                # A higher-priority waiter leaving may unblock lower ones.
+                self._cond.notify_all()
+            self.in_flight += 1
+            return time.monotonic() - start
+
+    def release(self, service_time: Optional[float] = None) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            if service_time is not None:
+                self.service_time = self.alpha * service_time + (1 - self.alpha) * self.service_time
+            self._cond.notify_all()
+
+
+controller = AdmissionController(max_in_flight=max_in_flight_for(GUNICORN_THREADS))
+
+
+def admission_control(priority: str):
+    """Admit the view through the worker's AdmissionController; place below @track_request."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not ADMISSION_CONTROL:
+                return view(request, *args, **kwargs)
+            try:
+                waited = controller.acquire(priority)
+            except Rejected as e:
+                ADMISSION_DECISIONS.labels(priority, "shed").inc()
+                response = Response(
+                    {"generated_text": f"Service is busy. Please retry in {e.retry_after} seconds."},
+                    status=503,
+                    headers={"Retry-After": str(e.retry_after)},
+                )
+                return tag_outcome(response, "shed")
+            ADMISSION_DECISIONS.labels(priority, "queued" if waited else "admitted").inc()
+            ADMISSION_WAIT.labels(priority).observe(waited)
+            start = time.perf_counter()
+            try:
+                return view(request, *args, **kwargs)
+            finally:
+                controller.release(time.perf_counter() - start)
+        return wrapper
+    return decorator
@@ -0,0 +1,126 @@
+"""
+Response compression (brotli when installed, gzip otherwise) for API responses.
+
+Unlike django.middleware.gzip, strong ETags stay strong: each encoding gets its own
+validator ("<etag>-br", "<etag>-gzip"), and the suffix is stripped from incoming
+If-None-Match headers so views compare against the uncompressed representation.
+"""
+
+import gzip
+import re
+import zlib
+
+from decouple import config
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+
+COMPRESSION_MIN_BYTES = config("COMPRESSION_MIN_BYTES", default=512, cast=int)
+GZIP_LEVEL = config("GZIP_LEVEL", default=6, cast=int)
+# 4-6 is the usual range for on-the-fly brotli; 11 is meant for static assets.
+BROTLI_QUALITY = config("BROTLI_QUALITY", default=5, cast=int)
+
+_ENCODING_SUFFIX_RE = re.compile(r'-(br|gzip)"')
+_ACCEPT_ENCODING_RE = re.compile(r"\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?\s*")
+
+
+def accepted_encodings(header: str) -> dict:
+    """Map of coding -> q-value from an Accept-Encoding header."""
+    accepted = {}
+    for part in (header or "").split(","):
+        m = _ACCEPT_ENCODING_RE.fullmatch(part)
+        if not m:
+            continue
+        try:
+            accepted[m.group(1).lower()] = float(m.group(2)) if m.group(2) else 1.0
+        except ValueError:
+            continue
+    return accepted
+
+
+def choose_encoding(header: str):
+    accepted = accepted_encodings(header)
+    wildcard = accepted.get("*", 0.0)
+    candidates = (["br"] if brotli is not None else []) + ["gzip"]
+    best, best_q = None, 0.0
+    for coding in candidates:
+        q = accepted.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def _compress_stream(chunks, encoding: str):
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        for chunk in chunks:
+            out = compressor.process(chunk)
+            if out:
+                yield out
+            # Flush per chunk so long-running streams reach the client incrementally.
+            out = compressor.flush()
+            if out:
+                yield out
+        yield compressor.finish()
+        return
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        out = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    def process_request(self, request):
+        inm = request.META.get("HTTP_IF_NONE_MATCH")
+        if inm:
+            m = _ENCODING_SUFFIX_RE.search(inm)
+            request.etag_encoding = m.group(1) if m else None
+            request.META["HTTP_IF_NONE_MATCH"] = _ENCODING_SUFFIX_RE.sub('"', inm)
+
+    def process_response(self, request, response):
+        if response.status_code == 304:
+            # A 304 must carry the validator of the representation the client holds.
+            patch_vary_headers(response, ("Accept-Encoding",))
+            encoding = getattr(request, "etag_encoding", None)
+            etag = response.get("ETag")
+            if encoding and etag and etag.startswith('"'):
+                response.headers["ETag"] = f'{etag[:-1]}-{encoding}"'
+            return response
+        if response.has_header("Content-Encoding") or getattr(response, "is_async", False):
+            return response
+        if not response.streaming and len(response.content) < COMPRESSION_MIN_BYTES:
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        encoding = choose_encoding(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = _compress_stream(response.streaming_content, encoding)
+            del response.headers["Content-Length"]
+        else:
+            compressed = compress(response.content, encoding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers["Content-Length"] = str(len(compressed))
+
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = f'{etag[:-1]}-{encoding}"'
+        response.headers["Content-Encoding"] = encoding
+        return response
@@ -1,12 +1,14 @@
 import logging
 import os
+import threading
 import time
+from typing import List, Optional
 
 from decouple import config
-from google import genai
 
-
-MODEL_NAME = "gemini-3-flash-preview"
+from APIs.metrics import GEMINI_CALL_LATENCY, GEMINI_MODEL_SELECTIONS, GEMINI_RETRIES
+from APIs.model_router import ENDPOINT_CLASSES, GEMINI_TEXT_MODEL, router
+from usage.tracking import record_usage
 
 
 logger = logging.getLogger(__name__)
@@ -15,7 +17,30 @@ _api_key = config("GEMINI_API_KEY", default=None)
 if _api_key and not os.environ.get("GOOGLE_API_KEY"):
     os.environ["GOOGLE_API_KEY"] = _api_key
 
-client = genai.Client()
+# Point at a different endpoint (e.g. benchmarks/fake_gemini.py) without touching the views.
+GEMINI_BASE_URL = config("GEMINI_BASE_URL", default=None)
+
+# Built on first use by get_client(): importing google.genai is the slowest part of worker boot,
+# and a missing key should fail the request that needs it rather than the import.
+# Tests and benchmarks may assign their own client here.
+client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    global client
+    if client is None:
+        with _client_lock:
+            if client is None:
+                from google import genai
+
+                from APIs.http_transport import build_httpx_client
+
+                http_options = {"httpx_client": build_httpx_client()}
+                if GEMINI_BASE_URL:
+                    http_options["base_url"] = GEMINI_BASE_URL
+                client = genai.Client(http_options=http_options)
+    return client
 
 
 def _is_transient_error(exc: Exception) -> bool:
@@ -34,18 +59,57 @@ def _is_transient_error(exc: Exception) -> bool:
     )
 
 
-def generate_content(contents, *, retries: int = 2):
+def served_model(response) -> str:
+    """Model that produced a response returned by generate_content()."""
+    return getattr(response, "model_version", None) or GEMINI_TEXT_MODEL
+
+
+def generate_content(
+    contents,
+    *,
+    generation_config=None,
+    retries: int = 2,
+    endpoint: str = "unknown",
+    request_class: Optional[str] = None,
+    session_id=None,
+    company=None,
+):
+    # The model is chosen per attempt (APIs.model_router): a throttled or unavailable model
+    # fails over to the next candidate at once, without the retry backoff.
+    request_class = request_class or ENDPOINT_CLASSES.get(endpoint, "chat")
+    failed: List[str] = []
     last_exc = None
     for attempt in range(retries + 1):
+        model, reason = router.choose(request_class, exclude=failed)
+        GEMINI_MODEL_SELECTIONS.labels(request_class, model, reason).inc()
+        start = time.perf_counter()
         try:
-            return client.models.generate_content(
-                model=MODEL_NAME,
+            response = get_client().models.generate_content(
+                model=model,
                 contents=contents,
+                config=generation_config,
             )
+            elapsed = time.perf_counter() - start
+            router.record_success(model, elapsed)
+            GEMINI_CALL_LATENCY.labels(endpoint, "ok").observe(elapsed)
+            if not getattr(response, "model_version", None):
+                response.model_version = model
+            record_usage(response, endpoint=endpoint, model=served_model(response), session_id=session_id, company=company)
+            return response
         except Exception as e:
+            transient = _is_transient_error(e)
+            GEMINI_CALL_LATENCY.labels(endpoint, "transient_error" if transient else "error").observe(time.perf_counter() - start)
             last_exc = e
-            if attempt >= retries or not _is_transient_error(e):
+            if transient:
+                failed.append(model)
+                if router.record_failure(model):
+                    logger.warning("Circuit opened for %s after repeated transient errors: %s", model, e)
+            if attempt >= retries or not transient:
                 raise
+            GEMINI_RETRIES.labels(endpoint).inc()
+            if router.has_alternative(request_class, exclude=failed):
+                logger.warning("Transient Gemini error from %s; failing over (attempt %s/%s): %s", model, attempt + 1, retries + 1, e)
+                continue
             sleep_s = 0.8 * (2 ** attempt)
             logger.warning("Transient Gemini error; retrying in %ss (attempt %s/%s): %s", sleep_s, attempt + 1, retries + 1, e)
             time.sleep(sleep_s)
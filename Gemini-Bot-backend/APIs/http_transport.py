@@ -0,0 +1,107 @@
+"""
+Pooled, keep-alive HTTP transport shared by every Gemini call in a worker.
+
+All request threads go through one httpx.Client, so connections (and their TLS
+sessions) are reused instead of being set up per call. Pool size, keep-alive and
+timeouts come from the environment; connection reuse is exported on /metrics.
+"""
+
+import threading
+
+import httpx
+from decouple import config
+
+from APIs.metrics import GEMINI_HTTP_CONNECTIONS, GEMINI_HTTP_REQUESTS, GEMINI_TLS_HANDSHAKES
+
+
+# Should be at least gunicorn's --threads so no request thread waits for a connection.
+GEMINI_POOL_MAXSIZE = config("GEMINI_POOL_MAXSIZE", default=64, cast=int)
+GEMINI_KEEPALIVE_EXPIRY = config("GEMINI_KEEPALIVE_EXPIRY", default=90.0, cast=float)
+GEMINI_CONNECT_TIMEOUT = config("GEMINI_CONNECT_TIMEOUT", default=5.0, cast=float)
+GEMINI_READ_TIMEOUT = config("GEMINI_READ_TIMEOUT", default=120.0, cast=float)
+GEMINI_WRITE_TIMEOUT = config("GEMINI_WRITE_TIMEOUT", default=30.0, cast=float)
+GEMINI_POOL_TIMEOUT = config("GEMINI_POOL_TIMEOUT", default=10.0, cast=float)
+
+
+class ConnectionStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections_opened = 0
+        self.tls_handshakes = 0
+
+    def on_request(self):
+        with self._lock:
+            self.requests += 1
+        GEMINI_HTTP_REQUESTS.inc()
+
+    def trace(self, event_name, info):
+        # httpcore trace hook; only the completion of new TCP/TLS setups is interesting here.
+        if event_name == "connection.connect_tcp.complete":
+            with self._lock:
+                self.connections_opened += 1
+            GEMINI_HTTP_CONNECTIONS.inc()
+        elif event_name == "connection.start_tls.complete":
+            with self._lock:
+                self.tls_handshakes += 1
+            GEMINI_TLS_HANDSHAKES.inc()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            reused = max(0, self.requests - self.connections_opened)
+            return {
+                "requests": self.requests,
+                "connections_opened": self.connections_opened,
+                "tls_handshakes": self.tls_handshakes,
+                "reuse_ratio": round(reused / self.requests, 4) if self.requests else 0.0,
+            }
+
+
+class _PooledTransport(httpx.HTTPTransport):
+    def __init__(self, *, timeout: httpx.Timeout, stats: ConnectionStats, **kwargs):
+        super().__init__(**kwargs)
+        self._timeout = timeout.as_dict()
+        self._stats = stats
+
+    def handle_request(self, request):
+        # The SDK passes its own per-request timeout (unbounded unless HttpOptions.timeout is set);
+        # the configured connect/read/write/pool timeouts take precedence.
+        request.extensions["timeout"] = self._timeout
+        request.extensions["trace"] = self._stats.trace
+        self._stats.on_request()
+        return super().handle_request(request)
+
+
+stats = ConnectionStats()
+
+
+def build_httpx_client(
+    *,
+    pool_maxsize: int = GEMINI_POOL_MAXSIZE,
+    keepalive_expiry: float = GEMINI_KEEPALIVE_EXPIRY,
+    keepalive: bool = True,
+    verify=True,
+    connection_stats: ConnectionStats = None,
+) -> httpx.Client:
+    timeout = httpx.Timeout(
+        connect=GEMINI_CONNECT_TIMEOUT,
+        read=GEMINI_READ_TIMEOUT,
+        write=GEMINI_WRITE_TIMEOUT,
+        pool=GEMINI_POOL_TIMEOUT,
+    )
+    limits = httpx.Limits(
+        max_connections=pool_maxsize,
+        max_keepalive_connections=pool_maxsize if keepalive else 0,
+        keepalive_expiry=keepalive_expiry,
+    )
+    transport = _PooledTransport(
+        timeout=timeout,
+        stats=connection_stats or stats,
+        limits=limits,
+        verify=verify,
+    )
+    return httpx.Client(transport=transport, timeout=timeout)
+
+
+def connection_stats() -> dict:
+    return stats.snapshot()
@@ -0,0 +1,209 @@
+"""
+Prometheus instrumentation for the Market Scout backend.
+
+When PROMETHEUS_MULTIPROC_DIR is set (see gunicorn.conf.py) every worker writes its
+samples to that directory and /metrics aggregates them; otherwise the in-process
+default registry is exported.
+
+/metrics is only served to METRICS_ALLOWED_IPS (loopback by default), to requests
+with "Authorization: Bearer <METRICS_TOKEN>", and to staff users.
+"""
+
+import functools
+import hmac
+import os
+import time
+from contextlib import contextmanager
+
+from decouple import Csv, config
+from django.http import HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+
+METRICS_ALLOWED_IPS = config("METRICS_ALLOWED_IPS", default="127.0.0.1,::1", cast=Csv())
+METRICS_TOKEN = config("METRICS_TOKEN", default="")
+
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0,
+)
+UPLOAD_BUCKETS = tuple(2 ** n for n in range(14, 26))  # 16KB .. 32MB
+
+
+REQUEST_LATENCY = Histogram(
+    "market_scout_request_duration_seconds",
+    "End-to-end latency of bot endpoints.",
+    ["endpoint", "status", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+STAGE_LATENCY = Histogram(
+    "market_scout_stage_duration_seconds",
+    "Latency of individual pipeline stages.",
+    ["endpoint", "stage"],
+    buckets=LATENCY_BUCKETS,
+)
+GEMINI_CALL_LATENCY = Histogram(
+    "market_scout_gemini_call_duration_seconds",
+    "Latency of single generate_content attempts.",
+    ["endpoint", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+GEMINI_RETRIES = Counter(
+    "market_scout_gemini_retries_total",
+    "generate_content attempts retried after a transient error.",
+    ["endpoint"],
+)
+GEMINI_MODEL_SELECTIONS = Counter(
+    "market_scout_gemini_model_selections_total",
+    "Models chosen for generate_content attempts, by request class and reason (primary, fallback, latency, circuit_open).",
+    ["request_class", "model", "reason"],
+)
+GEMINI_TOKENS = Counter(
+    "market_scout_gemini_tokens_total",
+    "Tokens reported in Gemini usage metadata.",
+    ["endpoint", "kind"],
+)
+GEMINI_HTTP_REQUESTS = Counter(
+    "market_scout_gemini_http_requests_total",
+    "HTTP requests sent to the Gemini API.",
+)
+GEMINI_HTTP_CONNECTIONS = Counter(
+    "market_scout_gemini_http_connections_opened_total",
+    "New TCP connections opened to the Gemini API (requests minus this were served on reused connections).",
+)
+GEMINI_TLS_HANDSHAKES = Counter(
+    "market_scout_gemini_tls_handshakes_total",
+    "TLS handshakes performed with the Gemini API.",
+)
+SOURCE_CACHE_LOOKUPS = Counter(
+    "market_scout_source_cache_lookups_total",
+    "Browser Agent source cache lookups by result (hit, negative_hit, miss).",
+    ["result"],
+)
+REPORT_REFRESHES = Counter(
+    "market_scout_report_refreshes_total",
+    "Chat reports by how they were produced (reuse, incremental, full).",
+    ["mode"],
+)
+TIME_LOCK_REPAIRS = Counter(
+    "market_scout_time_lock_repairs_total",
+    "Reports with pre-2026 references by outcome (repaired, section_regenerated, failed).",
+    ["outcome"],
+)
+TIME_LOCK_CALLS_SAVED = Counter(
+    "market_scout_time_lock_calls_saved_total",
+    "Full report generations avoided by repairing time-lock violations instead of refusing.",
+)
+ADMISSION_DECISIONS = Counter(
+    "market_scout_admission_decisions_total",
+    "Admission decisions for bot requests by priority class (admitted, queued, shed).",
+    ["priority", "decision"],
+)
+ADMISSION_WAIT = Histogram(
+    "market_scout_admission_wait_seconds",
+    "Time admitted requests waited for a slot.",
+    ["priority"],
+    buckets=LATENCY_BUCKETS,
+)
+RATE_LIMIT_DECISIONS = Counter(
+    "market_scout_rate_limit_decisions_total",
+    "Per-client rate limit checks by endpoint (allowed, limited).",
+    ["endpoint", "decision"],
+)
+PDF_PAGES = Counter(
+    "market_scout_pdf_pages_total",
+    "Pages of text-first PDF uploads by how they were sent (text, binary).",
+    ["mode"],
+)
+PDF_TOKENS_SAVED = Counter(
+    "market_scout_pdf_tokens_saved_total",
+    "Estimated prompt tokens saved by sending extracted text instead of whole PDFs.",
+)
+PDF_INDEX_LOOKUPS = Counter(
+    "market_scout_pdf_index_lookups_total",
+    "Per-session PDF index lookups by result (hit, miss).",
+    ["result"],
+)
+UPLOAD_BYTES = Histogram(
+    "market_scout_upload_bytes",
+    "Size of uploaded files.",
+    ["endpoint"],
+    buckets=UPLOAD_BUCKETS,
+)
+
+
+def _default_outcome(status: int) -> str:
+    if status < 400:
+        return "ok"
+    if status == 429:
+        return "rate_limited"
+    if status == 503:
+        return "transient_error"
+    if status < 500:
+        return "bad_request"
+    return "error"
+
+
+def tag_outcome(response, outcome: str):
+    # Views label responses that the status code alone cannot distinguish (refusal vs. bad input, ...).
+    response.metrics_outcome = outcome
+    return response
+
+
+def track_request(endpoint: str):
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            start = time.perf_counter()
+            response = view(request, *args, **kwargs)
+            status = getattr(response, "status_code", 500)
+            outcome = getattr(response, "metrics_outcome", None) or _default_outcome(status)
+            REQUEST_LATENCY.labels(endpoint, str(status), outcome).observe(time.perf_counter() - start)
+            return response
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def stage_timer(endpoint: str, stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.labels(endpoint, stage).observe(time.perf_counter() - start)
+
+
+def observe_upload(endpoint: str, size: int) -> None:
+    UPLOAD_BYTES.labels(endpoint).observe(size)
+
+
+def _registry():
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def _metrics_allowed(request) -> bool:
+    if request.META.get("REMOTE_ADDR") in METRICS_ALLOWED_IPS:
+        return True
+    scheme, _, token = request.META.get("HTTP_AUTHORIZATION", "").partition(" ")
+    if METRICS_TOKEN and scheme.lower() == "bearer" and hmac.compare_digest(token.strip(), METRICS_TOKEN):
+        return True
+    user = getattr(request, "user", None)
+    return bool(user is not None and user.is_active and user.is_staff)
+
+
+def metrics_view(request):
+    if not _metrics_allowed(request):
+        return HttpResponse("Forbidden", status=403, content_type="text/plain")
+    return HttpResponse(generate_latest(_registry()), content_type=CONTENT_TYPE_LATEST)
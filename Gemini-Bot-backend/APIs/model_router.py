@@ -0,0 +1,170 @@
+"""
+Per-request-class Gemini model routing with latency tracking and circuit breakers.
+
+Each request class (chat, vision, pdf, pdf_large) has an ordered list of candidate
+models: its primary model followed by GEMINI_FALLBACK_MODELS. A call goes to the
+first candidate whose circuit is closed and whose recent latency (EWMA of
+successful calls) is within the class latency budget. A model skipped for latency
+gets one probe call every GEMINI_LATENCY_PROBE_INTERVAL seconds, and the probe's
+latency replaces its EWMA, so one slow call does not demote it for good.
+GEMINI_CIRCUIT_FAILURES
+consecutive throttling/availability errors open a model's circuit for
+GEMINI_CIRCUIT_COOLDOWN seconds; the next call after the cooldown is a probe.
+
+State is kept per worker process.
+"""
+
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from decouple import Csv, config
+
+
+DEFAULT_MODEL = "gemini-3-flash-preview"
+
+GEMINI_TEXT_MODEL = config("GEMINI_TEXT_MODEL", default=DEFAULT_MODEL)
+GEMINI_VISION_MODEL = config("GEMINI_VISION_MODEL", default=GEMINI_TEXT_MODEL)
+GEMINI_PDF_MODEL = config("GEMINI_PDF_MODEL", default=GEMINI_VISION_MODEL)
+# PDFs estimated at GEMINI_PDF_LARGE_TOKENS prompt tokens or more go to the pdf_large class,
+# which has its own model and latency budget. 0 disables.
+GEMINI_PDF_LARGE_MODEL = config("GEMINI_PDF_LARGE_MODEL", default=GEMINI_PDF_MODEL)
+GEMINI_PDF_LARGE_TOKENS = config("GEMINI_PDF_LARGE_TOKENS", default=100000, cast=int)
+GEMINI_FALLBACK_MODELS = config("GEMINI_FALLBACK_MODELS", default="gemini-2.5-flash", cast=Csv())
+# "<class>=<seconds>" pairs; a model whose recent latency exceeds its class budget is skipped
+# while a faster candidate is available. 0 disables the budget.
+GEMINI_LATENCY_BUDGETS = config("GEMINI_LATENCY_BUDGETS", default="chat=20,vision=30,pdf=90,pdf_large=0", cast=Csv())
+GEMINI_CIRCUIT_FAILURES = config("GEMINI_CIRCUIT_FAILURES", default=3, cast=int)
+GEMINI_CIRCUIT_COOLDOWN = config("GEMINI_CIRCUIT_COOLDOWN", default=30.0, cast=float)
+GEMINI_LATENCY_EWMA_ALPHA = config("GEMINI_LATENCY_EWMA_ALPHA", default=0.2, cast=float)
+GEMINI_LATENCY_PROBE_INTERVAL = config("GEMINI_LATENCY_PROBE_INTERVAL", default=60.0, cast=float)
+
+# Endpoint label used by generate_content -> request class.
+ENDPOINT_CLASSES = {"chat": "chat", "chat_section": "chat", "image": "vision", "pdf": "pdf"}
+
+
+def pdf_request_class(estimated_tokens: int, *, threshold: int = GEMINI_PDF_LARGE_TOKENS) -> str:
+    return "pdf_large" if threshold and estimated_tokens >= threshold else "pdf"
+
+
+def _parse_budgets(pairs: Iterable[str]) -> Dict[str, float]:
+    budgets = {}
+    for pair in pairs:
+        name, _, seconds = pair.partition("=")
+        if name.strip() and seconds.strip():
+            budgets[name.strip()] = float(seconds)
+    return budgets
+
+
+class _ModelState:
+    __slots__ = ("ewma", "failures", "open_until", "checked_at", "probing")
+
+    def __init__(self):
+        self.ewma: Optional[float] = None
+        self.failures = 0
+        self.open_until = 0.0
+        # Time of the last success or latency probe; a probe's latency replaces the EWMA.
+        self.checked_at = 0.0
+        self.probing = False
+
+
+class ModelRouter:
+    def __init__(
+        self,
+        routes: Dict[str, List[str]],
+        *,
+        budgets: Optional[Dict[str, float]] = None,
+        failure_threshold: int = GEMINI_CIRCUIT_FAILURES,
+        cooldown: float = GEMINI_CIRCUIT_COOLDOWN,
+        alpha: float = GEMINI_LATENCY_EWMA_ALPHA,
+        probe_interval: float = GEMINI_LATENCY_PROBE_INTERVAL,
+        clock=time.monotonic,
+    ):
+        self.routes = {cls: list(dict.fromkeys(m for m in models if m)) for cls, models in routes.items()}
+        self.budgets = budgets or {}
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.alpha = alpha
+        self.probe_interval = probe_interval
+        self._clock = clock
+        self._states: Dict[str, _ModelState] = {}
+        self._lock = threading.Lock()
+
+    def _state(self, model: str) -> _ModelState:
+        state = self._states.get(model)
+        if state is None:
+            state = self._states[model] = _ModelState()
+        return state
+
+    def candidates(self, request_class: str) -> List[str]:
+        return self.routes.get(request_class) or self.routes["chat"]
+
+    def choose(self, request_class: str, *, exclude: Iterable[str] = ()) -> Tuple[str, str]:
+        """(model, reason) where reason is "primary", "fallback", "latency", "probe" or "circuit_open"."""
+        ordered = self.candidates(request_class)
+        excluded = set(exclude)
+        pool = [m for m in ordered if m not in excluded] or ordered
+        budget = self.budgets.get(request_class) or 0.0
+        with self._lock:
+            now = self._clock()
+            available = [m for m in pool if self._state(m).open_until <= now]
+            if not available:
+                # Every candidate is open: try the preferred one rather than fail without a call.
+                return pool[0], "circuit_open"
+            chosen = available[0]
+            if budget:
+                chosen = None
+                for m in available:
+                    state = self._state(m)
+                    if (state.ewma or 0.0) <= budget:
+                        chosen = m
+                        break
+                    if now - state.checked_at >= self.probe_interval:
+                        # Over budget, but not measured for a while: send this call to re-measure it.
+                        state.checked_at, state.probing = now, True
+                        return m, "probe"
+                if chosen is None:
+                    chosen = min(available, key=lambda m: self._state(m).ewma or 0.0)
+        if chosen == ordered[0]:
+            return chosen, "primary"
+        return chosen, "fallback" if chosen == available[0] else "latency"
+
+    def has_alternative(self, request_class: str, *, exclude: Iterable[str]) -> bool:
+        excluded = set(exclude)
+        with self._lock:
+            now = self._clock()
+            return any(m not in excluded and self._state(m).open_until <= now for m in self.candidates(request_class))
+
+    def record_success(self, model: str, latency: float) -> None:
+        with self._lock:
+            state = self._state(model)
+            if state.ewma is None or state.probing:
+                state.ewma = latency
+            else:
+                state.ewma = self.alpha * latency + (1 - self.alpha) * state.ewma
+            state.checked_at = self._clock()
+            state.probing = False
+            state.failures = 0
+            state.open_until = 0.0
+
+    def record_failure(self, model: str) -> bool:
+        """Count a throttling/availability error; True if it (re)opened the model's circuit."""
+        with self._lock:
+            state = self._state(model)
+            state.probing = False
+            state.failures += 1
+            if state.failures >= self.failure_threshold:
+                state.open_until = self._clock() + self.cooldown
+                return True
+            return False
+
+
+router = ModelRouter(
+    {
+        "chat": [GEMINI_TEXT_MODEL, *GEMINI_FALLBACK_MODELS],
+        "vision": [GEMINI_VISION_MODEL, *GEMINI_FALLBACK_MODELS],
+        "pdf": [GEMINI_PDF_MODEL, *GEMINI_FALLBACK_MODELS],
+        "pdf_large": [GEMINI_PDF_LARGE_MODEL, GEMINI_PDF_MODEL, *GEMINI_FALLBACK_MODELS],
+    },
+    budgets=_parse_budgets(GEMINI_LATENCY_BUDGETS),
+)
@@ -0,0 +1,179 @@
+"""
+On-demand profiling of single requests in a live worker.
+
+With PROFILING on, an admin (a staff user logged in through /admin/, or any client
+sending X-Profile-Token equal to PROFILING_TOKEN) can add the header "X-Profile: 1" or
+the query flag "?profile=1" to a request. That request then runs under cProfile and a
+stack sampler, with tracemalloc tracing its allocations, and the results are written
+to PROFILE_DIR/<id>/:
+
+  profile.prof    cProfile stats (pstats, snakeviz, gprof2dot)
+  cpu.folded      sampled stacks in collapsed format (flamegraph.pl, speedscope)
+  memory.folded   bytes still allocated at the end of the request, by allocation stack
+  memory.txt      peak traced memory and the top allocation sites
+
+The middleware sits last in MIDDLEWARE, so it covers the view, the pipeline stages
+and the Gemini client. Only the request's own thread is profiled and sampled;
+tracemalloc is process-wide, so allocations by concurrent requests show up in the
+memory files. One request per worker is profiled at a time. With PROFILING off the
+middleware removes itself at startup and costs nothing.
+"""
+
+import cProfile
+import hmac
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from typing import Dict, Tuple
+
+from decouple import config
+from django.core.exceptions import MiddlewareNotUsed
+
+
+PROFILING = config("PROFILING", default=False, cast=bool)
+PROFILING_TOKEN = config("PROFILING_TOKEN", default="")
+PROFILE_DIR = config("PROFILE_DIR", default=os.path.join(tempfile.gettempdir(), "market-scout-profiles"))
+PROFILE_SAMPLE_INTERVAL = config("PROFILE_SAMPLE_INTERVAL", default=0.005, cast=float)
+PROFILE_TRACEMALLOC_FRAMES = config("PROFILE_TRACEMALLOC_FRAMES", default=32, cast=int)
+PROFILE_TOP_ALLOCATIONS = config("PROFILE_TOP_ALLOCATIONS", default=40, cast=int)
+
+logger = logging.getLogger(__name__)
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples one thread's Python stack every `interval` seconds from a background thread."""
+
+    def __init__(self, thread_id: int, interval: float = PROFILE_SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[tuple(reversed(stack))] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def folded(self) -> str:
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.most_common())
+
+
+# The sampler's stacks and the snapshots themselves are not the request's allocations.
+_OWN_ALLOCATIONS = (tracemalloc.Filter(False, __file__), tracemalloc.Filter(False, tracemalloc.__file__))
+
+
+def _memory_reports(before: tracemalloc.Snapshot, after: tracemalloc.Snapshot, peak: int) -> Tuple[str, str]:
+    before, after = before.filter_traces(_OWN_ALLOCATIONS), after.filter_traces(_OWN_ALLOCATIONS)
+    # Growth between the start and the end of the request, grouped by allocation stack.
+    diffs = [d for d in after.compare_to(before, "traceback") if d.size_diff > 0]
+    folded = "".join(
+        f"{';'.join(f'{os.path.basename(f.filename)}:{f.lineno}' for f in reversed(d.traceback))} {d.size_diff}\n"
+        for d in diffs
+    )
+    lines = [f"peak traced memory: {peak / 1024:.1f} KiB", f"retained at end of request: {sum(d.size_diff for d in diffs) / 1024:.1f} KiB", ""]
+    lines.append(f"top {PROFILE_TOP_ALLOCATIONS} allocation sites still alive at the end of the request:")
+    for d in after.compare_to(before, "lineno")[:PROFILE_TOP_ALLOCATIONS]:
+        if d.size_diff > 0:
+            frame = d.traceback[0]
+            lines.append(f"{d.size_diff / 1024:10.1f} KiB  {d.count_diff:+8d} blocks  {frame.filename}:{frame.lineno}")
+    return folded, "\n".join(lines) + "\n"
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        if not PROFILING:
+            raise MiddlewareNotUsed("PROFILING is off")
+        self.get_response = get_response
+        self._busy = threading.Lock()
+
+    def _requested(self, request) -> bool:
+        return request.META.get("HTTP_X_PROFILE") == "1" or request.GET.get("profile") == "1"
+
+    def _authorized(self, request) -> bool:
+        token = request.META.get("HTTP_X_PROFILE_TOKEN", "")
+        if PROFILING_TOKEN and token and hmac.compare_digest(token, PROFILING_TOKEN):
+            return True
+        user = getattr(request, "user", None)
+        return bool(user is not None and user.is_active and user.is_staff)
+
+    def __call__(self, request):
+        if not self._requested(request) or not self._authorized(request):
+            return self.get_response(request)
+        if not self._busy.acquire(blocking=False):
+            response = self.get_response(request)
+            response["X-Profile"] = "busy"
+            return response
+        try:
+            return self._profile(request)
+        finally:
+            self._busy.release()
+
+    def _profile(self, request):
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(PROFILE_TRACEMALLOC_FRAMES)
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        try:
+            with StackSampler(threading.get_ident()) as sampler:
+                profiler.enable()
+                try:
+                    response = self.get_response(request)
+                finally:
+                    profiler.disable()
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            after = tracemalloc.take_snapshot()
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+
+        profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{request.path.strip('/').replace('/', '_') or 'root'}-{uuid.uuid4().hex[:8]}"
+        try:
+            self._write(profile_id, profiler, sampler, before, after, peak)
+        except OSError:
+            logger.exception("Could not write profile. path=%s", request.path)
+            return response
+        logger.info("Profiled %s in %.3fs -> %s", request.path, elapsed, os.path.join(PROFILE_DIR, profile_id))
+        response["X-Profile-Id"] = profile_id
+        return response
+
+    def _write(self, profile_id: str, profiler, sampler: StackSampler, before, after, peak: int) -> None:
+        directory = os.path.join(PROFILE_DIR, profile_id)
+        os.makedirs(directory, exist_ok=True)
+        profiler.dump_stats(os.path.join(directory, "profile.prof"))
+        memory_folded, memory_text = _memory_reports(before, after, peak)
+        files: Dict[str, str] = {
+            "cpu.folded": sampler.folded(),
+            "memory.folded": memory_folded,
+            "memory.txt": memory_text,
+        }
+        for name, content in files.items():
+            with open(os.path.join(directory, name), "w", encoding="utf-8") as f:
+                f.write(content)
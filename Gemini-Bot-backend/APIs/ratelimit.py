@@ -0,0 +1,201 @@
+"""
+Per-client rate limiting for the bot endpoints (GCRA).
+
+The Generic Cell Rate Algorithm keeps one number per client, its theoretical arrival
+time (TAT): a request of cost c is allowed if TAT + c x interval stays within the
+burst window of now, and then advances TAT by that amount. The TATs live in a small
+SQLite database in WAL mode that every gunicorn worker on the host shares, and each
+check is a single UPSERT ... RETURNING statement. A client with an API key (X-API-Key)
+listed in RATE_LIMIT_API_KEYS is limited per key and X-Session-ID, so each user of a
+trusted front end has a bucket of their own. Anything else is limited per address; an
+unverified X-Session-ID is ignored, so a new header cannot buy a new bucket. Behind a
+reverse proxy the address is read from X-Forwarded-For (RATE_LIMIT_TRUST_FORWARDED).
+Rows whose TAT has passed carry no state and are pruned every RATE_LIMIT_PRUNE_INTERVAL
+seconds.
+
+Rejections are also remembered in-process: since a TAT only ever moves forward, a
+client known to be over its limit is turned away without touching the database
+until it could possibly be allowed again.
+"""
+
+import hashlib
+import logging
+import math
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from decouple import Csv, config
+from django.core.exceptions import ImproperlyConfigured
+from django.http import JsonResponse
+
+from APIs.metrics import RATE_LIMIT_DECISIONS
+
+
+RATE_LIMIT = config("RATE_LIMIT", default=True, cast=bool)
+# Sustained rate in cost units per minute, and how many units may be spent at once.
+RATE_LIMIT_PER_MINUTE = config("RATE_LIMIT_PER_MINUTE", default=20.0, cast=float)
+RATE_LIMIT_BURST = config("RATE_LIMIT_BURST", default=10.0, cast=float)
+# "<path>=<cost>" pairs; paths not listed are not limited.
+RATE_LIMIT_COSTS = config("RATE_LIMIT_COSTS", default="/chat/=1,/image/=2,/pdf/=5", cast=Csv())
+RATE_LIMIT_DB = config("RATE_LIMIT_DB", default=os.path.join(tempfile.gettempdir(), "market-scout-ratelimit.sqlite3"))
+# Only enable behind a proxy that appends the client address to X-Forwarded-For; the entry
+# RATE_LIMIT_PROXY_HOPS places from the right is the one the outermost trusted proxy wrote.
+RATE_LIMIT_TRUST_FORWARDED = config("RATE_LIMIT_TRUST_FORWARDED", default=False, cast=bool)
+RATE_LIMIT_PROXY_HOPS = config("RATE_LIMIT_PROXY_HOPS", default=1, cast=int)
+# Keys whose sessions (X-Session-ID) get buckets of their own; any other X-API-Key is ignored.
+RATE_LIMIT_API_KEYS = config("RATE_LIMIT_API_KEYS", default="", cast=Csv())
+RATE_LIMIT_PRUNE_INTERVAL = config("RATE_LIMIT_PRUNE_INTERVAL", default=300.0, cast=float)
+
+_DENY_CACHE_MAX = 10000
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_costs(pairs) -> Dict[str, float]:
+    costs = {}
+    for pair in pairs:
+        path, _, cost = pair.rpartition("=")
+        if path.strip():
+            costs[path.strip()] = float(cost)
+    return costs
+
+
+class GCRALimiter:
+    _SCHEMA = "CREATE TABLE IF NOT EXISTS gcra (key TEXT PRIMARY KEY, tat REAL NOT NULL) WITHOUT ROWID"
+    # Insert or advance the TAT only if the request fits the burst window; no row back means rejected.
+    _CHECK = (
+        "INSERT INTO gcra (key, tat) VALUES (:key, :now + :inc) "
+        "ON CONFLICT (key) DO UPDATE SET tat = max(tat, :now) + :inc "
+        "WHERE max(tat, :now) + :inc - :now <= :window "
+        "RETURNING tat"
+    )
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        per_minute: float = RATE_LIMIT_PER_MINUTE,
+        burst: float = RATE_LIMIT_BURST,
+        prune_interval: float = RATE_LIMIT_PRUNE_INTERVAL,
+        clock=time.time,
+    ):
+        self.path = path
+        self.burst = burst
+        self.interval = 60.0 / per_minute
+        self.window = burst * self.interval
+        self.prune_interval = prune_interval
+        self._clock = clock
+        self._local = threading.local()
+        self._denied: Dict[str, float] = {}  # key -> lower bound of its TAT
+        self._next_prune = clock() + prune_interval
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=0.05, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Limiter state is disposable: losing the last writes on a power cut only forgives a few requests.
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute(self._SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """Delete rows whose TAT has passed; such a client is indistinguishable from a new one."""
+        now = self._clock() if now is None else now
+        return self._connection().execute("DELETE FROM gcra WHERE tat <= ?", (now,)).rowcount
+
+    def check(self, key: str, cost: float = 1.0) -> Tuple[bool, float]:
+        """(allowed, seconds until a request of this cost would be allowed; inf if it never will be)."""
+        if cost > self.burst:
+            return False, math.inf
+        now = self._clock()
+        if now >= self._next_prune:
+            self._next_prune = now + self.prune_interval
+            self.prune(now)
+        inc = cost * self.interval
+        known_tat = self._denied.get(key)
+        if known_tat is not None:
+            wait = max(known_tat, now) + inc - now - self.window
+            if wait > 0:
+                return False, wait
+            self._denied.pop(key, None)
+        conn = self._connection()
+        row = conn.execute(self._CHECK, {"key": key, "now": now, "inc": inc, "window": self.window}).fetchone()
+        if row is not None:
+            return True, 0.0
+        tat = conn.execute("SELECT tat FROM gcra WHERE key = ?", (key,)).fetchone()[0]
+        if len(self._denied) >= _DENY_CACHE_MAX:
+            self._denied.clear()
+        self._denied[key] = tat
+        return False, max(tat, now) + inc - now - self.window
+
+
+def _key_digest(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:32]
+
+
+_KNOWN_KEYS = frozenset(_key_digest(k.strip()) for k in RATE_LIMIT_API_KEYS if k.strip())
+
+
+def _client_addr(request) -> str:
+    addr = request.META.get("REMOTE_ADDR", "")
+    if RATE_LIMIT_TRUST_FORWARDED:
+        hops = [h.strip() for h in request.META.get("HTTP_X_FORWARDED_FOR", "").split(",") if h.strip()]
+        if hops:
+            addr = hops[-min(max(RATE_LIMIT_PROXY_HOPS, 1), len(hops))]
+            # Some proxies (Azure App Service among them) append the client port: "203.0.113.9:51234".
+            if addr.startswith("["):
+                addr = addr[1:].partition("]")[0]
+            elif addr.count(":") == 1:
+                addr = addr.partition(":")[0]
+    return addr
+
+
+def client_key(request, known_keys: frozenset = _KNOWN_KEYS) -> str:
+    api_key = request.META.get("HTTP_X_API_KEY")
+    if api_key:
+        digest = _key_digest(api_key)
+        if digest in known_keys:
+            session_id = request.META.get("HTTP_X_SESSION_ID")
+            # The key holder is trusted to name its own users; without a session the key shares one bucket.
+            return f"key:{digest}:session:{_key_digest(session_id)}" if session_id else "key:" + digest
+    return "addr:" + _client_addr(request)
+
+
+class RateLimitMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.costs = _parse_costs(RATE_LIMIT_COSTS)
+        if RATE_LIMIT:
+            too_expensive = [path for path, cost in self.costs.items() if cost > RATE_LIMIT_BURST]
+            if too_expensive:
+                raise ImproperlyConfigured(f"RATE_LIMIT_COSTS above RATE_LIMIT_BURST can never be allowed: {too_expensive}")
+        self.limiter: Optional[GCRALimiter] = GCRALimiter(RATE_LIMIT_DB) if RATE_LIMIT else None
+
+    def __call__(self, request):
+        cost = self.costs.get(request.path) if self.limiter is not None else None
+        if not cost:
+            return self.get_response(request)
+        endpoint = request.path.strip("/")
+        try:
+            allowed, wait = self.limiter.check(client_key(request), cost)
+        except sqlite3.Error:
+            # The limiter protects the quota; it must not take the API down with it.
+            logger.exception("Rate limiter unavailable; allowing request. path=%s", request.path)
+            return self.get_response(request)
+        if allowed:
+            RATE_LIMIT_DECISIONS.labels(endpoint, "allowed").inc()
+            return self.get_response(request)
+        RATE_LIMIT_DECISIONS.labels(endpoint, "limited").inc()
+        retry_after = max(1, int(wait + 0.999))
+        response = JsonResponse(
+            {"generated_text": f"Rate limit exceeded. Please retry in {retry_after} seconds."},
+            status=429,
+        )
+        response["Retry-After"] = str(retry_after)
+        return response
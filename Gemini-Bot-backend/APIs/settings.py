@@ -43,17 +43,21 @@ INSTALLED_APPS = [
     "text_bot.apps.TextBotConfig",
     "image_bot.apps.ImageBotConfig",
     "pdf_chat.apps.PdfChatConfig",
+    "usage.apps.UsageConfig",
 ]
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    "APIs.compression.CompressionMiddleware",
+    "APIs.ratelimit.RateLimitMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "APIs.profiling.ProfilingMiddleware",
 ]
 
 ROOT_URLCONF = "APIs.urls"
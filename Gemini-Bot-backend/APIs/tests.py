@@ -0,0 +1,467 @@
+import math
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from unittest import mock
+
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+
+from APIs import gemini_client
+from APIs.admission import AdmissionController, Rejected, admission_control, max_in_flight_for
+from APIs.compression import accepted_encodings, choose_encoding
+from APIs.http_transport import ConnectionStats, build_httpx_client
+from APIs.metrics import metrics_view
+from APIs.model_router import ModelRouter, pdf_request_class
+from APIs.profiling import ProfilingMiddleware
+from APIs.ratelimit import GCRALimiter, RateLimitMiddleware, _key_digest, client_key
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class GCRALimiterTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.clock = FakeClock()
+        # One unit per 6 seconds, bursts of up to 3 units.
+        self.limiter = GCRALimiter(os.path.join(self.tmp.name, "rl.sqlite3"), per_minute=10, burst=3, clock=self.clock)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_burst_then_limited(self):
+        self.assertEqual([self.limiter.check("a")[0] for _ in range(4)], [True, True, True, False])
+
+    def test_wait_until_allowed(self):
+        for _ in range(3):
+            self.limiter.check("a")
+        allowed, wait = self.limiter.check("a")
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 6.0)
+        self.clock.now += wait
+        self.assertTrue(self.limiter.check("a")[0])
+
+    def test_clients_are_independent(self):
+        for _ in range(3):
+            self.limiter.check("a")
+        self.assertFalse(self.limiter.check("a")[0])
+        self.assertTrue(self.limiter.check("b")[0])
+
+    def test_cost_counts_against_burst(self):
+        self.assertTrue(self.limiter.check("a", 2)[0])
+        self.assertFalse(self.limiter.check("a", 2)[0])
+        self.assertTrue(self.limiter.check("a", 1)[0])
+
+    def test_cost_above_burst_is_never_allowed(self):
+        self.assertEqual(self.limiter.check("fresh", 4), (False, math.inf))
+
+    def test_prune_deletes_only_expired_rows(self):
+        self.limiter.check("old")
+        self.clock.now += 60
+        self.limiter.check("new")
+        self.assertEqual(self.limiter.prune(), 1)
+        self.assertEqual([r[0] for r in self.limiter._connection().execute("SELECT key FROM gcra")], ["new"])
+
+    def test_check_prunes_periodically(self):
+        limiter = GCRALimiter(self.limiter.path, per_minute=10, burst=3, prune_interval=30, clock=self.clock)
+        limiter.check("old")
+        self.clock.now += 31
+        limiter.check("new")
+        self.assertEqual(limiter._connection().execute("SELECT count(*) FROM gcra").fetchone()[0], 1)
+
+
+class ClientKeyTests(SimpleTestCase):
+    factory = RequestFactory()
+    known = frozenset([_key_digest("k1")])
+
+    def key(self, **headers):
+        return client_key(self.factory.post("/chat/", **headers), self.known)
+
+    def test_known_api_key(self):
+        self.assertEqual(self.key(HTTP_X_API_KEY="k1"), "key:" + _key_digest("k1"))
+
+    def test_sessions_of_a_known_key_are_separate(self):
+        first = self.key(HTTP_X_API_KEY="k1", HTTP_X_SESSION_ID="s1")
+        self.assertNotEqual(first, self.key(HTTP_X_API_KEY="k1", HTTP_X_SESSION_ID="s2"))
+        self.assertEqual(first, self.key(HTTP_X_API_KEY="k1", HTTP_X_SESSION_ID="s1"))
+        self.assertTrue(first.startswith("key:" + _key_digest("k1") + ":session:"))
+
+    def test_unknown_api_key_falls_back_to_address(self):
+        self.assertEqual(self.key(HTTP_X_API_KEY="made-up", HTTP_X_SESSION_ID="s1", REMOTE_ADDR="10.0.0.5"), "addr:10.0.0.5")
+
+    def test_session_header_without_key_is_ignored(self):
+        first = self.key(HTTP_X_SESSION_ID="s1", REMOTE_ADDR="10.0.0.5")
+        self.assertEqual(first, self.key(HTTP_X_SESSION_ID="s2", REMOTE_ADDR="10.0.0.5"))
+
+    def test_forwarded_address_from_the_trusted_hop(self):
+        headers = {"REMOTE_ADDR": "10.0.0.1", "HTTP_X_FORWARDED_FOR": "1.1.1.1, 203.0.113.9:51234"}
+        self.assertEqual(self.key(**headers), "addr:10.0.0.1")
+        with mock.patch("APIs.ratelimit.RATE_LIMIT_TRUST_FORWARDED", True):
+            self.assertEqual(self.key(**headers), "addr:203.0.113.9")
+            self.assertEqual(self.key(REMOTE_ADDR="10.0.0.1", HTTP_X_FORWARDED_FOR="[2001:db8::1]:443"), "addr:2001:db8::1")
+            self.assertEqual(self.key(REMOTE_ADDR="10.0.0.1", HTTP_X_FORWARDED_FOR="2001:db8::2"), "addr:2001:db8::2")
+            with mock.patch("APIs.ratelimit.RATE_LIMIT_PROXY_HOPS", 2):
+                self.assertEqual(self.key(**headers), "addr:1.1.1.1")
+
+
+class RateLimitMiddlewareTests(SimpleTestCase):
+    factory = RequestFactory()
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.clock = FakeClock()
+        with mock.patch("APIs.ratelimit.RATE_LIMIT", True), mock.patch("APIs.ratelimit.RATE_LIMIT_DB", os.path.join(self.tmp.name, "rl.sqlite3")):
+            self.middleware = RateLimitMiddleware(lambda request: HttpResponse("ok"))
+        self.middleware.limiter = GCRALimiter(self.middleware.limiter.path, per_minute=10, burst=5, clock=self.clock)
+
+    def test_limited_requests_get_429_with_retry_after(self):
+        self.assertEqual(self.middleware(self.factory.post("/pdf/")).status_code, 200)
+        response = self.middleware(self.factory.post("/pdf/"))
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "30")
+
+    def test_unlisted_paths_are_not_limited(self):
+        for _ in range(10):
+            self.assertEqual(self.middleware(self.factory.get("/reports/apple/")).status_code, 200)
+
+    def test_limiter_errors_fail_open(self):
+        with mock.patch.object(self.middleware.limiter, "check", side_effect=sqlite3.OperationalError("locked")):
+            with self.assertLogs("APIs.ratelimit", "ERROR"):
+                self.assertEqual(self.middleware(self.factory.post("/chat/")).status_code, 200)
+
+    def test_costs_above_burst_are_rejected_at_startup(self):
+        with mock.patch("APIs.ratelimit.RATE_LIMIT", True), mock.patch("APIs.ratelimit.RATE_LIMIT_BURST", 3):
+            with self.assertRaises(ImproperlyConfigured):
+                RateLimitMiddleware(lambda request: HttpResponse("ok"))
+
+
+class AdmissionControllerTests(SimpleTestCase):
+    def test_admits_up_to_class_slots(self):
+        controller = AdmissionController(max_in_flight=4, max_wait=10, initial_service_time=1)
+        for _ in range(2):
+            self.assertEqual(controller.acquire("bulk"), 0.0)
+        # Bulk may use half the slots and never queues.
+        with self.assertRaises(Rejected):
+            controller.acquire("bulk")
+        self.assertEqual(controller.acquire("interactive"), 0.0)
+
+    def test_retry_after_from_estimate(self):
+        controller = AdmissionController(max_in_flight=2, max_wait=0, initial_service_time=10)
+        controller.acquire("interactive")
+        controller.acquire("interactive")
+        with self.assertRaises(Rejected) as raised:
+            controller.acquire("interactive")
+        self.assertEqual(raised.exception.retry_after, 5)
+
+    def test_freed_slot_goes_to_highest_priority_waiter(self):
+        controller = AdmissionController(max_in_flight=1, max_wait=10, initial_service_time=0.01)
+        controller.acquire("interactive")
+        order = []
+
+        def wait_for_slot(priority):
+            controller.acquire(priority)
+            order.append(priority)
+            controller.release()
+
+        standard = threading.Thread(target=wait_for_slot, args=("standard",))
+        standard.start()
+        while not controller._waiting["standard"]:
+            time.sleep(0.001)
+        interactive = threading.Thread(target=wait_for_slot, args=("interactive",))
+        interactive.start()
+        while not controller._waiting["interactive"]:
+            time.sleep(0.001)
+        controller.release()
+        standard.join()
+        interactive.join()
+        self.assertEqual(order, ["interactive", "standard"])
+
+    def test_release_updates_service_time(self):
+        controller = AdmissionController(max_in_flight=1, initial_service_time=10, alpha=0.5)
+        controller.acquire("interactive")
+        controller.release(2)
+        self.assertEqual(controller.service_time, 6)
+        self.assertEqual(controller.in_flight, 0)
+
+    def test_slots_stay_below_worker_threads(self):
+        self.assertEqual(max_in_flight_for(0, 8), 8)
+        self.assertEqual(max_in_flight_for(16, 8), 8)
+        with self.assertLogs("APIs.admission", "WARNING"):
+            self.assertEqual(max_in_flight_for(8, 8), 7)
+        with self.assertLogs("APIs.admission", "WARNING"):
+            self.assertEqual(max_in_flight_for(1, 8), 1)
+
+
+@api_view(["POST"])
+@admission_control("standard")
+def admitted_view(request):
+    return Response({"generated_text": "ok"})
+
+
+class AdmissionDecoratorTests(SimpleTestCase):
+    factory = RequestFactory()
+
+    def test_shed_requests_get_503_with_retry_after(self):
+        controller = AdmissionController(max_in_flight=1, max_wait=0, initial_service_time=4)
+        with mock.patch("APIs.admission.controller", controller):
+            self.assertEqual(admitted_view(self.factory.post("/chat/")).status_code, 200)
+            self.assertEqual(controller.in_flight, 0)
+            controller.acquire("interactive")
+            response = admitted_view(self.factory.post("/chat/"))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "4")
+
+
+class MetricsViewTests(SimpleTestCase):
+    factory = RequestFactory()
+
+    def test_loopback_is_allowed(self):
+        self.assertEqual(metrics_view(self.factory.get("/metrics")).status_code, 200)
+
+    def test_other_addresses_need_the_token(self):
+        with mock.patch("APIs.metrics.METRICS_TOKEN", "tok"):
+            self.assertEqual(metrics_view(self.factory.get("/metrics", REMOTE_ADDR="203.0.113.9")).status_code, 403)
+            wrong = self.factory.get("/metrics", REMOTE_ADDR="203.0.113.9", HTTP_AUTHORIZATION="Bearer nope")
+            self.assertEqual(metrics_view(wrong).status_code, 403)
+            right = self.factory.get("/metrics", REMOTE_ADDR="203.0.113.9", HTTP_AUTHORIZATION="Bearer tok")
+            self.assertEqual(metrics_view(right).status_code, 200)
+
+    def test_no_token_configured(self):
+        request = self.factory.get("/metrics", REMOTE_ADDR="203.0.113.9", HTTP_AUTHORIZATION="Bearer ")
+        self.assertEqual(metrics_view(request).status_code, 403)
+
+
+class ModelRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.router = ModelRouter(
+            {"chat": ["a", "b"], "pdf_large": ["lite", "a", "b"]},
+            budgets={"chat": 10},
+            failure_threshold=2,
+            cooldown=30,
+            alpha=0.2,
+            probe_interval=60,
+            clock=self.clock,
+        )
+
+    def test_primary_then_fallback_on_exclude(self):
+        self.assertEqual(self.router.choose("chat"), ("a", "primary"))
+        self.assertEqual(self.router.choose("chat", exclude=["a"]), ("b", "fallback"))
+        self.assertEqual(self.router.choose("unknown"), ("a", "primary"))
+
+    def test_circuit_opens_and_closes_after_cooldown(self):
+        self.assertFalse(self.router.record_failure("a"))
+        self.assertTrue(self.router.record_failure("a"))
+        self.assertEqual(self.router.choose("chat"), ("b", "fallback"))
+        self.router.record_failure("b")
+        self.router.record_failure("b")
+        self.assertEqual(self.router.choose("chat"), ("a", "circuit_open"))
+        self.clock.now += 30
+        self.assertEqual(self.router.choose("chat"), ("a", "primary"))
+
+    def test_slow_model_skipped_while_within_budget_alternative(self):
+        self.router.record_success("a", 25)
+        self.router.record_success("b", 2)
+        self.assertEqual(self.router.choose("chat"), ("b", "latency"))
+        self.router.record_success("b", 2)
+        self.assertEqual(self.router.choose("chat"), ("b", "latency"))
+
+    def test_slow_model_is_probed_and_recovers(self):
+        self.router.record_success("a", 25)
+        self.router.record_success("b", 2)
+        self.clock.now += 60
+        self.assertEqual(self.router.choose("chat"), ("a", "probe"))
+        # Only one probe per interval.
+        self.assertEqual(self.router.choose("chat"), ("b", "latency"))
+        self.router.record_success("a", 3)
+        self.assertEqual(self.router.choose("chat"), ("a", "primary"))
+
+    def test_failed_probe_waits_for_the_next_interval(self):
+        self.router.record_success("a", 25)
+        self.clock.now += 60
+        self.assertEqual(self.router.choose("chat")[1], "probe")
+        self.router.record_failure("a")
+        self.clock.now += 59
+        self.assertEqual(self.router.choose("chat"), ("b", "latency"))
+        self.clock.now += 1
+        self.assertEqual(self.router.choose("chat")[1], "probe")
+
+    def test_large_pdfs_use_the_pdf_large_class(self):
+        self.assertEqual(pdf_request_class(5000, threshold=100000), "pdf")
+        self.assertEqual(pdf_request_class(100000, threshold=100000), "pdf_large")
+        self.assertEqual(pdf_request_class(10**6, threshold=0), "pdf")
+        self.assertEqual(self.router.choose("pdf_large"), ("lite", "primary"))
+
+
+class ContentNegotiationTests(SimpleTestCase):
+    def test_accept_encoding_q_values(self):
+        self.assertEqual(accepted_encodings("gzip;q=0.5, br , *;q=0"), {"gzip": 0.5, "br": 1.0, "*": 0.0})
+        self.assertEqual(accepted_encodings("gzip;q=bad"), {})
+
+    def test_choose_encoding(self):
+        self.assertEqual(choose_encoding("gzip"), "gzip")
+        self.assertIsNone(choose_encoding("identity"))
+        self.assertIsNone(choose_encoding("gzip;q=0"))
+        with mock.patch("APIs.compression.brotli", None):
+            self.assertEqual(choose_encoding("br, gzip;q=0.1"), "gzip")
+
+
+def busy_view(request):
+    data = [str(i) * 10 for i in range(20000)]
+    time.sleep(0.02)
+    return HttpResponse(str(len(data)))
+
+
+class ProfilingMiddlewareTests(SimpleTestCase):
+    factory = RequestFactory()
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        for name, value in (("PROFILING", True), ("PROFILING_TOKEN", "tok"), ("PROFILE_DIR", self.tmp.name)):
+            patcher = mock.patch(f"APIs.profiling.{name}", value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.middleware = ProfilingMiddleware(busy_view)
+
+    def test_off_removes_itself(self):
+        with mock.patch("APIs.profiling.PROFILING", False):
+            with self.assertRaises(MiddlewareNotUsed):
+                ProfilingMiddleware(busy_view)
+
+    def test_profile_needs_the_flag_and_authorization(self):
+        self.assertNotIn("X-Profile-Id", self.middleware(self.factory.get("/chat/", HTTP_X_PROFILE_TOKEN="tok")))
+        self.assertNotIn("X-Profile-Id", self.middleware(self.factory.get("/chat/?profile=1")))
+        self.assertNotIn("X-Profile-Id", self.middleware(self.factory.get("/chat/?profile=1", HTTP_X_PROFILE_TOKEN="nope")))
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+    def test_profiled_request_writes_reports(self):
+        with self.assertLogs("APIs.profiling", "INFO"):
+            response = self.middleware(self.factory.get("/chat/", HTTP_X_PROFILE="1", HTTP_X_PROFILE_TOKEN="tok"))
+        self.assertEqual(response.content, b"20000")
+        directory = os.path.join(self.tmp.name, response["X-Profile-Id"])
+        self.assertEqual(sorted(os.listdir(directory)), ["cpu.folded", "memory.folded", "memory.txt", "profile.prof"])
+        with open(os.path.join(directory, "memory.txt"), encoding="utf-8") as f:
+            self.assertTrue(f.read().startswith("peak traced memory:"))
+
+    def test_one_profile_at_a_time(self):
+        self.middleware._busy.acquire()
+        try:
+            response = self.middleware(self.factory.get("/chat/?profile=1", HTTP_X_PROFILE_TOKEN="tok"))
+        finally:
+            self.middleware._busy.release()
+        self.assertEqual(response["X-Profile"], "busy")
+        self.assertNotIn("X-Profile-Id", response)
+
+
+class FakeModels:
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.calls = []
+
+    def generate_content(self, *, model, contents, config):
+        self.calls.append(model)
+        if self.errors:
+            raise self.errors.pop(0)
+        return SimpleNamespace(text="ok", model_version=None, usage_metadata=None)
+
+
+class GeminiClientTests(SimpleTestCase):
+    def setUp(self):
+        self.models = FakeModels()
+        for target, value in (
+            ("APIs.gemini_client.client", SimpleNamespace(models=self.models)),
+            ("APIs.gemini_client.router", ModelRouter({"chat": ["a", "b"]}, failure_threshold=5)),
+        ):
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_views_do_not_import_the_sdk(self):
+        code = (
+            "import sys, django; django.setup(); "
+            "import text_bot.views, image_bot.views, pdf_chat.views; "
+            "print('google.genai' in sys.modules, 'APIs.http_transport' in sys.modules)"
+        )
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE="APIs.settings", GEMINI_API_KEY="x")
+        result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.split(), ["False", "False"])
+
+    def test_client_is_built_once(self):
+        with mock.patch("APIs.gemini_client.client", None), mock.patch("google.genai.Client") as build:
+            first = gemini_client.get_client()
+            self.assertIs(gemini_client.get_client(), first)
+        build.assert_called_once()
+
+    def test_transient_error_fails_over_without_backoff(self):
+        self.models.errors = [RuntimeError("429 resource exhausted")]
+        with mock.patch("APIs.gemini_client.time.sleep") as sleep, self.assertLogs("APIs.gemini_client", "WARNING"):
+            response = gemini_client.generate_content(["hi"], endpoint="chat")
+        self.assertEqual(self.models.calls, ["a", "b"])
+        self.assertEqual(response.model_version, "b")
+        sleep.assert_not_called()
+
+    def test_other_errors_are_not_retried(self):
+        self.models.errors = [ValueError("bad request")]
+        with self.assertRaises(ValueError):
+            gemini_client.generate_content(["hi"], endpoint="chat")
+        self.assertEqual(self.models.calls, ["a"])
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+class PooledTransportTests(SimpleTestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/"
+
+    def fetch(self, n, **kwargs):
+        stats = ConnectionStats()
+        with build_httpx_client(connection_stats=stats, **kwargs) as client:
+            for _ in range(n):
+                self.assertEqual(client.get(self.url).text, "ok")
+        return stats.snapshot()
+
+    def test_connections_are_reused(self):
+        self.assertEqual(self.fetch(5), {"requests": 5, "connections_opened": 1, "tls_handshakes": 0, "reuse_ratio": 0.8})
+
+    def test_without_keepalive_every_call_connects(self):
+        self.assertEqual(self.fetch(3, keepalive=False)["connections_opened"], 3)
+
+    def test_configured_timeouts_override_the_callers(self):
+        seen = []
+        stats = ConnectionStats()
+        with build_httpx_client(connection_stats=stats) as client:
+            client.event_hooks["request"] = [lambda request: seen.append(request)]
+            client.get(self.url, timeout=None)
+        self.assertIsNotNone(seen[0].extensions["timeout"]["read"])
@@ -0,0 +1,29 @@
+"""
+Optional warm-up for preloaded gunicorn masters (GUNICORN_PRELOAD=True).
+
+Everything done here happens once in the master; forked workers inherit the imported
+modules, resolved URLconf and constructed Gemini client copy-on-write instead of
+paying for them on their first request. No network connections are opened, so the
+inherited client is safe to use after fork.
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up():
+    from django.urls import get_resolver
+
+    from APIs import gemini_client
+
+    # Imports every view module (and their helpers) through the URLconf.
+    get_resolver().url_patterns
+
+    from google.genai import types  # noqa: F401
+
+    try:
+        gemini_client.get_client()
+    except Exception:
+        # Workers will retry lazily; a missing key should not stop the server from booting.
+        logger.exception("Could not build the Gemini client during warm-up")
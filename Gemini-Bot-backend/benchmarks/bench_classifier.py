@@ -0,0 +1,46 @@
+"""
+Prompt classifier scaling: one trie-compiled regex vs. a per-marker substring scan.
+
+  pytest benchmarks/bench_classifier.py
+"""
+
+import json
+
+import pytest
+
+import corpus
+from text_bot.classifier import MarkerClassifier
+
+
+@pytest.fixture(scope="module")
+def prompt_2k():
+    return corpus.long_prompt(2000)
+
+
+@pytest.fixture(scope="module", params=[100, 5000])
+def marker_lists(request):
+    words = corpus.markers(request.param)
+    half = len(words) // 2
+    return {"harmful": words[:half], "unrelated": words[half:]}
+
+
+@pytest.fixture(scope="module")
+def classifier(tmp_path_factory, marker_lists):
+    path = tmp_path_factory.mktemp("markers") / "prompt_markers.json"
+    path.write_text(json.dumps(marker_lists))
+    return MarkerClassifier(str(path))
+
+
+def bench_classifier(benchmark, classifier, prompt_2k):
+    assert benchmark(classifier.classify, prompt_2k) == frozenset()
+
+
+def bench_linear_substring_scan(benchmark, marker_lists, prompt_2k):
+    # The previous implementation, kept as a reference point.
+    flat = marker_lists["harmful"] + marker_lists["unrelated"]
+
+    def scan(text):
+        p = text.lower()
+        return any(m in p for m in flat)
+
+    assert benchmark(scan, prompt_2k) is False
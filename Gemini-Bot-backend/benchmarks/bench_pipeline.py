@@ -0,0 +1,72 @@
+"""
+Micro-benchmarks for the per-request text pipeline in text_bot.views.
+
+  pytest benchmarks --benchmark-autosave      # record a new baseline
+  pytest benchmarks --benchmark-compare       # fail on a >25% median regression
+"""
+
+import pytest
+
+import corpus
+from text_bot import views
+
+
+@pytest.fixture(scope="module")
+def prompt_2k():
+    return corpus.long_prompt(2000)
+
+
+@pytest.fixture(scope="module")
+def sources_5k():
+    return corpus.source_records(5000)
+
+
+@pytest.fixture(scope="module")
+def sources_100k():
+    return corpus.source_records(100_000)
+
+
+@pytest.fixture(scope="module")
+def report_100kb():
+    return corpus.report(100 * 1024)
+
+
+def bench_extract_company_name_short(benchmark):
+    benchmark(views._extract_company_name, "Microsoft Azure")
+
+
+def bench_extract_company_name_long(benchmark, prompt_2k):
+    benchmark(views._extract_company_name, prompt_2k)
+
+
+def bench_resolve_company_long(benchmark, prompt_2k):
+    assert benchmark(views._resolve_company, prompt_2k).id in {c.lower() for c in corpus.COMPANIES}
+
+
+def bench_is_harmful_or_out_of_scope(benchmark, prompt_2k):
+    assert benchmark(views._is_harmful_or_out_of_scope, prompt_2k) is False
+
+
+def bench_is_unrelated_to_market_intelligence(benchmark, prompt_2k):
+    assert benchmark(views._is_unrelated_to_market_intelligence, prompt_2k) is False
+
+
+def bench_verifier_agent_5k_sources(benchmark, sources_5k):
+    verified = benchmark(views._verifier_agent, sources_5k, max_age_days=7)
+    assert any(src.publication_date for src in verified)
+
+
+def bench_verifier_agent_100k_sources(benchmark, sources_100k):
+    assert benchmark(views._verifier_agent, sources_100k, max_age_days=7)
+
+
+def bench_build_synthesis_prompt_5k_sources(benchmark, sources_5k):
+    benchmark(views._build_synthesis_prompt, "Microsoft", sources_5k)
+
+
+def bench_sanitize_report_100kb(benchmark, report_100kb):
+    benchmark(views._sanitize_report_text, report_100kb, allow_dates=False)
+
+
+def bench_sanitize_report_100kb_allow_dates(benchmark, report_100kb):
+    benchmark(views._sanitize_report_text, report_100kb, allow_dates=True)
@@ -0,0 +1,30 @@
+"""
+Cost of a rate limit check: one SQLite UPSERT for an allowed request, an in-process
+lookup for a client already known to be over its limit.
+
+  pytest benchmarks/bench_ratelimit.py
+"""
+
+import itertools
+
+import pytest
+
+from APIs.ratelimit import GCRALimiter
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "ratelimit.sqlite3")
+
+
+def bench_check_allowed(benchmark, db_path):
+    limiter = GCRALimiter(db_path, per_minute=1e9, burst=1e9)
+    keys = itertools.cycle([f"addr:10.0.{n // 256}.{n % 256}" for n in range(1000)])
+    assert benchmark(lambda: limiter.check(next(keys)))[0]
+
+
+def bench_check_limited(benchmark, db_path):
+    limiter = GCRALimiter(db_path, per_minute=1, burst=1)
+    limiter.check("addr:10.0.0.1")
+    limiter.check("addr:10.0.0.1")
+    assert not benchmark(limiter.check, "addr:10.0.0.1")[0]
@@ -0,0 +1,154 @@
+"""
+Bandwidth saved by response compression and ETag revalidation on report responses.
+
+Builds a report set shaped like real synthesizer output (seven sections plus the
+sources block, 400-4,000 output tokens) from sentences of the project's own prose
+(README and system prompt), so the text compresses like English rather than like
+a repeated template, then:
+
+  1. compresses each /chat/-style JSON body with gzip and brotli (bytes, ratio, CPU time);
+  2. replays a polling client against GET /reports/<company>/ through the full
+     middleware stack, where the report changes every --change-every polls.
+
+  python benchmarks/compression_bench.py --polls 200 --change-every 20
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "APIs.settings")
+os.environ.setdefault("GEMINI_API_KEY", "fake-key")
+
+import django  # noqa: E402
+
+django.setup()
+
+from fake_gemini import REPORT_SECTIONS  # noqa: E402
+
+from APIs import compression  # noqa: E402
+from text_bot.views import MARKET_SCOUT_SYSTEM_PROMPT  # noqa: E402
+
+OUTPUT_TOKENS = [400, 800, 1200, 2000, 4000]
+
+
+def _sentences():
+    prose = (BACKEND_DIR.parent / "README.md").read_text(encoding="utf-8") + "\n" + MARKET_SCOUT_SYSTEM_PROMPT
+    out = []
+    for line in prose.splitlines():
+        line = line.strip(" -#*>`|")
+        out.extend(s.strip() + "." for s in line.split(". ") if len(s.split()) >= 6)
+    return out
+
+
+def report_set(per_size: int = 10):
+    rng = random.Random(7)
+    sentences = _sentences()
+    reports = []
+    for tokens in OUTPUT_TOKENS:
+        for _ in range(per_size):
+            lines = [f"MARKET INTELLIGENCE REPORT: {rng.choice(['Apple', 'Microsoft', 'Nvidia', 'Datadog'])}", ""]
+            budget = tokens * 4  # ~4 characters per token
+            per_section = budget // len(REPORT_SECTIONS)
+            for heading in REPORT_SECTIONS:
+                lines.append(heading)
+                written = 0
+                while written < per_section:
+                    sentence = "- Market signal: " + rng.choice(sentences)
+                    lines.append(sentence)
+                    written += len(sentence)
+                lines.append("")
+            lines.extend(["Sources:", "- Recent public disclosures – public disclosures (links unavailable; live browsing/search not enabled)"])
+            reports.append(json.dumps({"generated_text": "\n".join(lines)}).encode("utf-8"))
+    return reports
+
+
+def measure_codecs(bodies):
+    codecs = ["gzip"] + (["br"] if compression.brotli is not None else [])
+    raw_total = sum(len(b) for b in bodies)
+    rows = {"identity": {"bytes": raw_total, "ratio": 1.0, "cpu_us_median": 0.0}}
+    for codec in codecs:
+        sizes, times = [], []
+        for body in bodies:
+            start = time.perf_counter()
+            sizes.append(len(compression.compress(body, codec)))
+            times.append((time.perf_counter() - start) * 1e6)
+        rows[codec] = {
+            "bytes": sum(sizes),
+            "ratio": round(raw_total / sum(sizes), 2),
+            "cpu_us_median": round(statistics.median(times), 1),
+        }
+    return rows
+
+
+def replay_polling(bodies, *, polls: int, change_every: int, accept_encoding: str, use_etag: bool = True):
+    from django.test import Client
+
+    from text_bot.reports import save_report
+
+    client = Client()
+    etag = None
+    wire_bytes = 0
+    not_modified = 0
+    for n in range(polls):
+        if n % change_every == 0:
+            # Step through the set so every report size is served.
+            body = bodies[(n // change_every) * 7 % len(bodies)]
+            save_report("apple", json.loads(body)["generated_text"])
+        headers = {"HTTP_ACCEPT_ENCODING": accept_encoding}
+        if etag and use_etag:
+            headers["HTTP_IF_NONE_MATCH"] = etag
+        response = client.get("/reports/apple/", **headers)
+        wire_bytes += len(response.content)
+        if response.status_code == 304:
+            not_modified += 1
+        etag = response.get("ETag") or etag
+    return {"polls": polls, "not_modified": not_modified, "body_bytes": wire_bytes}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--per-size", type=int, default=10, help="Reports per output-token size.")
+    parser.add_argument("--polls", type=int, default=200)
+    parser.add_argument("--change-every", type=int, default=20)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    bodies = report_set(args.per_size)
+    result = {
+        "reports": len(bodies),
+        "codecs": measure_codecs(bodies),
+        "polling": {},
+    }
+    for mode, accept_encoding, use_etag in [
+        ("identity, no ETag", "identity", False),
+        ("negotiated, no ETag", "br, gzip", False),
+        ("identity, ETag", "identity", True),
+        ("negotiated, ETag", "br, gzip", True),
+    ]:
+        result["polling"][mode] = replay_polling(
+            bodies, polls=args.polls, change_every=args.change_every, accept_encoding=accept_encoding, use_etag=use_etag,
+        )
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"{result['reports']} reports")
+    print(f"{'codec':<10} {'bytes':>12} {'ratio':>7} {'cpu us (median)':>16}")
+    for codec, row in result["codecs"].items():
+        print(f"{codec:<10} {row['bytes']:>12,} {row['ratio']:>7} {row['cpu_us_median']:>16}")
+    polling = result["polling"]
+    print(f"\npolling GET /reports/apple/: {args.polls} polls, report changes every {args.change_every}")
+    for mode, r in polling.items():
+        print(f"  {mode:<20} {r['body_bytes']:>12,} body bytes ({r['not_modified']} x 304)")
+
+
+if __name__ == "__main__":
+    main()
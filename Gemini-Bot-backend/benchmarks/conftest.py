@@ -0,0 +1,23 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent))
+sys.path.insert(0, str(BENCH_DIR))
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "APIs.settings")
+os.environ.setdefault("GEMINI_API_KEY", "fake-key")
+
+import django  # noqa: E402
+
+django.setup()
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config):
+    # Keep stored baselines next to the suite regardless of the working directory.
+    if getattr(config.option, "benchmark_storage", None) == "file://./.benchmarks":
+        config.option.benchmark_storage = "file://" + str(BENCH_DIR / "baselines")
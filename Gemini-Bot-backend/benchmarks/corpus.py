@@ -0,0 +1,108 @@
+"""
+Deterministic synthetic inputs for the micro-benchmarks: long analyst prompts,
+large source lists and ~100 KB model reports that exercise every sanitizer rule.
+"""
+
+import datetime
+import random
+
+from text_bot.sources import Source
+
+
+COMPANIES = [
+    "Apple", "Microsoft", "Nvidia", "Salesforce", "Snowflake", "Datadog", "Stripe", "Shopify",
+    "Atlassian", "Cloudflare", "ServiceNow", "Palantir", "CrowdStrike", "MongoDB", "Databricks",
+]
+WORDS = (
+    "platform roadmap enterprise adoption pricing partnership developer tooling inference cluster "
+    "silicon margin ecosystem regulatory exposure go-to-market release cadence api latency "
+    "security posture competitive positioning customer retention infrastructure capacity"
+).split()
+SECTIONS = [
+    "1) Executive Summary",
+    "2) Product Updates (Last 7 Days)",
+    "3) Technical Changes",
+    "4) Market / GTM Signals",
+    "5) Competitive Intelligence",
+    "6) Business Impact",
+    "7) Risks / Watchlist",
+]
+NOISE = [
+    "according to reporting [3]",
+    "over the last 48-72 hours",
+    "in the past 3 days",
+    "as of February 8, 2026",
+    "on 2026-02-08",
+    "per the 02/08/2026 filing",
+    "earlier today",
+    "this week",
+]
+
+
+def _sentence(rng: random.Random, n: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(n))
+
+
+def long_prompt(words: int = 2000, seed: int = 1) -> str:
+    rng = random.Random(seed)
+    company = rng.choice(COMPANIES)
+    parts = [f"Prepare a competitive briefing about {company} covering"]
+    while sum(len(p.split()) for p in parts) < words:
+        parts.append(_sentence(rng, 12) + ",")
+    return " ".join(parts) + " and summarize risks for leadership."
+
+
+def sources(count: int = 5000, seed: int = 2, today: datetime.date = None):
+    rng = random.Random(seed)
+    if today is None:
+        from text_bot.views import _today_2026
+
+        # The same clock the Verifier filters against, so dated sources survive it.
+        today = _today_2026()
+    out = []
+    for i in range(count):
+        r = rng.random()
+        if r < 0.2:
+            pub = None
+        elif r < 0.4:
+            pub = (today - datetime.timedelta(days=rng.randint(8, 60))).isoformat()
+        else:
+            pub = (today - datetime.timedelta(days=rng.randint(0, 7))).isoformat()
+        # ~10% duplicate titles so dedupe has work to do.
+        n = i if rng.random() > 0.1 else rng.randint(0, max(0, i - 1))
+        out.append({
+            "title": f"{rng.choice(COMPANIES)} {_sentence(rng, 5)} #{n}",
+            "publication_date": pub,
+            "source_type": rng.choice(["public disclosures", "industry reporting", "developer updates"]),
+        })
+    return out
+
+
+def source_records(count: int = 5000, seed: int = 2, today: datetime.date = None):
+    return [Source.from_dict(d) for d in sources(count, seed, today)]
+
+
+def report(size_bytes: int = 100 * 1024, seed: int = 3) -> str:
+    rng = random.Random(seed)
+    lines = [f"MARKET INTELLIGENCE REPORT: {rng.choice(COMPANIES)}", ""]
+    total = 0
+    section = 0
+    while total < size_bytes:
+        if section < len(SECTIONS) and rng.random() < 0.05:
+            lines.extend(["", SECTIONS[section]])
+            section += 1
+        line = f"- {_sentence(rng, 14)} {rng.choice(NOISE)} {_sentence(rng, 6)}."
+        lines.append(line)
+        total += len(line) + 1
+    lines.extend(["", "Sources:", "- Recent industry reporting – industry reporting"])
+    return "\n".join(lines)
+
+
+def markers(count: int = 5000, seed: int = 4):
+    # Pseudo-words that never occur in the generated prompts, so every scan runs to the end.
+    rng = random.Random(seed)
+    letters = "bcdfghjklmnpqrstvwxz"
+    out = set()
+    while len(out) < count:
+        out.add("".join(rng.choice(letters) for _ in range(rng.randint(4, 10))))
+    return sorted(out)
@@ -0,0 +1,214 @@
+"""
+Local stand-in for the Gemini REST API used by the load-test harness.
+
+Serves POST .../models/<model>:generateContent with a configurable latency
+distribution, injected 429/503 errors and responses of a given token size, so the
+backend can be exercised end to end without spending quota.
+
+Run standalone (e.g. for a gunicorn target started with GEMINI_BASE_URL):
+  python benchmarks/fake_gemini.py --port 8765 --latency lognormal:0.8:0.4 --rate-429 0.02
+"""
+
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+REPORT_SECTIONS = [
+    "1) Executive Summary",
+    "2) Product Updates (Recent Period)",
+    "3) Technical Changes",
+    "4) Market / GTM Signals",
+    "5) Competitive Intelligence",
+    "6) Business Impact",
+    "7) Risks / Watchlist",
+]
+# Mirrors text_bot.structured.SECTION_FIELDS; kept local so this file runs standalone.
+REPORT_FIELDS = [
+    "executive_summary",
+    "product_updates",
+    "technical_changes",
+    "market_signals",
+    "competitive_intelligence",
+    "business_impact",
+    "risks",
+]
+FILLER = (
+    "platform roadmap signals indicate continued investment in developer tooling and AI infrastructure "
+    "while go-to-market messaging emphasizes enterprise adoption and ecosystem partnerships "
+).split()
+
+
+def parse_latency(spec: str):
+    """
+    Parse a latency distribution spec into a zero-argument sampler (seconds):
+      const:0.5 | uniform:0.2:1.5 | normal:0.8:0.2 | lognormal:<median>:<sigma> | exp:<mean>
+    """
+    kind, _, rest = spec.partition(":")
+    args = [float(a) for a in rest.split(":") if a]
+    if kind == "const":
+        return lambda: args[0]
+    if kind == "uniform":
+        return lambda: random.uniform(args[0], args[1])
+    if kind == "normal":
+        return lambda: max(0.0, random.gauss(args[0], args[1]))
+    if kind == "lognormal":
+        mu = math.log(args[0])
+        return lambda: random.lognormvariate(mu, args[1])
+    if kind == "exp":
+        return lambda: random.expovariate(1.0 / args[0])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+def make_report_text(output_tokens: int) -> str:
+    # ~4 characters per token, spread evenly over the seven report sections.
+    words_per_section = max(1, (output_tokens * 4) // (6 * len(REPORT_SECTIONS)))
+    lines = ["MARKET INTELLIGENCE REPORT: Target Company", ""]
+    for i, heading in enumerate(REPORT_SECTIONS):
+        body = " ".join(FILLER[(i + n) % len(FILLER)] for n in range(words_per_section))
+        lines.extend([heading, f"- Market signal: {body}.", ""])
+    lines.append("Sources:")
+    lines.append("- Recent industry reporting – industry reporting")
+    return "\n".join(lines)
+
+
+def make_report_json(output_tokens: int) -> str:
+    # Same size as make_report_text, in the shape structured synthesis (text_bot/structured.py) requests.
+    words_per_section = max(1, (output_tokens * 4) // (6 * len(REPORT_FIELDS)))
+    report = {}
+    for i, field in enumerate(REPORT_FIELDS):
+        body = " ".join(FILLER[(i + n) % len(FILLER)] for n in range(words_per_section))
+        report[field] = [{"text": f"Market signal: {body}.", "sources": [1]}]
+    return json.dumps(report)
+
+
+def _wants_json(request_body: bytes) -> bool:
+    try:
+        generation = json.loads(request_body or b"{}").get("generationConfig") or {}
+    except ValueError:
+        return False
+    return generation.get("responseMimeType") == "application/json"
+
+
+class FakeGeminiServer:
+    def __init__(self, *, host: str = "127.0.0.1", port: int = 0, latency: str = "const:0.05",
+                 rate_429: float = 0.0, rate_503: float = 0.0, output_tokens: int = 800, ssl_context=None):
+        self.sample_latency = parse_latency(latency)
+        self.rate_429 = rate_429
+        self.rate_503 = rate_503
+        self.output_tokens = output_tokens
+        self.report_text = make_report_text(output_tokens)
+        self.report_json = make_report_json(output_tokens)
+        self.stats = {"calls": 0, "injected_429": 0, "injected_503": 0}
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._scheme = "http"
+        if ssl_context is not None:
+            # Handshake in the handler thread, not in the accept loop, so handshakes run concurrently.
+            self._httpd.socket = ssl_context.wrap_socket(self._httpd.socket, server_side=True, do_handshake_on_connect=False)
+            self._scheme = "https"
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"{self._scheme}://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _next_outcome(self) -> int:
+        r = random.random()
+        with self._lock:
+            self.stats["calls"] += 1
+            if r < self.rate_429:
+                self.stats["injected_429"] += 1
+                return 429
+            if r < self.rate_429 + self.rate_503:
+                self.stats["injected_503"] += 1
+                return 503
+        return 200
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                request_body = self.rfile.read(length)
+                time.sleep(server.sample_latency())
+
+                status = server._next_outcome()
+                if status == 429:
+                    payload = {"error": {"code": 429, "message": "Resource has been exhausted (e.g. check quota).", "status": "RESOURCE_EXHAUSTED"}}
+                elif status == 503:
+                    payload = {"error": {"code": 503, "message": "The model is overloaded. Please try again later.", "status": "UNAVAILABLE"}}
+                else:
+                    payload = {
+                        "candidates": [
+                            {
+                                "content": {"role": "model", "parts": [{"text": server.report_json if _wants_json(request_body) else server.report_text}]},
+                                "finishReason": "STOP",
+                            }
+                        ],
+                        "usageMetadata": {
+                            "promptTokenCount": len(request_body) // 4,
+                            "candidatesTokenCount": server.output_tokens,
+                            "totalTokenCount": len(request_body) // 4 + server.output_tokens,
+                        },
+                    }
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+
+def make_client(base_url: str, httpx_client=None):
+    from google import genai
+
+    from APIs.http_transport import build_httpx_client
+
+    return genai.Client(api_key="fake-key", http_options={"base_url": base_url, "httpx_client": httpx_client or build_httpx_client()})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", default="const:0.05")
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--rate-503", type=float, default=0.0)
+    parser.add_argument("--output-tokens", type=int, default=800)
+    args = parser.parse_args()
+
+    server = FakeGeminiServer(host=args.host, port=args.port, latency=args.latency, rate_429=args.rate_429,
+                              rate_503=args.rate_503, output_tokens=args.output_tokens)
+    print(f"Fake Gemini listening on {server.url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""
+Offline load test for the /chat/, /image/ and /pdf/ endpoints.
+
+By default the Django app runs in-process and APIs.gemini_client.client is swapped
+for a client pointed at a local FakeGeminiServer, so no quota is spent:
+
+  python benchmarks/loadtest.py --concurrency 16 --requests 200 --latency lognormal:0.8:0.4 --rate-429 0.02
+
+To drive a running server instead, start the fake backend and the server with
+GEMINI_BASE_URL pointing at it, then pass --target:
+
+  python benchmarks/fake_gemini.py --port 8765 &
+  RATE_LIMIT=False REPORT_HISTORY=False TOKEN_USAGE_TRACKING=False GEMINI_BASE_URL=http://127.0.0.1:8765 gunicorn config.wsgi:application &
+  python benchmarks/loadtest.py --target http://127.0.0.1:8000 --gunicorn-pid <master pid>
+
+Results are written as JSON (see --out); pass --baseline <old.json> to print deltas.
+"""
+
+import argparse
+import datetime
+import json
+import math
+import os
+import random
+import struct
+import sys
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from fake_gemini import FakeGeminiServer, make_client  # noqa: E402
+
+
+COMPANIES = ["Apple", "Microsoft", "Nvidia", "Salesforce", "Snowflake", "Datadog", "Stripe", "Shopify", "Atlassian", "Cloudflare"]
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _png_bytes(size_kb: int) -> bytes:
+    # A valid grayscale PNG padded with random pixels to roughly size_kb.
+    width = 256
+    height = max(1, (size_kb * 1024) // width)
+    raw = b"".join(b"\x00" + os.urandom(width) for _ in range(height))
+
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(raw, 1)) + chunk(b"IEND", b"")
+
+
+def _pdf_bytes(size_kb: int) -> bytes:
+    text = " ".join(random.choice(COMPANIES) + " platform update" for _ in range(size_kb * 40))[: size_kb * 1024]
+    stream = f"BT /F1 10 Tf 20 800 Td ({text}) Tj ET".encode("latin-1")
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] /Contents 4 0 R /Resources << /Font << /F1 5 0 R >> >> >>",
+        b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + obj + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % o for o in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def _rss_bytes(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except OSError:
+        return 0
+
+
+def _worker_pids(master_pid: int):
+    pids = []
+    try:
+        for task in os.listdir(f"/proc/{master_pid}/task"):
+            with open(f"/proc/{master_pid}/task/{task}/children") as f:
+                pids.extend(int(p) for p in f.read().split())
+    except OSError:
+        pass
+    return pids
+
+
+def _percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    # Nearest-rank percentile.
+    k = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+class InProcessTransport:
+    def __init__(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from django.test import Client
+
+        self._local = threading.local()
+        self._client_class = Client
+        self._upload_class = SimpleUploadedFile
+
+    def post(self, path, data, files):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self._client_class(SERVER_NAME="localhost")
+        payload = dict(data)
+        for field, (name, content, content_type) in (files or {}).items():
+            payload[field] = self._upload_class(name, content, content_type=content_type)
+        return client.post(path, payload).status_code
+
+
+class HttpTransport:
+    def __init__(self, base_url: str, timeout: float):
+        import requests
+
+        self._base_url = base_url.rstrip("/")
+        self._timeout = timeout
+        self._local = threading.local()
+        self._requests = requests
+
+    def post(self, path, data, files):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = self._requests.Session()
+        try:
+            return session.post(self._base_url + path, data=data, files=files, timeout=self._timeout).status_code
+        except self._requests.RequestException:
+            return 0
+
+
+def _build_request(endpoint: str, i: int, uploads):
+    company = COMPANIES[i % len(COMPANIES)]
+    data = {"session_id": f"loadtest-{i % 32}"}
+    if endpoint == "chat":
+        data["prompt"] = company
+        return "/chat/", data, None
+    if endpoint == "image":
+        data["prompt"] = f"Competitive positioning of {company} in this screenshot"
+        return "/image/", data, {"image": ("shot.png", uploads["image"], "image/png")}
+    data["prompt"] = f"Summarize {company} signals in this report"
+    return "/pdf/", data, {"pdf": ("report.pdf", uploads["pdf"], "application/pdf")}
+
+
+def run_phase(transport, endpoint: str, *, requests_count: int, concurrency: int, uploads, rss_probe):
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    peak_rss = [rss_probe()]
+
+    def one(i):
+        path, data, files = _build_request(endpoint, i, uploads)
+        start = time.perf_counter()
+        status = transport.post(path, data, files)
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+            if i % 10 == 0:
+                peak_rss[0] = max(peak_rss[0], rss_probe())
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests_count)))
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    errors = sum(n for s, n in statuses.items() if not s.startswith("2"))
+    return {
+        "requests": requests_count,
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(requests_count / wall, 2) if wall else 0.0,
+        "latency_seconds": {
+            "mean": round(sum(latencies) / len(latencies), 4) if latencies else 0.0,
+            "p50": round(_percentile(latencies, 50), 4),
+            "p95": round(_percentile(latencies, 95), 4),
+            "p99": round(_percentile(latencies, 99), 4),
+            "max": round(latencies[-1], 4) if latencies else 0.0,
+        },
+        "status_counts": statuses,
+        "error_rate": round(errors / requests_count, 4) if requests_count else 0.0,
+        "peak_rss_mb": round(max(peak_rss[0], rss_probe()) / (1024 * 1024), 1),
+    }
+
+
+def _print_comparison(results, baseline):
+    print("\nendpoint   metric            baseline     current    delta")
+    for endpoint, cur in results["endpoints"].items():
+        old = baseline.get("endpoints", {}).get(endpoint)
+        if not old:
+            continue
+        rows = [("throughput_rps", old["throughput_rps"], cur["throughput_rps"])]
+        rows += [(f"latency_{k}", old["latency_seconds"][k], cur["latency_seconds"][k]) for k in ("p50", "p95", "p99")]
+        rows += [("error_rate", old["error_rate"], cur["error_rate"]), ("peak_rss_mb", old["peak_rss_mb"], cur["peak_rss_mb"])]
+        for name, a, b in rows:
+            delta = f"{(b - a) / a * 100:+.1f}%" if a else "n/a"
+            print(f"{endpoint:<10} {name:<16} {a:>10} {b:>11} {delta:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", default="chat,image,pdf", help="Comma-separated phases to run (chat,image,pdf).")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=100, help="Requests per endpoint.")
+    parser.add_argument("--latency", default="lognormal:0.8:0.4", help="Fake Gemini latency distribution (see fake_gemini.parse_latency).")
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--rate-503", type=float, default=0.0)
+    parser.add_argument("--output-tokens", type=int, default=800)
+    parser.add_argument("--upload-kb", type=int, default=256, help="Approximate size of generated image/PDF uploads.")
+    parser.add_argument("--target", help="Base URL of a running server; default runs the app in-process.")
+    parser.add_argument("--gunicorn-pid", type=int, help="With --target: master pid whose workers' RSS is sampled.")
+    parser.add_argument("--settings", default="APIs.settings")
+    parser.add_argument("--out", help="Result file (default: benchmarks/results/loadtest-<timestamp>.json).")
+    parser.add_argument("--baseline", help="Previous result file to compare against.")
+    parser.add_argument("--seed", type=int, default=2026)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    fake = None
+    if args.target:
+        transport = HttpTransport(args.target, timeout=180)
+        if args.gunicorn_pid:
+            rss_probe = lambda: sum(_rss_bytes(p) for p in _worker_pids(args.gunicorn_pid))  # noqa: E731
+        else:
+            rss_probe = lambda: 0  # noqa: E731
+    else:
+        os.environ.setdefault("DJANGO_SETTINGS_MODULE", args.settings)
+        os.environ.setdefault("GEMINI_API_KEY", "fake-key")
+        # Keep the load test from filling the local database with synthetic usage rows.
+        os.environ.setdefault("TOKEN_USAGE_TRACKING", "False")
+        # Without this, repeat /chat/ prompts reuse stored reports instead of calling the fake Gemini,
+        # and every synthetic report is written into db.sqlite3.
+        os.environ.setdefault("REPORT_HISTORY", "False")
+        # Every simulated user shares one address, so the per-client limit would turn the run into 429s.
+        os.environ.setdefault("RATE_LIMIT", "False")
+        import django
+
+        django.setup()
+        from APIs import gemini_client
+
+        fake = FakeGeminiServer(latency=args.latency, rate_429=args.rate_429, rate_503=args.rate_503,
+                                output_tokens=args.output_tokens).start()
+        gemini_client.client = make_client(fake.url)
+        transport = InProcessTransport()
+        rss_probe = lambda: _rss_bytes(os.getpid())  # noqa: E731
+
+    uploads = {"image": _png_bytes(args.upload_kb), "pdf": _pdf_bytes(args.upload_kb)}
+    results = {
+        "started_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "baseline")},
+        "endpoints": {},
+    }
+    for endpoint in [e.strip() for e in args.endpoints.split(",") if e.strip()]:
+        phase = run_phase(transport, endpoint, requests_count=args.requests, concurrency=args.concurrency,
+                          uploads=uploads, rss_probe=rss_probe)
+        results["endpoints"][endpoint] = phase
+        lat = phase["latency_seconds"]
+        print(f"{endpoint:<6} {phase['throughput_rps']:>8} req/s  p50={lat['p50']}s p95={lat['p95']}s p99={lat['p99']}s "
+              f"errors={phase['error_rate']:.1%} rss={phase['peak_rss_mb']}MB")
+
+    if fake is not None:
+        results["fake_gemini"] = dict(fake.stats)
+        fake.stop()
+
+    out = Path(args.out) if args.out else Path(__file__).resolve().parent / "results" / (
+        "loadtest-" + datetime.datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(results, indent=2))
+    print(f"Results written to {out}")
+
+    if args.baseline:
+        _print_comparison(results, json.loads(Path(args.baseline).read_text()))
+
+
+if __name__ == "__main__":
+    main()
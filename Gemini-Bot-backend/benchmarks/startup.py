@@ -0,0 +1,94 @@
+"""
+Worker startup cost: `python -X importtime` breakdown and time-to-first-request.
+
+Each run starts a fresh interpreter that loads config.wsgi and serves one /chat/
+request (a refusal, so no Gemini call is made), the way a newly forked gunicorn
+worker would without preloading.
+
+  python benchmarks/startup.py --runs 5 --top 15
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+CHILD = r"""
+import io, json, os, time
+t0 = time.perf_counter()
+from config.wsgi import application
+t_import = time.perf_counter()
+body = b"prompt=write+me+a+poem"
+environ = {
+    "REQUEST_METHOD": "POST", "PATH_INFO": "/chat/", "SERVER_NAME": "localhost", "SERVER_PORT": "80",
+    "HTTP_HOST": "localhost", "wsgi.url_scheme": "http", "wsgi.input": io.BytesIO(body),
+    "CONTENT_TYPE": "application/x-www-form-urlencoded", "CONTENT_LENGTH": str(len(body)),
+    "wsgi.errors": io.StringIO(),
+}
+status = []
+b"".join(application(environ, lambda s, h, e=None: status.append(s)))
+t_first = time.perf_counter()
+print(json.dumps({"status": status[0], "import_wsgi_s": t_import - t0, "first_request_s": t_first - t0}))
+"""
+
+
+def _child_env():
+    env = dict(os.environ)
+    env.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    env.setdefault("GEMINI_API_KEY", "fake-key")
+    env.setdefault("TOKEN_USAGE_TRACKING", "False")
+    return env
+
+
+def _importtime(top: int):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD],
+        cwd=BACKEND_DIR, env=_child_env(), capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), name[1:].rstrip()))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+    args = parser.parse_args()
+
+    samples = []
+    for _ in range(args.runs):
+        proc = subprocess.run([sys.executable, "-c", CHILD], cwd=BACKEND_DIR, env=_child_env(),
+                              capture_output=True, text=True, check=True)
+        samples.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    result = {
+        "runs": args.runs,
+        "import_wsgi_s_median": round(statistics.median(s["import_wsgi_s"] for s in samples), 4),
+        "first_request_s_median": round(statistics.median(s["first_request_s"] for s in samples), 4),
+        "top_imports": [{"module": n, "cumulative_ms": c / 1000, "self_ms": s / 1000} for c, s, n in _importtime(args.top)],
+    }
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    print(f"import config.wsgi:      {result['import_wsgi_s_median'] * 1000:8.1f} ms (median of {args.runs})")
+    print(f"time to first request:   {result['first_request_s_median'] * 1000:8.1f} ms")
+    print("\ncumulative ms   self ms   module (indented by import depth)")
+    for row in result["top_imports"]:
+        print(f"{row['cumulative_ms']:13.1f} {row['self_ms']:9.1f}   {row['module']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Connection reuse benchmark for the pooled Gemini transport (APIs/http_transport.py).
+
+Fires rounds of concurrent generate_content calls at a local TLS FakeGeminiServer,
+once through the pooled keep-alive client and once with keep-alive disabled (a new
+TCP connection and TLS handshake per call), and compares latency and setup counts.
+
+  python benchmarks/transport_bench.py --concurrency 64 --rounds 5
+"""
+
+import argparse
+import datetime
+import ipaddress
+import json
+import math
+import ssl
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from fake_gemini import FakeGeminiServer, make_client  # noqa: E402
+
+from APIs.http_transport import ConnectionStats, build_httpx_client  # noqa: E402
+
+
+def _self_signed_context() -> ssl.SSLContext:
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "127.0.0.1")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(minutes=5))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .add_extension(x509.SubjectAlternativeName([x509.IPAddress(ipaddress.ip_address("127.0.0.1"))]), critical=False)
+        .sign(key, hashes.SHA256())
+    )
+    tmp = Path(tempfile.mkdtemp())
+    (tmp / "cert.pem").write_bytes(cert.public_bytes(serialization.Encoding.PEM))
+    (tmp / "key.pem").write_bytes(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()))
+    ctx = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    ctx.load_cert_chain(tmp / "cert.pem", tmp / "key.pem")
+    return ctx
+
+
+def _percentile(sorted_values, pct: float) -> float:
+    k = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+def run(base_url: str, *, keepalive: bool, concurrency: int, rounds: int) -> dict:
+    stats = ConnectionStats()
+    httpx_client = build_httpx_client(pool_maxsize=concurrency, keepalive=keepalive, verify=False, connection_stats=stats)
+    client = make_client(base_url, httpx_client=httpx_client)
+    latencies = []
+
+    def one(_):
+        start = time.perf_counter()
+        client.models.generate_content(model="gemini-bench", contents="Microsoft")
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(rounds):
+            latencies.extend(pool.map(one, range(concurrency)))
+    wall = time.perf_counter() - start
+    httpx_client.close()
+
+    latencies.sort()
+    return {
+        "keepalive": keepalive,
+        "calls": len(latencies),
+        "wall_seconds": round(wall, 3),
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies) * 1000, 2),
+            "p50": round(_percentile(latencies, 50) * 1000, 2),
+            "p95": round(_percentile(latencies, 95) * 1000, 2),
+            "p99": round(_percentile(latencies, 99) * 1000, 2),
+        },
+        **stats.snapshot(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--latency", default="const:0.02", help="Fake Gemini latency distribution.")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    server = FakeGeminiServer(latency=args.latency, output_tokens=400, ssl_context=_self_signed_context()).start()
+    try:
+        results = {
+            "pooled": run(server.url, keepalive=True, concurrency=args.concurrency, rounds=args.rounds),
+            "no_keepalive": run(server.url, keepalive=False, concurrency=args.concurrency, rounds=args.rounds),
+        }
+    finally:
+        server.stop()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'mode':<14} {'calls':>6} {'conns':>6} {'tls':>6} {'reuse':>7} {'mean ms':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for mode, r in results.items():
+        lat = r["latency_ms"]
+        print(f"{mode:<14} {r['calls']:>6} {r['connections_opened']:>6} {r['tls_handshakes']:>6} {r['reuse_ratio']:>7.1%} "
+              f"{lat['mean']:>9} {lat['p50']:>8} {lat['p95']:>8} {lat['p99']:>8}")
+    saved = results["no_keepalive"]["latency_ms"]["mean"] - results["pooled"]["latency_ms"]["mean"]
+    print(f"\nConnection setup saved per call (mean): {saved:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,11 @@
 from django.contrib import admin
 from django.urls import include, path
 
+from APIs.metrics import metrics_view
+
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("metrics", metrics_view, name="metrics"),
     path("", include("text_bot.urls")),
     path("", include("image_bot.urls")),
     path("", include("pdf_chat.urls")),
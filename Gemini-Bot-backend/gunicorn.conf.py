@@ -0,0 +1,52 @@
+"""
+Gunicorn settings, picked up automatically from the working directory:
+  gunicorn config.wsgi:application
+
+Workers share a Prometheus multiprocess directory so /metrics aggregates all of them.
+Each worker runs GUNICORN_THREADS request threads (gthread). Admission control admits
+fewer requests than that (ADMISSION_MAX_IN_FLIGHT), so the spare threads are the ones
+that pick up excess requests and queue or shed them, instead of leaving them in the
+listen backlog. With GUNICORN_PRELOAD=True the app is imported and warmed up once in the master and
+inherited by every worker (see APIs/warmup.py).
+"""
+
+import os
+import shutil
+import tempfile
+
+# Imported under another name: gunicorn reads every module-level name as a setting,
+# and "config" is one.
+from decouple import config as env
+
+
+_metrics_dir = env(
+    "PROMETHEUS_MULTIPROC_DIR",
+    default=os.path.join(tempfile.gettempdir(), "market-scout-metrics"),
+)
+os.environ["PROMETHEUS_MULTIPROC_DIR"] = _metrics_dir
+
+preload_app = env("GUNICORN_PRELOAD", default=False, cast=bool)
+
+worker_class = "gthread"
+threads = env("GUNICORN_THREADS", default=16, cast=int)
+# Workers read it to keep ADMISSION_MAX_IN_FLIGHT below the thread count (see APIs/admission.py).
+os.environ["GUNICORN_THREADS"] = str(threads)
+
+
+def on_starting(server):
+    # Drop samples left behind by a previous master.
+    shutil.rmtree(_metrics_dir, ignore_errors=True)
+    os.makedirs(_metrics_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def when_ready(server):
+    if preload_app:
+        from APIs.warmup import warm_up
+
+        warm_up()
@@ -3,9 +3,9 @@ from rest_framework.response import Response
 import logging
 import mimetypes
 
-from google.genai import types
-
+from APIs.admission import admission_control
 from APIs.gemini_client import generate_content
+from APIs.metrics import observe_upload, track_request
 
 logger = logging.getLogger(__name__)
 
@@ -106,6 +106,8 @@ def _is_rate_limit_error(exc):
 # Image Bot API (POST, multipart/form-data; response: {"generated_text": "<string>"})
 # -------------------------
 @api_view(["POST"])
+@track_request("image")
+@admission_control("standard")
 def image_bot(request):
     # Use request.FILES only (never request.data for the file).
     image_file = request.FILES.get("image")
@@ -133,6 +135,10 @@ def image_bot(request):
         or (post.get("prompt") if hasattr(post, "get") else None)
         or DEFAULT_USER_PROMPT
     )
+    session_id = (
+        (data.get("session_id") if hasattr(data, "get") else None)
+        or (post.get("session_id") if hasattr(post, "get") else None)
+    )
 
     # Size check before reading (Django sets .size for multipart)
     size = getattr(image_file, "size", None)
@@ -146,14 +152,18 @@ def image_bot(request):
         # Single read: get bytes then validate length (handles streaming uploads)
         image_file.seek(0)
         image_bytes = image_file.read()
+        observe_upload("image", len(image_bytes))
         if len(image_bytes) > MAX_IMAGE_BYTES:
             return Response(
                 {"generated_text": "Image too large. Max allowed size is 4MB."},
                 status=400,
             )
 
+        # Imported lazily: google.genai dominates worker import time (see APIs.gemini_client).
+        from google.genai import types
+
         image_part = types.Part.from_bytes(data=image_bytes, mime_type=content_type)
-        response = generate_content([MARKET_SCOUT_SYSTEM_PROMPT, user_prompt, image_part])
+        response = generate_content([MARKET_SCOUT_SYSTEM_PROMPT, user_prompt, image_part], endpoint="image", session_id=session_id)
 
         text = (getattr(response, "text", None) or "").strip()
         if not text:
@@ -0,0 +1,168 @@
+"""
+Text-first downconversion of uploaded PDFs.
+
+Gemini bills every page of a PDF part as an image (PDF_PAGE_TOKENS) on top of its
+text. Born-digital reports carry a text layer, so with PDF_TEXT_FIRST on the text is
+extracted locally (pypdf) and sent as plain text; only pages that need to be seen
+(scanned pages with little or no text, figure pages with images and little text) are
+kept, as a PDF of just those pages. Extraction runs in a process pool so parsing a
+large document neither blocks the worker thread nor holds the GIL. An extraction that
+runs past PDF_EXTRACT_TIMEOUT retires its pool: new requests get a fresh pool, the
+extractions other requests are still waiting on finish, and then the retired pool's
+processes are killed, so a pathological file cannot keep occupying an extractor after
+its request has given up on it.
+
+Without pypdf, for encrypted or unparseable files, and when most pages need to be
+seen anyway, the original PDF is sent unchanged.
+"""
+
+import io
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, NamedTuple, Optional
+
+from decouple import config
+
+try:
+    from pypdf import PdfReader, PdfWriter
+except ImportError:  # optional dependency
+    PdfReader = PdfWriter = None
+
+
+PDF_TEXT_FIRST = config("PDF_TEXT_FIRST", default=True, cast=bool)
+# Pages with less extractable text than this are treated as scanned.
+PDF_MIN_PAGE_CHARS = config("PDF_MIN_PAGE_CHARS", default=200, cast=int)
+# Pages with images and less text than this are treated as figure/chart pages.
+PDF_FIGURE_PAGE_CHARS = config("PDF_FIGURE_PAGE_CHARS", default=1200, cast=int)
+# Above this share of pages to keep, send the original PDF instead.
+PDF_MAX_BINARY_RATIO = config("PDF_MAX_BINARY_RATIO", default=0.5, cast=float)
+PDF_EXTRACT_WORKERS = config("PDF_EXTRACT_WORKERS", default=2, cast=int)
+PDF_EXTRACT_TIMEOUT = config("PDF_EXTRACT_TIMEOUT", default=20.0, cast=float)
+
+# Gemini document understanding: each PDF page counts as 258 tokens.
+PDF_PAGE_TOKENS = 258
+CHARS_PER_TOKEN = 4
+
+logger = logging.getLogger(__name__)
+
+
+class Downconversion(NamedTuple):
+    pages: int
+    text: str                      # extracted text of the text-first pages, with page markers
+    binary_pages: List[int]        # 1-based numbers of pages kept as PDF
+    binary_pdf: Optional[bytes]    # PDF of just those pages
+
+    @property
+    def text_pages(self) -> int:
+        return self.pages - len(self.binary_pages)
+
+    def estimated_tokens(self) -> int:
+        return len(self.text) // CHARS_PER_TOKEN + len(self.binary_pages) * PDF_PAGE_TOKENS
+
+    def estimated_raw_tokens(self) -> int:
+        # The raw upload pays for page images and their text.
+        return self.pages * PDF_PAGE_TOKENS + len(self.text) // CHARS_PER_TOKEN
+
+
+def _image_count(page) -> int:
+    resources = page.get("/Resources")
+    xobjects = resources.get_object().get("/XObject") if resources is not None else None
+    if xobjects is None:
+        return 0
+    return sum(1 for ref in xobjects.get_object().values() if ref.get_object().get("/Subtype") == "/Image")
+
+
+def _needs_binary(text: str, images: int) -> bool:
+    return len(text) < PDF_MIN_PAGE_CHARS or (images > 0 and len(text) < PDF_FIGURE_PAGE_CHARS)
+
+
+def extract(pdf_bytes: bytes) -> Optional[Downconversion]:
+    """Split a PDF into text-first pages and pages to keep; None if the original should be sent."""
+    reader = PdfReader(io.BytesIO(pdf_bytes))
+    if reader.is_encrypted and not reader.decrypt(""):
+        return None
+    blocks, binary_pages = [], []
+    for number, page in enumerate(reader.pages, start=1):
+        text = (page.extract_text() or "").strip()
+        if _needs_binary(text, _image_count(page)):
+            binary_pages.append(number)
+        else:
+            blocks.append(f"--- Page {number} ---\n{text}")
+    pages = len(reader.pages)
+    if not blocks or len(binary_pages) > pages * PDF_MAX_BINARY_RATIO:
+        return None
+    binary_pdf = None
+    if binary_pages:
+        writer = PdfWriter()
+        for number in binary_pages:
+            writer.add_page(reader.pages[number - 1])
+        out = io.BytesIO()
+        writer.write(out)
+        binary_pdf = out.getvalue()
+    return Downconversion(pages, "\n\n".join(blocks), binary_pages, binary_pdf)
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+# pool -> requests waiting on it; a retired pool is killed when this drops to zero.
+_pool_waiters: Dict[ProcessPoolExecutor, int] = {}
+
+
+def _acquire_pool() -> ProcessPoolExecutor:
+    # Created on first use, never in a preloading gunicorn master; spawn avoids forking a threaded worker.
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PDF_EXTRACT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        _pool_waiters[_pool] = _pool_waiters.get(_pool, 0) + 1
+        return _pool
+
+
+def _release_pool(pool: ProcessPoolExecutor) -> None:
+    """Drop one request's claim on `pool`; a retired pool is killed once nobody waits on it."""
+    with _pool_lock:
+        waiters = _pool_waiters.pop(pool) - 1
+        if waiters:
+            _pool_waiters[pool] = waiters
+            return
+        if pool is _pool:
+            return
+    # Only abandoned work (e.g. a timed-out extraction) can still be running. The executor has
+    # no public way to stop a running task, so kill its processes before shutting it down.
+    for process in list((pool._processes or {}).values()):
+        process.terminate()
+    pool.shutdown(wait=False)
+
+
+def _retire_pool(pool: ProcessPoolExecutor) -> None:
+    """Stop handing work to `pool`; the next call starts a fresh one. Work already queued still runs."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+
+
+def downconvert(pdf_bytes: bytes, *, timeout: float = PDF_EXTRACT_TIMEOUT) -> Optional[Downconversion]:
+    """extract() in the process pool; None (send the original) when disabled, unavailable or failing."""
+    if not PDF_TEXT_FIRST or PdfReader is None:
+        return None
+    pool = _acquire_pool()
+    try:
+        return pool.submit(extract, pdf_bytes).result(timeout=timeout)
+    except FutureTimeoutError:
+        logger.warning("PDF text extraction timed out after %ss; sending the original PDF", timeout)
+        _retire_pool(pool)
+        return None
+    except BrokenProcessPool:
+        # A crashed extractor (e.g. out of memory) poisons the pool; start a fresh one next time.
+        logger.warning("PDF extraction pool broke; sending the original PDF", exc_info=True)
+        _retire_pool(pool)
+        return None
+    except Exception:
+        logger.warning("PDF text extraction failed; sending the original PDF", exc_info=True)
+        return None
+    finally:
+        _release_pool(pool)
@@ -0,0 +1,187 @@
+"""
+Per-session BM25 index of uploaded PDFs for follow-up questions.
+
+The first question about a PDF is answered from the whole document (see
+pdf_chat.downconvert). Its extracted text is then split into page-aligned chunks and
+indexed under (session, document digest). Follow-up questions about the same
+document, whether the file is uploaded again or referenced by document_id, are
+answered from the PDF_INDEX_TOP_K chunks that score highest for the question under
+BM25, so their prompt size depends on the question rather than on the document.
+
+Postings are kept as typed arrays and chunk text zlib-compressed. A document is
+evicted after PDF_INDEX_TTL seconds without a question, and least recently used
+first beyond PDF_INDEX_MAX_DOCUMENTS. State is kept per worker process: a follow-up
+that sends only document_id and reaches another worker gets a 404 with
+"reupload_required", and the client sends the file again.
+"""
+
+import hashlib
+import heapq
+import math
+import re
+import threading
+import time
+import zlib
+from array import array
+from collections import Counter, OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from decouple import config
+
+from APIs.metrics import PDF_INDEX_LOOKUPS
+
+
+PDF_INDEX = config("PDF_INDEX", default=True, cast=bool)
+PDF_INDEX_TTL = config("PDF_INDEX_TTL", default=1800.0, cast=float)
+PDF_INDEX_MAX_DOCUMENTS = config("PDF_INDEX_MAX_DOCUMENTS", default=256, cast=int)
+PDF_CHUNK_CHARS = config("PDF_CHUNK_CHARS", default=1200, cast=int)
+PDF_INDEX_TOP_K = config("PDF_INDEX_TOP_K", default=6, cast=int)
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+CHARS_PER_TOKEN = 4
+
+_PAGE_RE = re.compile(r"^--- Page (\d+) ---$", re.MULTILINE)
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from has have how in is it its of on or our "
+    "that the their this to was were what when where which who why will with".split()
+)
+
+
+def document_digest(pdf_bytes: bytes) -> str:
+    return hashlib.sha256(pdf_bytes).hexdigest()[:32]
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def chunk_pages(text: str, *, size: int = PDF_CHUNK_CHARS) -> List[Tuple[int, str]]:
+    """(page, text) chunks of about `size` characters from downconverted text, never spanning pages."""
+    parts = _PAGE_RE.split(text)
+    chunks: List[Tuple[int, str]] = []
+    for number, body in zip(parts[1::2], parts[2::2]):
+        current: List[str] = []
+        length = 0
+        for line in body.strip().splitlines():
+            # Over-long lines (text without line breaks) are cut at the chunk size.
+            for start in range(0, max(len(line), 1), size):
+                piece = line[start:start + size]
+                if current and length + len(piece) > size:
+                    chunks.append((int(number), "\n".join(current)))
+                    current, length = [], 0
+                current.append(piece)
+                length += len(piece) + 1
+        if "".join(current).strip():
+            chunks.append((int(number), "\n".join(current)))
+    return chunks
+
+
+class DocumentIndex:
+    __slots__ = ("text_chars", "binary_pages", "binary_pdf", "_chunks", "_pages", "_lengths", "_avg_length", "_postings")
+
+    def __init__(self, text: str, *, binary_pages: Iterable[int] = (), binary_pdf: Optional[bytes] = None):
+        chunks = chunk_pages(text)
+        self.text_chars = len(text)
+        self.binary_pages = list(binary_pages)
+        self.binary_pdf = binary_pdf
+        self._chunks = [zlib.compress(chunk.encode("utf-8")) for _, chunk in chunks]
+        self._pages = array("I", (page for page, _ in chunks))
+        self._lengths = array("I")
+        # term -> (chunk ids, term frequencies), both in chunk order.
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        for i, (_, chunk) in enumerate(chunks):
+            counts = Counter(tokenize(chunk))
+            self._lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                ids, tfs = self._postings.get(term) or self._postings.setdefault(term, (array("I"), array("H")))
+                ids.append(i)
+                tfs.append(min(tf, 0xFFFF))
+        self._avg_length = (sum(self._lengths) / len(self._lengths)) if chunks else 0.0
+
+    def __len__(self) -> int:
+        return len(self._chunks)
+
+    def chunk(self, i: int) -> str:
+        return zlib.decompress(self._chunks[i]).decode("utf-8")
+
+    def search(self, query: str, k: int) -> List[int]:
+        """Ids of the k best-scoring chunks for the query, best first."""
+        n = len(self._chunks)
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            entry = self._postings.get(term)
+            if entry is None:
+                continue
+            ids, tfs = entry
+            idf = math.log(1 + (n - len(ids) + 0.5) / (len(ids) + 0.5))
+            for i, tf in zip(ids, tfs):
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[i] / self._avg_length)
+                scores[i] = scores.get(i, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return heapq.nlargest(k, scores, key=lambda i: (scores[i], -i))
+
+    def excerpts(self, query: str, k: int = PDF_INDEX_TOP_K) -> Tuple[str, List[int]]:
+        """(text of the top-k chunks in document order with page markers, chunk ids)."""
+        ids = self.search(query, k)
+        if not ids:
+            # Nothing in the question matches the text (e.g. "summarize"): use the opening.
+            ids = list(range(min(k, len(self._chunks))))
+        ids.sort()
+        text = "\n\n".join(f"--- Page {self._pages[i]} ---\n{self.chunk(i)}" for i in ids)
+        return text, ids
+
+    def estimated_tokens(self) -> int:
+        return self.text_chars // CHARS_PER_TOKEN
+
+
+class DocumentStore:
+    def __init__(self, *, ttl: float = PDF_INDEX_TTL, max_documents: int = PDF_INDEX_MAX_DOCUMENTS, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_documents = max_documents
+        self._clock = clock
+        self._lock = threading.Lock()
+        # (session, document) -> (last used, index), least recently used first.
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, DocumentIndex]]" = OrderedDict()
+
+    def _evict_idle(self, now: float) -> None:
+        # Entries are in last-use order, so the idle ones are at the front.
+        while self._entries:
+            key, (used, _) = next(iter(self._entries.items()))
+            if now - used < self.ttl:
+                break
+            del self._entries[key]
+
+    def get(self, session_id: str, document_id: str) -> Optional[DocumentIndex]:
+        key = (session_id, document_id)
+        with self._lock:
+            now = self._clock()
+            self._evict_idle(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = (now, entry[1])
+                self._entries.move_to_end(key)
+        PDF_INDEX_LOOKUPS.labels(result="hit" if entry is not None else "miss").inc()
+        return entry[1] if entry is not None else None
+
+    def put(self, session_id: str, document_id: str, index: DocumentIndex) -> None:
+        if self.ttl <= 0 or self.max_documents <= 0:
+            return
+        key = (session_id, document_id)
+        with self._lock:
+            now = self._clock()
+            self._evict_idle(now)
+            self._entries[key] = (now, index)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_documents:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+document_store = DocumentStore()
@@ -1,3 +1,208 @@
-from django.test import TestCase
+import io
+import unittest
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory, SimpleTestCase
+
+from pdf_chat import downconvert as dc
+from pdf_chat.index import DocumentIndex, DocumentStore, chunk_pages, document_store, tokenize
+from pdf_chat.views import _estimated_prompt_tokens, pdf_chat
+
+
+def make_pdf(pages):
+    """Minimal PDF with one Helvetica text page per entry of `pages`."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        lines = [f"BT /F1 10 Tf 40 {780 - 14 * i} Td ({line}) Tj ET" for i, line in enumerate(text.splitlines())]
+        stream = "\n".join(lines).encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>"
+            % (len(objects))
+        )
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % k for k in kids), len(kids))
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % i + obj + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    out.write(b"".join(b"%010d 00000 n \n" % o for o in offsets))
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+TEXT_PAGE = "\n".join(f"Line {i} enterprise adoption drove cloud revenue growth" for i in range(30))
+
+
+@unittest.skipIf(dc.PdfReader is None, "pypdf is not installed")
+class DownconvertTests(SimpleTestCase):
+    def test_text_pages_and_scanned_pages(self):
+        conversion = dc.extract(make_pdf([TEXT_PAGE] * 3 + ["tiny"]))
+        self.assertEqual((conversion.pages, conversion.text_pages, conversion.binary_pages), (4, 3, [4]))
+        self.assertIn("--- Page 2 ---\nLine 0 enterprise", conversion.text)
+        self.assertTrue(conversion.binary_pdf.startswith(b"%PDF"))
+        self.assertLess(conversion.estimated_tokens(), conversion.estimated_raw_tokens())
+
+    def test_mostly_scanned_documents_are_sent_unchanged(self):
+        self.assertIsNone(dc.extract(make_pdf(["tiny"] * 3 + [TEXT_PAGE])))
+
+    def test_unparseable_upload_falls_back(self):
+        with self.assertLogs("pdf_chat.downconvert", "WARNING"):
+            self.assertIsNone(dc.downconvert(b"not a pdf"))
+
+    def test_timeout_kills_the_extraction_and_recovers(self):
+        pdf = make_pdf([TEXT_PAGE] * 2)
+        dc.downconvert(pdf)  # warm the pool
+        pool = dc._pool
+        processes = list(pool._processes.values())
+        with self.assertLogs("pdf_chat.downconvert", "WARNING"):
+            self.assertIsNone(dc.downconvert(pdf, timeout=0))
+        for process in processes:
+            process.join(5)
+            self.assertFalse(process.is_alive())
+        self.assertIsNot(dc._pool, pool)
+        self.assertEqual(dc.downconvert(pdf).pages, 2)
+
+    def test_timeout_spares_extractions_other_requests_wait_on(self):
+        pdf = make_pdf([TEXT_PAGE] * 2)
+        dc.downconvert(pdf)  # warm the pool
+        pool = dc._acquire_pool()  # another request still waiting on this pool
+        processes = list(pool._processes.values())
+        with self.assertLogs("pdf_chat.downconvert", "WARNING"):
+            self.assertIsNone(dc.downconvert(pdf, timeout=0))
+        self.assertIsNot(dc._pool, pool)
+        self.assertTrue(all(process.is_alive() for process in processes))
+        self.assertEqual(pool.submit(len, "abc").result(timeout=30), 3)
+
+        dc._release_pool(pool)
+        for process in processes:
+            process.join(5)
+            self.assertFalse(process.is_alive())
+
+
+class EstimatedPromptTokensTests(SimpleTestCase):
+    def test_raw_pdfs_count_page_objects(self):
+        self.assertEqual(_estimated_prompt_tokens(None, make_pdf(["a", "b", "c"])), 3 * dc.PDF_PAGE_TOKENS)
+        self.assertEqual(_estimated_prompt_tokens(None, b"%PDF-1.7 compressed"), dc.PDF_PAGE_TOKENS)
+
+    @unittest.skipIf(dc.PdfReader is None, "pypdf is not installed")
+    def test_text_first_uses_the_extraction(self):
+        conversion = dc.extract(make_pdf([TEXT_PAGE] * 2))
+        self.assertEqual(_estimated_prompt_tokens(conversion, b""), conversion.estimated_tokens())
+
+
+INDEXED_TEXT = (
+    "--- Page 1 ---\nCompany overview and mission statement.\n"
+    "--- Page 2 ---\nCloud revenue grew strongly on enterprise demand.\n"
+    "--- Page 3 ---\nRisk factors include supply chain constraints and regulation.\n"
+)
+
+
+class ChunkPagesTests(SimpleTestCase):
+    def test_chunks_never_span_pages(self):
+        self.assertEqual([page for page, _ in chunk_pages(INDEXED_TEXT)], [1, 2, 3])
+
+    def test_long_pages_and_lines_are_split(self):
+        text = "--- Page 1 ---\n" + "\n".join(["word " * 10] * 6) + "\n--- Page 2 ---\n" + "x" * 250
+        chunks = chunk_pages(text, size=100)
+        self.assertTrue(all(len(chunk) <= 110 for _, chunk in chunks))
+        self.assertEqual([page for page, _ in chunks].count(2), 3)
+        self.assertEqual("".join(chunk for page, chunk in chunks if page == 2), "x" * 250)
+
+    def test_stopwords_are_not_indexed(self):
+        self.assertEqual(tokenize("What is the Cloud revenue?"), ["cloud", "revenue"])
+
+
+class DocumentIndexTests(SimpleTestCase):
+    index = DocumentIndex(INDEXED_TEXT)
+
+    def test_search_ranks_matching_chunks(self):
+        self.assertEqual(self.index.search("What are the risk factors?", 2), [2])
+        self.assertEqual(self.index.search("cloud revenue risk", 3)[0], 1)
+
+    def test_excerpts_keep_document_order_and_page_markers(self):
+        text, ids = self.index.excerpts("regulation and cloud", k=2)
+        self.assertEqual(ids, [1, 2])
+        self.assertTrue(text.startswith("--- Page 2 ---\nCloud revenue"))
+
+    def test_unmatched_question_uses_the_opening(self):
+        self.assertEqual(self.index.excerpts("summarize", k=1)[1], [0])
+
+
+class DocumentStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.store = DocumentStore(ttl=60, max_documents=2, clock=lambda: self.now)
+        self.index = DocumentIndex(INDEXED_TEXT)
+
+    def test_documents_are_per_session(self):
+        self.store.put("s1", "doc", self.index)
+        self.assertIs(self.store.get("s1", "doc"), self.index)
+        self.assertIsNone(self.store.get("s2", "doc"))
+
+    def test_idle_documents_expire(self):
+        self.store.put("s1", "doc", self.index)
+        self.now = 30
+        self.assertIsNotNone(self.store.get("s1", "doc"))
+        self.now = 89
+        self.assertIsNotNone(self.store.get("s1", "doc"))
+        self.now = 150
+        self.assertIsNone(self.store.get("s1", "doc"))
+
+    def test_least_recently_used_is_evicted(self):
+        for doc in ("a", "b"):
+            self.store.put("s", doc, self.index)
+        self.store.get("s", "a")
+        self.store.put("s", "c", self.index)
+        self.assertIsNone(self.store.get("s", "b"))
+        self.assertEqual(len(self.store), 2)
+
+
+@unittest.skipIf(dc.PdfReader is None, "pypdf is not installed")
+@mock.patch("pdf_chat.views._get_api_key", return_value="test-key")
+class FollowUpTests(SimpleTestCase):
+    factory = RequestFactory()
+
+    def setUp(self):
+        self.addCleanup(document_store.clear)
+        pages = [TEXT_PAGE, "Risk factors include export controls on accelerators.\n" * 30]
+        self.pdf = make_pdf(pages)
+
+    def post(self, **data):
+        with mock.patch("pdf_chat.views.generate_content", return_value=SimpleNamespace(text="ok")) as generate:
+            response = pdf_chat(self.factory.post("/pdf/", data))
+        return response, generate.call_args
+
+    def test_follow_up_sends_only_matching_excerpts(self, _):
+        first, _ = self.post(pdf=SimpleUploadedFile("a.pdf", self.pdf), session_id="s1", prompt="Summarize")
+        self.assertEqual(first.data["pdf_stats"]["mode"], "text_first")
+        document_id = first.data["document_id"]
+
+        follow_up, call = self.post(document_id=document_id, session_id="s1", prompt="What about export controls?")
+        self.assertEqual(follow_up.data["pdf_stats"]["mode"], "index")
+        excerpts = call.args[0][2]
+        self.assertIn("--- Page 2 ---", excerpts)
+        self.assertNotIn("--- Page 1 ---", excerpts)
+
+    def test_unknown_document_needs_a_new_upload(self, _):
+        response, call = self.post(document_id="missing", session_id="s1", prompt="Again")
+        self.assertEqual(response.status_code, 404)
+        self.assertIsNone(call)
+        self.assertTrue(response.data["reupload_required"])
+
+    def test_follow_up_on_another_worker_is_answered_from_a_new_upload(self, _):
+        first, _ = self.post(pdf=SimpleUploadedFile("a.pdf", self.pdf), session_id="s1", prompt="Summarize")
+        document_store.clear()  # what another worker's store looks like
+        missed, _ = self.post(document_id=first.data["document_id"], session_id="s1", prompt="Export controls?")
+        self.assertTrue(missed.data["reupload_required"])
+
+        resent, _ = self.post(pdf=SimpleUploadedFile("a.pdf", self.pdf), session_id="s1", prompt="Export controls?")
+        self.assertEqual(resent.status_code, 200)
+        self.assertEqual(resent.data["document_id"], first.data["document_id"])
@@ -2,10 +2,16 @@ from decouple import config
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 import logging
+import re
+import time
 
-from google.genai import types
-
+from APIs.admission import admission_control
 from APIs.gemini_client import generate_content
+from APIs.metrics import PDF_PAGES, PDF_TOKENS_SAVED, observe_upload, stage_timer, track_request
+from APIs.model_router import pdf_request_class
+from pdf_chat.downconvert import PDF_PAGE_TOKENS, downconvert
+from pdf_chat.index import CHARS_PER_TOKEN, PDF_INDEX, DocumentIndex, document_digest, document_store
+from usage.tracking import token_counts
 
 
 # ================================
@@ -46,6 +52,9 @@ Produce a structured MARKET INTELLIGENCE REPORT with:
 """
 
 
+# Page objects in an uncompressed PDF; pages inside compressed object streams are not seen.
+_PAGE_OBJECT_RE = re.compile(rb"/Type\s*/Page\b")
+
 logger = logging.getLogger(__name__)
 
 
@@ -53,6 +62,81 @@ def _get_api_key():
     return config("GEMINI_API_KEY", default=None)
 
 
+def _estimated_prompt_tokens(conversion, pdf_bytes: bytes) -> int:
+    if conversion is not None:
+        return conversion.estimated_tokens()
+    # Sent as is: every page is billed as an image (text layer not counted; a rough lower bound).
+    return max(1, len(_PAGE_OBJECT_RE.findall(pdf_bytes))) * PDF_PAGE_TOKENS
+
+
+def _pdf_stats(conversion, response, extract_ms: float, model_ms: float, request_class: str) -> dict:
+    # Per-request savings of text-first mode; token figures are estimates (see pdf_chat.downconvert).
+    counts = token_counts(response)
+    stats = {
+        "mode": "raw" if conversion is None else "text_first",
+        "request_class": request_class,
+        "prompt_tokens": counts[0] if counts else None,
+        "extract_ms": round(extract_ms, 1),
+        "model_ms": round(model_ms, 1),
+    }
+    if conversion is not None:
+        saved = max(0, conversion.estimated_raw_tokens() - conversion.estimated_tokens())
+        PDF_PAGES.labels("text").inc(conversion.text_pages)
+        PDF_PAGES.labels("binary").inc(len(conversion.binary_pages))
+        PDF_TOKENS_SAVED.inc(saved)
+        stats.update(
+            pages=conversion.pages,
+            text_pages=conversion.text_pages,
+            binary_pages=conversion.binary_pages,
+            estimated_raw_tokens=conversion.estimated_raw_tokens(),
+            estimated_tokens_saved=saved,
+        )
+    return stats
+
+
+def _binary_pages_parts(binary_pages, binary_pdf, types) -> list:
+    if not binary_pdf:
+        return []
+    pages = ", ".join(map(str, binary_pages))
+    return [
+        f"Original pages {pages} (scanned or with figures) are attached as a PDF:",
+        types.Part.from_bytes(data=binary_pdf, mime_type="application/pdf"),
+    ]
+
+
+def _answer_follow_up(prompt, index, document_id, session_id, types):
+    # Follow-up on an indexed document: only the chunks most relevant to the question are sent.
+    retrieve_start = time.perf_counter()
+    with stage_timer("pdf", "retrieve"):
+        excerpts, chunk_ids = index.excerpts(prompt)
+    retrieve_ms = (time.perf_counter() - retrieve_start) * 1000
+
+    contents = [MARKET_SCOUT_SYSTEM_PROMPT, prompt, "DOCUMENT EXCERPTS (most relevant to this request, from the uploaded PDF):\n" + excerpts]
+    contents += _binary_pages_parts(index.binary_pages, index.binary_pdf, types)
+
+    model_start = time.perf_counter()
+    response = generate_content(contents, endpoint="pdf", session_id=session_id)
+    model_ms = (time.perf_counter() - model_start) * 1000
+
+    output_text = (getattr(response, "text", None) or "").strip()
+    if not output_text:
+        output_text = "No response generated from the PDF."
+
+    counts = token_counts(response)
+    saved = max(0, index.estimated_tokens() - len(excerpts) // CHARS_PER_TOKEN)
+    PDF_TOKENS_SAVED.inc(saved)
+    stats = {
+        "mode": "index",
+        "prompt_tokens": counts[0] if counts else None,
+        "retrieve_ms": round(retrieve_ms, 1),
+        "model_ms": round(model_ms, 1),
+        "chunks": len(index),
+        "retrieved_chunks": len(chunk_ids),
+        "estimated_tokens_saved": saved,
+    }
+    return Response({"generated_text": output_text, "pdf_stats": stats, "document_id": document_id}, status=200)
+
+
 def _is_rate_limit_error(exc):
     msg = str(exc).lower()
     return "429" in msg or "quota" in msg or "rate limit" in msg
@@ -62,6 +146,8 @@ def _is_rate_limit_error(exc):
 # PDF CHAT ENDPOINT
 # ================================
 @api_view(["POST"])
+@track_request("pdf")
+@admission_control("bulk")
 def pdf_chat(request):
 
     # ---- API KEY CHECK ----
@@ -77,38 +163,88 @@ def pdf_chat(request):
     if not prompt:
         prompt = "Analyze this document for recent product, technical, and market intelligence."
 
-    # ---- GET PDF FILE ----
+    # ---- GET PDF FILE (or a document indexed earlier in this session) ----
+    session_id = request.data.get("session_id")
     pdf_file = request.FILES.get("pdf")
-    if not pdf_file:
+    document_id = request.data.get("document_id")
+    if not pdf_file and not document_id:
         return Response(
             {"generated_text": "No PDF uploaded"},
             status=400
         )
 
-    # ---- READ PDF ----
-    try:
-        pdf_bytes = pdf_file.read()
-    except Exception:
-        return Response(
-            {"generated_text": "Could not read uploaded PDF"},
-            status=400
-        )
+    pdf_bytes = None
+    if pdf_file:
+        try:
+            pdf_bytes = pdf_file.read()
+        except Exception:
+            return Response(
+                {"generated_text": "Could not read uploaded PDF"},
+                status=400
+            )
+
+        if not pdf_bytes:
+            return Response(
+                {"generated_text": "Uploaded PDF is empty"},
+                status=400
+            )
+        observe_upload("pdf", len(pdf_bytes))
+        document_id = document_digest(pdf_bytes)
 
-    if not pdf_bytes:
+    index = document_store.get(session_id, document_id) if PDF_INDEX and session_id else None
+    if index is None and pdf_bytes is None:
+        # Indexes live in one worker process, so another worker (or an expired index) needs the file again.
         return Response(
-            {"generated_text": "Uploaded PDF is empty"},
-            status=400
+            {
+                "generated_text": "This document is no longer available. Please upload the PDF again.",
+                "document_id": document_id,
+                "reupload_required": True,
+            },
+            status=404
         )
 
     try:
-        pdf_part = types.Part.from_bytes(data=pdf_bytes, mime_type="application/pdf")
-        response = generate_content([MARKET_SCOUT_SYSTEM_PROMPT, prompt, pdf_part])
+        # Imported lazily: google.genai dominates worker import time (see APIs.gemini_client).
+        from google.genai import types
+
+        if index is not None:
+            return _answer_follow_up(prompt, index, document_id, session_id, types)
+
+        extract_start = time.perf_counter()
+        with stage_timer("pdf", "extract"):
+            conversion = downconvert(pdf_bytes)
+        extract_ms = (time.perf_counter() - extract_start) * 1000
+
+        if conversion is None:
+            contents = [MARKET_SCOUT_SYSTEM_PROMPT, prompt, types.Part.from_bytes(data=pdf_bytes, mime_type="application/pdf")]
+        else:
+            contents = [MARKET_SCOUT_SYSTEM_PROMPT, prompt, "DOCUMENT TEXT (extracted from the uploaded PDF):\n" + conversion.text]
+            contents += _binary_pages_parts(conversion.binary_pages, conversion.binary_pdf, types)
+
+        # Large documents go to the pdf_large model class (see APIs.model_router).
+        request_class = pdf_request_class(_estimated_prompt_tokens(conversion, pdf_bytes))
+        model_start = time.perf_counter()
+        response = generate_content(contents, endpoint="pdf", session_id=session_id, request_class=request_class)
+        model_ms = (time.perf_counter() - model_start) * 1000
 
         output_text = (getattr(response, "text", None) or "").strip()
         if not output_text:
             output_text = "No response generated from the PDF."
 
-        return Response({"generated_text": output_text}, status=200)
+        payload = {
+            "generated_text": output_text,
+            "pdf_stats": _pdf_stats(conversion, response, extract_ms, model_ms, request_class),
+        }
+        # Only text-first documents can be indexed; follow-ups then skip re-sending the document.
+        if conversion is not None and PDF_INDEX and session_id:
+            with stage_timer("pdf", "index"):
+                document_store.put(
+                    session_id,
+                    document_id,
+                    DocumentIndex(conversion.text, binary_pages=conversion.binary_pages, binary_pdf=conversion.binary_pdf),
+                )
+            payload["document_id"] = document_id
+        return Response(payload, status=200)
 
     except Exception as e:
         if _is_rate_limit_error(e):
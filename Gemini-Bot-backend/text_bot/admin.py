@@ -1,3 +1,11 @@
 from django.contrib import admin
 
-# Register your models here.
+from text_bot.models import Report
+
+
+@admin.register(Report)
+class ReportAdmin(admin.ModelAdmin):
+    list_display = ("company", "created_at", "prompt_version", "output_tokens", "size", "encoding", "chain_depth")
+    list_filter = ("encoding", "prompt_version")
+    search_fields = ("company", "content_hash")
+    exclude = ("body",)
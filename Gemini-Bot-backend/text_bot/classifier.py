@@ -0,0 +1,161 @@
+"""
+Prompt screening against configurable marker lists.
+
+All markers are compiled into one word-boundary regex whose alternation is laid out
+as a trie, so a prompt is scanned once no matter how many markers are configured,
+and "hack" no longer fires on "hackathon" (nor "story" on "history"). Common
+inflections and derivations still match, including those of silent-e stems: hacks,
+hacked, hacker, diagnosed, joker, weaponized, weaponry, fraudster.
+
+Python's re engine tries that alternation at every word start, which costs more than
+the substring scan it replaced on long prompts. Every match begins with the leading
+word characters of a marker, so the prompt's distinct words are first checked against
+a set of marker prefixes and the regex only runs when one of them could start a match.
+
+The lists live in a JSON file ({"<category>": ["marker", ...]}) that is re-read when
+its modification time changes.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, Optional, Tuple
+
+from decouple import config
+
+
+BUNDLED_MARKERS_FILE = str(Path(__file__).resolve().parent / "data" / "prompt_markers.json")
+PROMPT_MARKERS_FILE = config("PROMPT_MARKERS_FILE", default=BUNDLED_MARKERS_FILE)
+PROMPT_MARKERS_RELOAD_INTERVAL = config("PROMPT_MARKERS_RELOAD_INTERVAL", default=5.0, cast=float)
+
+# "d"/"r"/"rs" complete silent-e stems (diagnose-d, joke-r); -ize/-ise covers weaponized.
+_SUFFIXES = r"(?:s|es|d|ed|r|rs|er|ers|ing|ry|sters?|i[sz](?:e|ed|es|ing|ation))?"
+_PREFIX_LEN = 4
+_WORD_RE = re.compile(r"\w+")
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(marker: str) -> str:
+    return " ".join(marker.lower().split())
+
+
+def _trie_pattern(markers: Iterable[str]) -> str:
+    trie: Dict = {}
+    for marker in markers:
+        node = trie
+        for ch in marker:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: Dict) -> str:
+        optional = "" in node
+        branches = []
+        for ch in sorted(k for k in node if k):
+            atom = r"\s+" if ch == " " else re.escape(ch)
+            branches.append(atom + build(node[ch]))
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 and not optional else "(?:" + "|".join(branches) + ")"
+        return body + "?" if optional else body
+
+    return build(trie)
+
+
+def _marker_prefixes(markers: Iterable[str]) -> Optional[Tuple[FrozenSet[str], Tuple[int, ...]]]:
+    """Leading-word prefixes of the markers, or None when one cannot be prefiltered."""
+    prefixes = set()
+    for marker in markers:
+        head = _WORD_RE.match(marker)
+        if head is None:
+            return None
+        prefixes.add(head.group()[:_PREFIX_LEN])
+    return frozenset(prefixes), tuple(sorted({len(p) for p in prefixes}))
+
+
+def _may_match(text: str, prefilter) -> bool:
+    if prefilter is None:
+        return True
+    prefixes, lengths = prefilter
+    # Word runs never span whitespace, and splitting first is far cheaper than a regex pass over the prompt.
+    words = {word for token in set(text.split()) for word in _WORD_RE.findall(token)}
+    return any(word[:n] in prefixes for word in words for n in lengths)
+
+
+def compile_markers(markers_by_category: Dict[str, Iterable[str]]) -> Tuple[re.Pattern, Dict[str, FrozenSet[str]]]:
+    categories: Dict[str, set] = {}
+    for category, markers in markers_by_category.items():
+        for marker in markers:
+            m = _normalize(marker)
+            if m:
+                categories.setdefault(m, set()).add(category)
+    if not categories:
+        return re.compile(r"(?!)"), {}
+    pattern = re.compile(r"\b(" + _trie_pattern(categories) + r")" + _SUFFIXES + r"\b")
+    return pattern, {m: frozenset(c) for m, c in categories.items()}
+
+
+class MarkerClassifier:
+    def __init__(self, path: str, *, reload_interval: float = PROMPT_MARKERS_RELOAD_INTERVAL):
+        if not os.path.exists(path):
+            # Never start with screening disabled because of a bad path.
+            logger.error("Prompt marker file %s not found; using the bundled lists", path)
+            path = BUNDLED_MARKERS_FILE
+        self._path = path
+        self._reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._checked_at = 0.0
+        # (pattern, marker -> categories, prefilter), swapped as one object so readers never see a half-reload.
+        self._compiled = (*compile_markers({}), _marker_prefixes(()))
+        self._all_categories: FrozenSet[str] = frozenset()
+        self.reload_if_changed(force=True)
+
+    def reload_if_changed(self, *, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._checked_at < self._reload_interval:
+            return
+        with self._lock:
+            self._checked_at = now
+            try:
+                mtime = os.stat(self._path).st_mtime_ns
+            except OSError:
+                logger.warning("Prompt marker file not found: %s", self._path)
+                return
+            if mtime == self._mtime and not force:
+                return
+            try:
+                with open(self._path, encoding="utf-8") as f:
+                    markers = json.load(f)
+                pattern, categories = compile_markers(markers)
+            except (OSError, ValueError, re.error, AttributeError):
+                logger.exception("Could not load prompt markers from %s; keeping the previous lists", self._path)
+                return
+            self._compiled = (pattern, categories, _marker_prefixes(categories))
+            self._all_categories = frozenset(markers)
+            self._mtime = mtime
+            logger.info("Loaded %d prompt markers from %s", len(categories), self._path)
+
+    def classify(self, text: str) -> FrozenSet[str]:
+        self.reload_if_changed()
+        pattern, categories, prefilter = self._compiled
+        text = (text or "").lower()
+        if not _may_match(text, prefilter):
+            return frozenset()
+        found = set()
+        for m in pattern.finditer(text):
+            found |= categories[_normalize(m.group(1))]
+            if len(found) == len(self._all_categories):
+                break
+        return frozenset(found)
+
+
+prompt_classifier = MarkerClassifier(PROMPT_MARKERS_FILE)
+
+
+def classify_prompt(text: str) -> FrozenSet[str]:
+    return prompt_classifier.classify(text)
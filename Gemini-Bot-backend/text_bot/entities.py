@@ -0,0 +1,154 @@
+"""
+Company entity index: names, aliases and tickers mapped to one canonical id.
+
+Entries come from a JSON file ([{"id", "name", "aliases", "tickers"}, ...]) and are
+loaded into a token trie, so "apple", "Apple Inc." and "$AAPL" all resolve to
+"apple" in a single left-to-right pass over the prompt (leftmost, then longest
+match). Names and aliases match case-insensitively, except for entries flagged
+"match_case" (common words such as Arm or Zoom), which must be capitalized; a
+capital at the start of a sentence is not evidence ("Zoom in on Apple strategy"),
+unless the name is all the text there is. Tickers need a "$" prefix ("$NOW"), since
+capitalized words such as "AI NOW" are not tickers; only a short all-caps query
+("NVDA", "AAPL MSFT") may use bare tickers.
+"""
+
+import json
+import logging
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from decouple import config
+
+
+BUNDLED_COMPANIES_FILE = str(Path(__file__).resolve().parent / "data" / "companies.json")
+COMPANY_INDEX_FILE = config("COMPANY_INDEX_FILE", default=BUNDLED_COMPANIES_FILE)
+
+_TOKEN_RE = re.compile(r"\$?\w[\w&]*(?:[.'’]\w+)*")
+_CORPORATE_SUFFIXES = {"inc", "corp", "corporation", "co", "company", "ltd", "llc", "plc", "ag", "se", "sa", "holdings"}
+_END = ""
+
+logger = logging.getLogger(__name__)
+
+
+class Company(NamedTuple):
+    id: str
+    name: str
+
+
+def _normalize_token(token: str) -> str:
+    token = token.lstrip("$").lower()
+    for suffix in ("'s", "’s"):
+        if token.endswith(suffix):
+            return token[: -len(suffix)]
+    return token
+
+
+def _tokens(text: str) -> List[Tuple[str, str]]:
+    # (raw, normalized) pairs; the raw form is needed for the case rules.
+    return [(m.group(0), _normalize_token(m.group(0))) for m in _TOKEN_RE.finditer(text or "")]
+
+
+def canonical_id(name: str) -> str:
+    """Slug used for companies that are not in the index ("Acme Robotics Inc." -> "acme-robotics")."""
+    words = [norm for _, norm in _tokens(name)]
+    while len(words) > 1 and words[-1] in _CORPORATE_SUFFIXES:
+        words.pop()
+    return "-".join(words) or "unknown"
+
+
+class CompanyIndex:
+    def __init__(self, entries: Iterable[Dict]):
+        self._trie: Dict = {}
+        self._tickers: Dict[str, Company] = {}
+        self._match_case: Dict[str, bool] = {}
+        self.size = 0
+        for entry in entries:
+            company = Company(entry["id"], entry["name"])
+            self._match_case[company.id] = bool(entry.get("match_case"))
+            for label in [entry["name"], *entry.get("aliases", [])]:
+                self._insert(label, company)
+            for ticker in entry.get("tickers", []):
+                self._tickers[ticker.upper()] = company
+            self.size += 1
+
+    @classmethod
+    def from_file(cls, path: str) -> "CompanyIndex":
+        try:
+            with open(path, encoding="utf-8") as f:
+                return cls(json.load(f))
+        except (OSError, ValueError, KeyError):
+            logger.exception("Could not load the company index from %s; using the bundled file", path)
+            with open(BUNDLED_COMPANIES_FILE, encoding="utf-8") as f:
+                return cls(json.load(f))
+
+    def _insert(self, label: str, company: Company) -> None:
+        node = self._trie
+        for _, norm in _tokens(label):
+            node = node.setdefault(norm, {})
+        if node is not self._trie:
+            node[_END] = company
+
+    def _ticker_at(self, raw: str, bare_tickers: bool) -> Optional[Company]:
+        if raw.startswith("$"):
+            return self._tickers.get(raw[1:].upper())
+        if not bare_tickers or len(raw) < 2 or not raw.isupper():
+            return None
+        return self._tickers.get(raw)
+
+    def matches(self, text: str, *, limit: Optional[int] = None) -> List[Company]:
+        """Distinct companies mentioned in text, in order of first mention."""
+        text = text or ""
+        # Bare tickers only in a short all-caps query; in a longer one every word looks like a ticker.
+        bare_tickers = text.upper() == text and len(text.split()) <= 3
+        # Tokens are read lazily so find() on a long prompt stops at the first mention.
+        stream = _TOKEN_RE.finditer(text)
+        tokens: List[Tuple[str, str, int]] = []
+
+        def token(k: int) -> Optional[Tuple[str, str, int]]:
+            while len(tokens) <= k:
+                m = next(stream, None)
+                if m is None:
+                    return None
+                tokens.append((m.group(0), _normalize_token(m.group(0)), m.start()))
+            return tokens[k]
+
+        def capitalized(i: int, end: int) -> bool:
+            if not tokens[i][0][:1].isupper():
+                return False
+            # A multi-word name ("Arm Holdings") or the whole text ("Zoom") is a name wherever it is.
+            if end - i > 1 or (i == 0 and token(end) is None):
+                return True
+            before = text[:tokens[i][2]].rstrip(" \t\"'“‘([*-–")
+            return bool(before) and before[-1] not in ".!?:\n"
+
+        found: List[Company] = []
+        i = 0
+        while token(i) is not None:
+            raw = tokens[i][0]
+            best, best_end = self._ticker_at(raw, bare_tickers), i + 1
+            node = self._trie
+            j = i
+            while token(j) is not None and tokens[j][1] in node:
+                node = node[tokens[j][1]]
+                j += 1
+                company = node.get(_END)
+                if company and (not self._match_case[company.id] or capitalized(i, j)):
+                    best, best_end = company, j
+            if best is None:
+                i += 1
+                continue
+            if best not in found:
+                found.append(best)
+                if limit and len(found) >= limit:
+                    break
+            i = best_end
+        return found
+
+    def find(self, text: str) -> Optional[Company]:
+        """First company mentioned in text, or None."""
+        found = self.matches(text, limit=1)
+        return found[0] if found else None
+
+
+company_index = CompanyIndex.from_file(COMPANY_INDEX_FILE)
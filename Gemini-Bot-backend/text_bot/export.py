@@ -0,0 +1,137 @@
+"""
+Bulk export of stored reports as NDJSON.
+
+Reports are read straight from the Report table in keyset order (created_at, id),
+EXPORT_BATCH_SIZE rows per query, and streamed one JSON object per line. An export
+holds one batch plus a few recently decoded texts (the bases of delta-encoded
+reports) in memory, however many reports it covers. Every line carries an opaque
+cursor; passing the last cursor received resumes the export right after that
+report. Used by GET /export/reports/ and the export_reports management command.
+"""
+
+import base64
+import binascii
+import datetime
+import json
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from decouple import config
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from text_bot.models import Report
+from text_bot.reports import load_text
+
+
+EXPORT_BATCH_SIZE = config("EXPORT_BATCH_SIZE", default=200, cast=int)
+# GET /export/reports/ requires a matching X-API-Key header, and is disabled (404) while unset.
+EXPORT_API_KEY = config("EXPORT_API_KEY", default="")
+
+# Decoded texts kept for delta bases; a delta's base is almost always a recent report of the same company.
+_TEXT_CACHE_MAX = 64
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(created_at: datetime.datetime, report_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{report_id}".encode("ascii")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime.datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("ascii")
+        stamp, _, report_id = raw.rpartition("|")
+        created_at = parse_datetime(stamp)
+        if created_at is None:
+            raise ValueError(stamp)
+        return created_at, int(report_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from None
+
+
+def parse_bound(raw: str) -> Optional[datetime.datetime]:
+    """ISO 8601 datetime or date (midnight) as an aware datetime; None if unparseable."""
+    try:
+        value = parse_datetime(raw)
+        if value is None:
+            day = parse_date(raw)
+            value = datetime.datetime.combine(day, datetime.time()) if day else None
+    except ValueError:
+        return None
+    if value is not None and timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
+
+
+def _record(report: Report, text: str) -> Dict[str, Any]:
+    return {
+        "id": report.pk,
+        "company": report.company,
+        "created_at": report.created_at.isoformat(),
+        "prompt_version": report.prompt_version,
+        "model": report.model,
+        "prompt_tokens": report.prompt_tokens,
+        "cached_tokens": report.cached_tokens,
+        "output_tokens": report.output_tokens,
+        "content_hash": report.content_hash,
+        "generated_text": text,
+        "sections": report.structured,
+        "sources": report.sources,
+        "cursor": encode_cursor(report.created_at, report.pk),
+    }
+
+
+def iter_report_batches(
+    *,
+    companies: Optional[Iterable[str]] = None,
+    since: Optional[datetime.datetime] = None,
+    until: Optional[datetime.datetime] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> Iterator[List[Dict[str, Any]]]:
+    """Export records, oldest first, one list per database batch. Raises InvalidCursor up front."""
+    position = decode_cursor(cursor) if cursor else None
+    qs = Report.objects.all()
+    if companies:
+        qs = qs.filter(company__in=list(companies))
+    if since is not None:
+        qs = qs.filter(created_at__gte=since)
+    if until is not None:
+        qs = qs.filter(created_at__lt=until)
+    qs = qs.order_by("created_at", "id")
+    return _batches(qs, position, limit, max(1, batch_size))
+
+
+def _batches(qs, position, remaining, batch_size) -> Iterator[List[Dict[str, Any]]]:
+    texts: "OrderedDict[int, str]" = OrderedDict()
+    while remaining is None or remaining > 0:
+        page = qs
+        if position is not None:
+            created_at, report_id = position
+            page = page.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=report_id))
+        size = batch_size if remaining is None else min(batch_size, remaining)
+        batch = list(page[:size])
+        records = []
+        for report in batch:
+            records.append(_record(report, load_text(report, texts)))
+            while len(texts) > _TEXT_CACHE_MAX:
+                texts.popitem(last=False)
+        if records:
+            yield records
+        if len(batch) < size:
+            return
+        position = (batch[-1].created_at, batch[-1].pk)
+        if remaining is not None:
+            remaining -= len(batch)
+
+
+def ndjson_chunks(batches: Iterable[List[Dict[str, Any]]]) -> Iterator[bytes]:
+    """One bytes chunk of newline-delimited JSON per batch."""
+    for records in batches:
+        yield "".join(json.dumps(r, ensure_ascii=False, separators=(",", ":")) + "\n" for r in records).encode("utf-8")
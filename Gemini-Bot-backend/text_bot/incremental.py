@@ -0,0 +1,122 @@
+"""
+Section-level refresh of a stored Market Intelligence Report.
+
+Every verified source carries the planner query it came from, and each planner
+topic feeds known report sections. Comparing the new verified sources (title and
+publication date) with the ones behind the previous report for the same company
+tells which sections are stale: none (the stored report is reused as is), a few
+(only those are re-synthesized and spliced into the stored text), or too many (full
+regeneration). A report older than the recency window is always regenerated.
+"""
+
+import datetime
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from decouple import config
+from django.utils import timezone
+
+from text_bot.sources import Source
+
+
+REPORT_SECTIONS = {
+    1: "Executive Summary",
+    2: "Product Updates",
+    3: "Technical Changes",
+    4: "Market / GTM Signals",
+    5: "Competitive Intelligence",
+    6: "Business Impact",
+    7: "Risks / Watchlist",
+}
+
+# Planner topic -> report sections its sources feed. The Executive Summary is
+# refreshed whenever anything else is.
+PLANNER_TOPICS: List[Tuple[str, Tuple[int, ...]]] = [
+    ("developer release notes", (2, 3)),
+    ("new AI or API features", (2, 4)),
+    ("platform or infrastructure updates", (3,)),
+    ("security patch or incident update", (7,)),
+]
+
+# Above this many stale sections a full regeneration is cheaper and more coherent.
+INCREMENTAL_MAX_SECTIONS = config("INCREMENTAL_MAX_SECTIONS", default=4, cast=int)
+
+_HEADING_RE = re.compile(
+    r"(?m)^[ \t]*([1-7])\)[ \t]*(?:Executive|Product|Technical|Market|Competitive|Business|Risks)\b.*$"
+)
+_SOURCES_RE = re.compile(r"(?im)^sources\s*:?.*$")
+
+
+def sections_for_query(query: str) -> Tuple[int, ...]:
+    q = (query or "").lower()
+    for topic, sections in PLANNER_TOPICS:
+        if topic.lower() in q:
+            return sections
+    # Unknown provenance: assume it can touch any section.
+    return tuple(REPORT_SECTIONS)
+
+
+def _source_key(source: Source) -> Tuple[str, Optional[datetime.date]]:
+    # A stable title with a new date (a recurring release-notes page, say) is new content.
+    return source.title_key, source.publication_date
+
+
+def stale_sections(previous_sources: Iterable[Source], new_sources: Iterable[Source]) -> List[int]:
+    """Sections fed by a source that was added, dropped or re-dated since the previous report."""
+    previous = {_source_key(s): s for s in previous_sources}
+    current = {_source_key(s): s for s in new_sources}
+    changed = [current[k] for k in current.keys() - previous.keys()] + [previous[k] for k in previous.keys() - current.keys()]
+    stale = set()
+    for src in changed:
+        stale.update(sections_for_query(src.query))
+    if stale:
+        stale.add(1)
+    return sorted(stale)
+
+
+def plan_refresh(
+    previous, new_sources: List[Source], *, prompt_version: str, max_age: datetime.timedelta,
+) -> Tuple[str, List[int]]:
+    """("reuse" | "incremental" | "full", sections to regenerate) for a stored report or None."""
+    if previous is None or not previous.sources or previous.prompt_version != prompt_version:
+        return "full", list(REPORT_SECTIONS)
+    if timezone.now() - previous.created_at > max_age:
+        # Sections fed by undated sources would otherwise be served from an outdated report.
+        return "full", list(REPORT_SECTIONS)
+    stale = stale_sections(previous.sources, new_sources)
+    if not stale:
+        return "reuse", []
+    parsed = split_sections(previous.text)
+    if len(stale) > INCREMENTAL_MAX_SECTIONS or parsed is None or set(parsed[1]) != set(REPORT_SECTIONS):
+        return "full", list(REPORT_SECTIONS)
+    return "incremental", stale
+
+
+def split_sections(text: str) -> Optional[Tuple[str, Dict[int, str], str]]:
+    """(title block, {section number: block}, sources block), or None if there are no section headings."""
+    text = text or ""
+    m = _SOURCES_RE.search(text)
+    body_end = m.start() if m else len(text)
+    heads = list(_HEADING_RE.finditer(text, 0, body_end))
+    sections: Dict[int, str] = {}
+    for i, head in enumerate(heads):
+        end = heads[i + 1].start() if i + 1 < len(heads) else body_end
+        sections.setdefault(int(head.group(1)), text[head.start():end].strip())
+    if not heads:
+        return None
+    return text[: heads[0].start()].strip(), sections, text[body_end:].strip()
+
+
+def splice_sections(previous_text: str, update_text: str, sections: List[int]) -> Optional[str]:
+    """previous_text with the given sections replaced by those in update_text, or None if any is missing."""
+    previous = split_sections(previous_text)
+    update = split_sections(update_text)
+    if previous is None or update is None:
+        return None
+    title, blocks, tail = previous
+    for n in sections:
+        if n not in update[1]:
+            return None
+        blocks[n] = update[1][n]
+    parts = [title] + [blocks[n] for n in sorted(blocks)] + ([tail] if tail else [])
+    return "\n\n".join(p for p in parts if p) + "\n"
@@ -0,0 +1,60 @@
+import gzip
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from text_bot.export import EXPORT_BATCH_SIZE, InvalidCursor, iter_report_batches, ndjson_chunks, parse_bound
+
+
+class Command(BaseCommand):
+    help = "Stream stored reports as NDJSON, oldest first; resumable with --cursor."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--company", action="append", default=[], help="Canonical company id (repeatable; 'apple+microsoft' for a comparison).")
+        parser.add_argument("--since", help="Only reports created at or after this ISO 8601 date/datetime.")
+        parser.add_argument("--until", help="Only reports created before this ISO 8601 date/datetime.")
+        parser.add_argument("--cursor", help="Resume after the report this cursor was taken from.")
+        parser.add_argument("--limit", type=int, help="Stop after this many reports.")
+        parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE, help=f"Reports per database query (default: {EXPORT_BATCH_SIZE}).")
+        parser.add_argument("--output", "-o", default="-", help="Output file (default: stdout); a .gz name implies --gzip.")
+        parser.add_argument("--gzip", action="store_true", help="gzip-compress the output.")
+
+    def handle(self, *args, **options):
+        bounds = {}
+        for name in ("since", "until"):
+            if options[name]:
+                bounds[name] = parse_bound(options[name])
+                if bounds[name] is None:
+                    raise CommandError(f"Invalid --{name}: {options[name]}")
+        try:
+            batches = iter_report_batches(
+                companies=options["company"], cursor=options["cursor"], limit=options["limit"],
+                batch_size=options["batch_size"], **bounds,
+            )
+        except InvalidCursor as e:
+            raise CommandError(str(e))
+
+        output = options["output"]
+        raw = sys.stdout.buffer if output == "-" else open(output, "wb")
+        out = gzip.GzipFile(fileobj=raw, mode="wb") if options["gzip"] or output.endswith(".gz") else raw
+        count, cursor = 0, None
+
+        def tracked():
+            nonlocal count, cursor
+            for records in batches:
+                yield records
+                count += len(records)
+                cursor = records[-1]["cursor"]
+
+        try:
+            for chunk in ndjson_chunks(tracked()):
+                out.write(chunk)
+        finally:
+            if out is not raw:
+                out.close()
+            if raw is not sys.stdout.buffer:
+                raw.close()
+            else:
+                raw.flush()
+            resume = f" Resume with --cursor {cursor}" if cursor else ""
+            self.stderr.write(f"Exported {count} report(s).{resume}")
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from text_bot.reports import REPORT_KEEP_PER_COMPANY, REPORT_RETENTION_DAYS, prune_reports
+
+
+class Command(BaseCommand):
+    help = "Apply the report retention policy: drop old reports and cap history per company (the newest report is always kept)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--retention-days", type=int, default=REPORT_RETENTION_DAYS, help=f"Delete reports older than this (default: {REPORT_RETENTION_DAYS}).")
+        parser.add_argument("--keep-per-company", type=int, default=REPORT_KEEP_PER_COMPANY, help=f"Keep at most this many reports per company (default: {REPORT_KEEP_PER_COMPANY}).")
+
+    def handle(self, *args, **options):
+        deleted = prune_reports(retention_days=options["retention_days"], keep_per_company=options["keep_per_company"])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} report(s)."))
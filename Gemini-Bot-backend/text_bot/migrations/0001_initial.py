@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:14
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Report',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('company', models.CharField(max_length=128)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('prompt_version', models.CharField(max_length=16)),
+                ('model', models.CharField(blank=True, default='', max_length=64)),
+                ('prompt_tokens', models.PositiveIntegerField(default=0)),
+                ('cached_tokens', models.PositiveIntegerField(default=0)),
+                ('output_tokens', models.PositiveIntegerField(default=0)),
+                ('content_hash', models.CharField(max_length=64)),
+                ('size', models.PositiveIntegerField(help_text='Uncompressed body size in bytes.')),
+                ('encoding', models.CharField(choices=[('zlib', 'zlib'), ('zdict', 'zlib delta against base')], default='zlib', max_length=8)),
+                ('chain_depth', models.PositiveSmallIntegerField(default=0)),
+                ('body', models.BinaryField()),
+                ('base', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='deltas', to='text_bot.report')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['company', '-created_at'], name='report_company_latest'), models.Index(fields=['created_at'], name='report_created_at')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('text_bot', '0002_report_sources'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='report',
+            name='structured',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
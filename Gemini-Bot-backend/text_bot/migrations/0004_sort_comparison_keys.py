@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+def sort_comparison_keys(apps, schema_editor):
+    # Comparison keys were stored in prompt order ("microsoft+apple"); they are now sorted.
+    Report = apps.get_model("text_bot", "Report")
+    keys = Report.objects.filter(company__contains="+").values_list("company", flat=True).distinct()
+    for key in list(keys):
+        sorted_key = "+".join(sorted(key.split("+")))
+        if sorted_key != key:
+            Report.objects.filter(company=key).update(company=sorted_key)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('text_bot', '0003_report_structured'),
+    ]
+
+    operations = [
+        migrations.RunPython(sort_comparison_keys, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,38 @@
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+
+class Report(models.Model):
+    """
+    One generated Market Intelligence Report. Bodies are zlib-compressed; a report that
+    is nearly identical to the previous one for the same company is stored as a delta
+    (zlib with the base report's text as preset dictionary). See text_bot.reports.
+    """
+
+    ENCODING_ZLIB = "zlib"
+    ENCODING_DELTA = "zdict"
+    ENCODING_CHOICES = [(ENCODING_ZLIB, "zlib"), (ENCODING_DELTA, "zlib delta against base")]
+
+    company = models.CharField(max_length=128)
+    created_at = models.DateTimeField(default=timezone.now)
+    prompt_version = models.CharField(max_length=16)
+    model = models.CharField(max_length=64, blank=True, default="")
+    prompt_tokens = models.PositiveIntegerField(default=0)
+    cached_tokens = models.PositiveIntegerField(default=0)
+    output_tokens = models.PositiveIntegerField(default=0)
+    content_hash = models.CharField(max_length=64)
+    size = models.PositiveIntegerField(help_text="Uncompressed body size in bytes.")
+    encoding = models.CharField(max_length=8, choices=ENCODING_CHOICES, default=ENCODING_ZLIB)
+    base = models.ForeignKey("self", null=True, blank=True, on_delete=models.PROTECT, related_name="deltas")
+    chain_depth = models.PositiveSmallIntegerField(default=0)
+    body = models.BinaryField()
+    # Verified sources the report was synthesized from (title, source_type, publication_date, query).
+    sources = models.JSONField(default=list, blank=True)
+    # Section bullets from structured synthesis (text_bot.structured); null for free-text reports.
+    structured = models.JSONField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["company", "-created_at"], name="report_company_latest"),
+            models.Index(fields=["created_at"], name="report_created_at"),
+        ]
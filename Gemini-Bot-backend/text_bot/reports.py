@@ -0,0 +1,207 @@
+"""
+Report history in the project database (text_bot.models.Report).
+
+Reports are keyed by canonical company id ("apple", or "apple+microsoft" for a
+comparison) and carry a SHA-256 content hash that doubles as the strong ETag of
+GET /reports/<company>/. Bodies are zlib-compressed; when a new report is close to
+the previous one for the same company it is stored as a delta, i.e. compressed
+with the previous text as zlib preset dictionary, which typically shrinks a
+routine refresh to a few hundred bytes. prune_reports() applies the retention
+policy (see the prune_reports management command).
+"""
+
+import datetime
+import hashlib
+import logging
+import zlib
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from decouple import config
+from django.db import transaction
+from django.utils import timezone
+
+from text_bot.models import Report
+from text_bot.sources import Source
+from usage.tracking import token_counts
+
+
+REPORT_HISTORY = config("REPORT_HISTORY", default=True, cast=bool)
+# Store a delta only if it is at most this fraction of the standalone compressed body.
+REPORT_DELTA_RATIO = config("REPORT_DELTA_RATIO", default=0.5, cast=float)
+REPORT_MAX_DELTA_CHAIN = config("REPORT_MAX_DELTA_CHAIN", default=8, cast=int)
+REPORT_RETENTION_DAYS = config("REPORT_RETENTION_DAYS", default=90, cast=int)
+REPORT_KEEP_PER_COMPANY = config("REPORT_KEEP_PER_COMPANY", default=100, cast=int)
+
+_ZDICT_MAX = 32 * 1024  # zlib only uses the last 32 KB of a preset dictionary.
+
+logger = logging.getLogger(__name__)
+
+
+class StoredReport(NamedTuple):
+    company: str
+    text: str
+    content_hash: str
+    created_at: datetime.datetime
+    prompt_version: str = ""
+    sources: Tuple[Source, ...] = ()
+    structured: Optional[Dict[str, Any]] = None
+
+
+_SOURCE_FIELDS = ("title", "source_type", "publication_date", "query")
+
+
+def _stored(report: Report) -> StoredReport:
+    return StoredReport(
+        report.company, load_text(report), report.content_hash, report.created_at,
+        report.prompt_version, tuple(Source.from_dict(s) for s in report.sources or ()), report.structured,
+    )
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _compress(data: bytes, zdict: Optional[bytes] = None) -> bytes:
+    compressor = zlib.compressobj(9, zdict=zdict[-_ZDICT_MAX:]) if zdict else zlib.compressobj(9)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _decompress(body: bytes, zdict: Optional[bytes] = None) -> bytes:
+    decompressor = zlib.decompressobj(zdict=zdict[-_ZDICT_MAX:]) if zdict else zlib.decompressobj()
+    return decompressor.decompress(body) + decompressor.flush()
+
+
+def load_text(report: Report, cache: Optional[Dict[int, str]] = None) -> str:
+    """Decoded body; `cache` (report id -> text) saves base lookups when reading many reports."""
+    if report.encoding == Report.ENCODING_DELTA:
+        base_text = cache.get(report.base_id) if cache is not None else None
+        if base_text is None:
+            base_text = load_text(report.base, cache)
+        text = _decompress(bytes(report.body), base_text.encode("utf-8")).decode("utf-8")
+    else:
+        text = _decompress(bytes(report.body)).decode("utf-8")
+    if cache is not None:
+        cache[report.pk] = text
+    return text
+
+
+def _encode(text: str, previous: Optional[Report]) -> Tuple[str, Optional[Report], int, bytes]:
+    data = text.encode("utf-8")
+    full = _compress(data)
+    if previous is None or previous.chain_depth >= REPORT_MAX_DELTA_CHAIN:
+        return Report.ENCODING_ZLIB, None, 0, full
+    delta = _compress(data, load_text(previous).encode("utf-8"))
+    if len(delta) > len(full) * REPORT_DELTA_RATIO:
+        return Report.ENCODING_ZLIB, None, 0, full
+    return Report.ENCODING_DELTA, previous, previous.chain_depth + 1, delta
+
+
+def save_report(
+    company: str,
+    text: str,
+    *,
+    prompt_version: str = "",
+    model: str = "",
+    response: Any = None,
+    sources: Optional[List[Source]] = None,
+    structured: Optional[Dict[str, Any]] = None,
+) -> Optional[StoredReport]:
+    if not REPORT_HISTORY:
+        return None
+    digest = content_hash(text)
+    try:
+        previous = Report.objects.filter(company=company).order_by("-created_at").first()
+        if previous is not None and previous.content_hash == digest:
+            # Unchanged content keeps its row and timestamp so Last-Modified stays stable for pollers.
+            return _stored(previous)
+        encoding, base, depth, body = _encode(text, previous)
+        prompt_tokens, cached_tokens, output_tokens = token_counts(response) or (0, 0, 0)
+        report = Report.objects.create(
+            company=company[:128],
+            prompt_version=prompt_version,
+            model=model,
+            prompt_tokens=prompt_tokens,
+            cached_tokens=cached_tokens,
+            output_tokens=output_tokens,
+            content_hash=digest,
+            size=len(text.encode("utf-8")),
+            encoding=encoding,
+            base=base,
+            chain_depth=depth,
+            body=body,
+            sources=[src.to_dict(_SOURCE_FIELDS) for src in sources or []],
+            structured=structured,
+        )
+    except Exception:
+        # The report has already been generated; failing to archive it must not fail the request.
+        logger.exception("Could not store report. company=%s", company)
+        return None
+    return _stored(report)
+
+
+def latest_report_meta(company: str) -> Optional[Dict[str, Any]]:
+    """content_hash and created_at of the latest report, without loading the body."""
+    return Report.objects.filter(company=company).order_by("-created_at").values("content_hash", "created_at").first()
+
+
+def latest_report(company: str) -> Optional[StoredReport]:
+    report = Report.objects.filter(company=company).select_related("base").order_by("-created_at").first()
+    if report is None:
+        return None
+    return _stored(report)
+
+
+def report_by_id(company: str, report_id: int) -> Optional[StoredReport]:
+    report = Report.objects.filter(company=company, pk=report_id).first()
+    if report is None:
+        return None
+    return _stored(report)
+
+
+def report_history(
+    company: str,
+    *,
+    since: Optional[datetime.datetime] = None,
+    until: Optional[datetime.datetime] = None,
+    limit: int = 50,
+) -> List[Dict[str, Any]]:
+    qs = Report.objects.filter(company=company)
+    if since is not None:
+        qs = qs.filter(created_at__gte=since)
+    if until is not None:
+        qs = qs.filter(created_at__lt=until)
+    return list(
+        qs.order_by("-created_at").values(
+            "id", "created_at", "prompt_version", "model", "prompt_tokens", "cached_tokens",
+            "output_tokens", "content_hash", "size",
+        )[:limit]
+    )
+
+
+def prune_reports(*, retention_days: int = REPORT_RETENTION_DAYS, keep_per_company: int = REPORT_KEEP_PER_COMPANY) -> int:
+    """
+    Delete reports older than retention_days and all but the newest keep_per_company per
+    company. The newest report of every company is always kept. Deltas whose base is
+    deleted are rewritten as standalone bodies first.
+    """
+    cutoff = timezone.now() - datetime.timedelta(days=retention_days)
+    doomed = set()
+    for company in Report.objects.values_list("company", flat=True).distinct():
+        ids = list(Report.objects.filter(company=company).order_by("-created_at").values_list("id", "created_at"))
+        for position, (report_id, created_at) in enumerate(ids[1:], start=1):
+            if position >= keep_per_company or created_at < cutoff:
+                doomed.add(report_id)
+    if not doomed:
+        return 0
+
+    with transaction.atomic():
+        orphaned = Report.objects.filter(base_id__in=doomed).exclude(id__in=doomed)
+        for report in orphaned.select_related("base"):
+            text = load_text(report)
+            Report.objects.filter(pk=report.pk).update(
+                encoding=Report.ENCODING_ZLIB, base=None, chain_depth=0, body=_compress(text.encode("utf-8")),
+            )
+        # Unlink before deleting so PROTECT never sees a delta pointing into the doomed set.
+        Report.objects.filter(id__in=doomed).update(base=None)
+        deleted, _ = Report.objects.filter(id__in=doomed).delete()
+    return deleted
@@ -0,0 +1,81 @@
+"""
+Per-query source cache in front of the Browser Agent.
+
+Planner queries are built from the canonical company name, so the same query
+recurs across requests and sessions. Results are kept per normalized query in a
+bounded LRU map; an entry never outlives the recency window of the sources it
+holds (the caller passes the TTL), and empty results are cached for a shorter
+time so a query without sources is not re-fetched on every request.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from decouple import config
+
+from APIs.metrics import SOURCE_CACHE_LOOKUPS
+from text_bot.sources import Source
+
+
+SOURCE_CACHE_MAX_ENTRIES = config("SOURCE_CACHE_MAX_ENTRIES", default=2048, cast=int)
+SOURCE_CACHE_TTL = config("SOURCE_CACHE_TTL", default=3600.0, cast=float)
+SOURCE_CACHE_NEGATIVE_TTL = config("SOURCE_CACHE_NEGATIVE_TTL", default=300.0, cast=float)
+
+
+def _key(query: str) -> str:
+    return " ".join((query or "").lower().split())
+
+
+class SourceCache:
+    def __init__(
+        self,
+        *,
+        max_entries: int = SOURCE_CACHE_MAX_ENTRIES,
+        ttl: float = SOURCE_CACHE_TTL,
+        negative_ttl: float = SOURCE_CACHE_NEGATIVE_TTL,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._lock = threading.Lock()
+        # key -> (expires_at, sources); Source records are immutable, so every hit shares them.
+        self._entries: "OrderedDict[str, Tuple[float, Tuple[Source, ...]]]" = OrderedDict()
+
+    def get(self, query: str) -> Optional[List[Source]]:
+        """The cached sources, [] for a cached empty result, None on a miss."""
+        key = _key(query)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                SOURCE_CACHE_LOOKUPS.labels(result="miss").inc()
+                return None
+            self._entries.move_to_end(key)
+        SOURCE_CACHE_LOOKUPS.labels(result="hit" if entry[1] else "negative_hit").inc()
+        return list(entry[1])
+
+    def put(self, query: str, sources: List[Source], *, ttl: Optional[float] = None) -> None:
+        ttl = self.negative_ttl if not sources else min(self.ttl, self.ttl if ttl is None else ttl)
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        key = _key(query)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, tuple(sources))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+source_cache = SourceCache()
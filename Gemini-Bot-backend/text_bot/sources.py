@@ -0,0 +1,121 @@
+"""
+Typed source records for the agent pipeline.
+
+The Browser Agent produces Source records with the publication date parsed once.
+They are frozen and slotted (no per-instance __dict__), so the source cache hands the
+same objects to every request and the Verifier returns a subset of them instead of
+annotating copies; its verdict (the source's age) is derived from the record when
+needed. For large source lists SourceBatch adds a column of date ordinals next to
+the records, so the recency filter is one pass over a compact integer array and
+the title dedupe only touches the rows that survive it.
+"""
+
+import dataclasses
+import datetime
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+
+def parse_publication_date(value: Any) -> Optional[datetime.date]:
+    if isinstance(value, datetime.date):
+        return value
+    if not value:
+        return None
+    try:
+        return datetime.date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Source:
+    title: str
+    source_type: str = "source"
+    publication_date: Optional[datetime.date] = None
+    query: str = ""
+    company: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Source":
+        return cls(
+            data.get("title") or "",
+            data.get("source_type") or "source",
+            parse_publication_date(data.get("publication_date")),
+            data.get("query") or "",
+            data.get("company"),
+        )
+
+    def to_dict(self, fields: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """JSON-ready dict (ISO date) of the given fields, all by default."""
+        out = {}
+        for name in fields or (f.name for f in dataclasses.fields(self)):
+            value = getattr(self, name)
+            out[name] = value.isoformat() if isinstance(value, datetime.date) else value
+        return out
+
+    @property
+    def title_key(self) -> str:
+        return self.title.strip().lower()
+
+    def with_company(self, company: str) -> "Source":
+        return dataclasses.replace(self, company=company)
+
+    def verification_note(self, today: datetime.date) -> str:
+        if self.publication_date is None:
+            return "Date not explicitly stated – treated as recent industry signal."
+        return f"Verified: {(today - self.publication_date).days} day(s) old."
+
+
+def unique_by_title(sources: Iterable[Source]) -> List[Source]:
+    """First source per normalized title, in order; untitled sources are dropped."""
+    seen = set()
+    kept = []
+    for src in sources:
+        key = src.title.strip().lower()
+        if key and key not in seen:
+            seen.add(key)
+            kept.append(src)
+    return kept
+
+
+class SourceBatch:
+    """Sources plus a column of their publication-date ordinals (0 if undated), row for row."""
+
+    __slots__ = ("records", "ordinals")
+
+    _NO_DATE = 0  # date ordinals start at 1
+
+    def __init__(self, records: List[Source], ordinals: array):
+        self.records = records
+        self.ordinals = ordinals
+
+    @classmethod
+    def from_sources(cls, sources: Iterable[Source]) -> "SourceBatch":
+        records = list(sources)
+        no_date = cls._NO_DATE
+        ordinals = array("l", [no_date if src.publication_date is None else src.publication_date.toordinal() for src in records])
+        return cls(records, ordinals)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def recent_rows(self, today: datetime.date, max_age_days: int) -> List[int]:
+        """Rows without a date or dated within [today - max_age_days, today]."""
+        newest = today.toordinal()
+        oldest = newest - max_age_days
+        no_date = self._NO_DATE
+        return [i for i, o in enumerate(self.ordinals) if o == no_date or oldest <= o <= newest]
+
+    def unique_rows(self, rows: Sequence[int]) -> List[int]:
+        """First of the given rows per normalized title, in row order; untitled rows are dropped."""
+        records = self.records
+        # Built from the back, so for a repeated title the earliest row is the one left in the dict.
+        backwards = rows[::-1]
+        first = dict(zip([records[i].title.strip().lower() for i in backwards], backwards))
+        first.pop("", None)
+        return sorted(first.values())
+
+    def verified(self, today: datetime.date, max_age_days: int) -> List[Source]:
+        """Sources within the recency window, deduped by title, in order."""
+        records = self.records
+        return [records[i] for i in self.unique_rows(self.recent_rows(today, max_age_days))]
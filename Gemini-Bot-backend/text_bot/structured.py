@@ -0,0 +1,130 @@
+"""
+Structured (JSON) output for the Synthesizer Agent.
+
+With STRUCTURED_SYNTHESIS on, the synthesizer is called with a Gemini response
+schema and returns the seven report sections as arrays of bullets, each with the
+numbers of the verified sources it is based on. The reply is validated field by
+field, and the text report is rendered from a fixed template, so headings, bullet
+layout and source attribution no longer depend on regex clean-up of free text.
+The parsed sections (with source titles instead of numbers) are also returned to
+API clients and stored with the report.
+"""
+
+import json
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from decouple import config
+
+from text_bot.incremental import REPORT_SECTIONS
+from text_bot.sources import Source
+
+
+STRUCTURED_SYNTHESIS = config("STRUCTURED_SYNTHESIS", default=True, cast=bool)
+
+# Section number -> JSON field name.
+SECTION_FIELDS = {
+    1: "executive_summary",
+    2: "product_updates",
+    3: "technical_changes",
+    4: "market_signals",
+    5: "competitive_intelligence",
+    6: "business_impact",
+    7: "risks",
+}
+
+EMPTY_SECTION_BULLET = "No verified signals in the recent period."
+
+
+def report_schema(sections: Optional[Iterable[int]] = None, *, comparison: bool = False) -> Dict[str, Any]:
+    """Gemini response schema for the given sections (all seven by default)."""
+    bullet = {
+        "type": "object",
+        "properties": {
+            "text": {"type": "string", "description": "One bullet, without citations, links or calendar dates."},
+            "sources": {
+                "type": "array",
+                "items": {"type": "integer"},
+                "description": "Numbers of the VERIFIED SOURCES this bullet is based on.",
+            },
+        },
+        "required": ["text", "sources"],
+    }
+    if comparison:
+        bullet["properties"]["company"] = {"type": "string", "description": "Company the bullet is about."}
+        bullet["required"].append("company")
+    fields = [SECTION_FIELDS[n] for n in sorted(sections or SECTION_FIELDS)]
+    return {
+        "type": "object",
+        "properties": {field: {"type": "array", "items": bullet} for field in fields},
+        "required": fields,
+        "propertyOrdering": fields,
+    }
+
+
+def generation_config(sections: Optional[Iterable[int]] = None, *, comparison: bool = False) -> Dict[str, Any]:
+    return {"response_mime_type": "application/json", "response_schema": report_schema(sections, comparison=comparison)}
+
+
+def parse_report(
+    raw: str,
+    verified_sources: List[Source],
+    *,
+    sections: Optional[Iterable[int]] = None,
+) -> Optional[Dict[str, List[Dict[str, Any]]]]:
+    """
+    {field: [{"text", "sources", ["company"]}]} from a structured reply, with source
+    numbers resolved to titles, or None if the reply is not JSON or lacks a requested
+    section. Malformed bullets and unknown source numbers are dropped individually.
+    """
+    try:
+        data = json.loads(raw or "")
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    titles = [s.title or "Untitled" for s in verified_sources]
+    report: Dict[str, List[Dict[str, Any]]] = {}
+    for n in sorted(sections or SECTION_FIELDS):
+        items = data.get(SECTION_FIELDS[n])
+        if not isinstance(items, list):
+            return None
+        bullets = []
+        for item in items:
+            if not isinstance(item, dict) or not isinstance(item.get("text"), str) or not item["text"].strip():
+                continue
+            ids = item.get("sources") if isinstance(item.get("sources"), list) else []
+            bullet = {
+                "text": item["text"].strip().lstrip("-•* ").strip(),
+                "sources": list(dict.fromkeys(titles[i - 1] for i in ids if isinstance(i, int) and 0 < i <= len(titles))),
+            }
+            if isinstance(item.get("company"), str) and item["company"].strip():
+                bullet["company"] = item["company"].strip()
+            bullets.append(bullet)
+        report[SECTION_FIELDS[n]] = bullets
+    return report
+
+
+def clean_report(report: Dict[str, List[Dict[str, Any]]], clean: Callable[[str], str]) -> Dict[str, List[Dict[str, Any]]]:
+    """Apply a text clean-up to every bullet; bullets that end up empty are dropped."""
+    cleaned = {}
+    for field, bullets in report.items():
+        cleaned[field] = [dict(b, text=text) for b in bullets for text in [clean(b["text"])] if text]
+    return cleaned
+
+
+def render_report(report: Dict[str, List[Dict[str, Any]]], title: str, *, allow_dates: bool) -> str:
+    """Text report in the synthesizer's OUTPUT FORMAT, without the Sources section."""
+    lines = [f"MARKET INTELLIGENCE REPORT: {title}", ""]
+    for n, field in SECTION_FIELDS.items():
+        heading = REPORT_SECTIONS[n]
+        if n == 2:
+            heading += " (Last 7 Days)" if allow_dates else " (Recent Period)"
+        lines.append(f"{n}) {heading}")
+        bullets = report.get(field) or []
+        for b in bullets:
+            prefix = f"{b['company']}: " if b.get("company") else ""
+            lines.append(f"- {prefix}{b['text']}")
+        if not bullets:
+            lines.append(f"- {EMPTY_SECTION_BULLET}")
+        lines.append("")
+    return "\n".join(lines).strip() + "\n"
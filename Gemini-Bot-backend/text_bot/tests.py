@@ -1,3 +1,561 @@
-from django.test import TestCase
+import dataclasses
+import datetime
+import gzip
+import json
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.utils import timezone
+
+from text_bot.classifier import BUNDLED_MARKERS_FILE, MarkerClassifier, _marker_prefixes, _may_match, compile_markers
+from text_bot.entities import CompanyIndex, canonical_id, company_index
+from text_bot.export import InvalidCursor, decode_cursor, encode_cursor, iter_report_batches, parse_bound
+from text_bot.incremental import plan_refresh, sections_for_query, splice_sections, split_sections, stale_sections
+from text_bot.models import Report
+from text_bot.reports import StoredReport, latest_report, load_text, prune_reports, report_history, save_report
+from text_bot.source_cache import SourceCache
+from text_bot.sources import Source, SourceBatch, parse_publication_date, unique_by_title
+from text_bot.structured import EMPTY_SECTION_BULLET, SECTION_FIELDS, clean_report, parse_report, render_report, report_schema
+from text_bot.time_lock import heavily_affected, repair_report, repair_report_text, repair_text
+from text_bot.views import (
+    _browser_agent, _mock_sources_for_query, _report_key, _requested_report_key, _resolve_companies, _source_cache_ttl,
+    generate_text,
+)
+
+
+class TimeLockRepairTests(SimpleTestCase):
+    def test_neutralizes_simple_year_references(self):
+        self.assertEqual(repair_text("Apple cut prices in late 2025."), "Apple cut prices previously.")
+        self.assertEqual(repair_text("Growth since Q2 2024 continued."), "Growth previously continued.")
+        self.assertEqual(repair_text("Pricing changed (Q3 2024 launch). New tier."), "Pricing changed. New tier.")
+        self.assertEqual(repair_text("A 2024-era design."), "A earlier design.")
+
+    def test_ranges_are_dropped_not_rewritten(self):
+        self.assertEqual(repair_text("Revenue rose 20% from 2025 to 2026."), "")
+        self.assertEqual(repair_text("Sales grew in 2025 and 2026. Margins held."), "Margins held.")
+        self.assertEqual(repair_text("Sales during 2024-2026 rose."), "")
+
+    def test_from_and_by_are_not_rewritten(self):
+        self.assertEqual(repair_text("Launch expected by 2025. Shipping now."), "Shipping now.")
+        self.assertEqual(repair_text("Moved from 2025 plans."), "")
+
+    def test_headings_are_neutralized_or_reset(self):
+        text = "T\n\n1) Executive Summary (vs. 2025)\n- Fine.\n\n2) Product Updates since 2024 and 2025\n- Fine.\n"
+        repaired, affected = repair_report_text(text)
+        self.assertEqual(repaired, "T\n\n1) Executive Summary\n- Fine.\n\n2) Product Updates\n- Fine.\n")
+        self.assertEqual(affected, {1: (0, 1), 2: (0, 1)})
+
+    def test_text_without_old_years_is_untouched(self):
+        text = "Launched in 2026 (Q1 2026)."
+        self.assertEqual(repair_text(text), text)
+
+    def test_report_sections(self):
+        text = (
+            "MARKET INTELLIGENCE REPORT: X\n\n"
+            "1) Executive Summary\n- Strong quarter.\n- Revenue rose from 2025 to 2026.\n\n"
+            "2) Product Updates (Last 7 Days)\n- Shipped in 2024.\n"
+        )
+        repaired, affected = repair_report_text(text)
+        self.assertNotIn("2025", repaired)
+        self.assertIn("- Strong quarter.", repaired)
+        self.assertIn("- Shipped previously.", repaired)
+        self.assertEqual(affected, {1: (1, 2), 2: (0, 1)})
+        self.assertEqual(heavily_affected({1: (1, 2), 2: (2, 3)}), [2])
+
+    def test_structured_report(self):
+        report = {"risks": [{"text": "Expected by 2025."}, {"text": "Regulators."}], "summary": [{"text": "Fine."}]}
+        repaired, affected = repair_report(report)
+        self.assertEqual(repaired["risks"], [{"text": "Regulators."}])
+        self.assertIs(repaired["summary"], report["summary"])
+        self.assertEqual(affected, {"risks": (1, 2)})
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        start = timezone.make_aware(datetime.datetime(2026, 3, 1))
+        for n, company in enumerate(["apple", "nvidia", "apple", "apple"]):
+            save_report(company, f"MARKET INTELLIGENCE REPORT: {company}\n- point {n}\n")
+            Report.objects.filter(pk=Report.objects.latest("pk").pk).update(created_at=start + datetime.timedelta(hours=n))
+
+    def _exported(self, **kwargs):
+        return [r for batch in iter_report_batches(**kwargs) for r in batch]
+
+    def test_cursor_round_trip(self):
+        created_at = timezone.make_aware(datetime.datetime(2026, 3, 1, 12, 30))
+        self.assertEqual(decode_cursor(encode_cursor(created_at, 42)), (created_at, 42))
+        for bad in ("", "not-a-cursor", encode_cursor(created_at, 1)[:-3]):
+            with self.assertRaises(InvalidCursor):
+                decode_cursor(bad)
+
+    def test_parse_bound(self):
+        self.assertEqual(parse_bound("2026-03-01"), timezone.make_aware(datetime.datetime(2026, 3, 1)))
+        self.assertIsNone(parse_bound("yesterday"))
+
+    def test_batches_in_order_and_resumable(self):
+        records = self._exported(batch_size=3)
+        self.assertEqual([r["generated_text"].split()[-1] for r in records], ["0", "1", "2", "3"])
+        resumed = self._exported(cursor=records[1]["cursor"], batch_size=1)
+        self.assertEqual([r["id"] for r in resumed], [r["id"] for r in records[2:]])
+
+    def test_filters(self):
+        self.assertEqual(len(self._exported(companies=["apple"])), 3)
+        self.assertEqual(len(self._exported(limit=2, batch_size=1)), 2)
+        since = timezone.make_aware(datetime.datetime(2026, 3, 1, 2))
+        self.assertEqual(len(self._exported(since=since)), 2)
+
+    def test_endpoint_is_disabled_without_key(self):
+        with mock.patch("text_bot.views.EXPORT_API_KEY", ""):
+            self.assertEqual(self.client.get("/export/reports/").status_code, 404)
+
+    def test_endpoint_requires_key(self):
+        with mock.patch("text_bot.views.EXPORT_API_KEY", "secret"):
+            self.assertEqual(self.client.get("/export/reports/").status_code, 403)
+            self.assertEqual(self.client.get("/export/reports/", HTTP_X_API_KEY="wrong").status_code, 403)
+            response = self.client.get("/export/reports/?companies=nvidia", HTTP_X_API_KEY="secret")
+        self.assertEqual(response.status_code, 200)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)["company"] for line in lines], ["nvidia"])
+
+
+class ClassifierTests(SimpleTestCase):
+    classifier = MarkerClassifier(BUNDLED_MARKERS_FILE)
+
+    def test_word_boundaries(self):
+        self.assertEqual(self.classifier.classify("Who won the hackathon in our history?"), frozenset())
+        self.assertEqual(self.classifier.classify("How was the bank hacked?"), frozenset({"harmful"}))
+
+    def test_derived_forms_refused_by_the_old_substring_scan(self):
+        for word in ("diagnosed", "weaponized", "weaponry", "fraudster", "fraudsters", "joker", "hackers",
+                     "bypassed", "bombing", "recipes", "explosives"):
+            with self.subTest(word=word):
+                self.assertTrue(self.classifier.classify(f"Tell me about the {word} at Acme"))
+
+    def test_multi_word_markers_and_categories(self):
+        pattern, categories = compile_markers({"a": ["legal  advice", "poem"], "b": ["poem"]})
+        self.assertEqual(pattern.search("need legal\nadvice now").group(1), "legal\nadvice")
+        self.assertEqual(categories["poem"], frozenset({"a", "b"}))
+
+    def test_prefilter_never_skips_a_possible_match(self):
+        prefilter = _marker_prefixes(["legal advice", "ok"])
+        self.assertTrue(_may_match("need legal\nadvice", prefilter))
+        self.assertTrue(_may_match("is that okay?", prefilter))
+        self.assertFalse(_may_match("illegal advise", prefilter))
+        self.assertIsNone(_marker_prefixes(["$pump"]))
+        self.assertTrue(_may_match("anything", None))
+
+    def test_no_markers_matches_nothing(self):
+        pattern, categories = compile_markers({})
+        self.assertIsNone(pattern.search("anything"))
+        self.assertEqual(categories, {})
+
+
+class CompanyIndexTests(SimpleTestCase):
+    def ids(self, text):
+        return [c.id for c in company_index.matches(text)]
+
+    def test_names_aliases_and_tickers(self):
+        self.assertEqual(self.ids("Apple Inc. and microsoft"), ["apple", "microsoft"])
+        self.assertEqual(self.ids("What about $NOW and $aapl?"), ["servicenow", "apple"])
+        self.assertEqual(self.ids("NVDA"), ["nvidia"])
+
+    def test_bare_tickers_need_a_dollar_in_prompts(self):
+        self.assertEqual(self.ids("AI NOW report on Acme"), [])
+        self.assertEqual(self.ids("NVDA EARNINGS TODAY AND GUIDANCE"), [])
+
+    def test_match_case_entries(self):
+        self.assertEqual(self.ids("zoom earnings"), [])
+        self.assertEqual(self.ids("Latest on Zoom"), ["zoom"])
+        self.assertEqual(self.ids("Zoom"), ["zoom"])
+        self.assertEqual(self.ids("Arm Holdings roadmap"), ["arm"])
+
+    def test_sentence_initial_capital_is_not_evidence(self):
+        self.assertEqual(self.ids("Zoom in on Apple strategy"), ["apple"])
+        self.assertEqual(self.ids("Good quarter. Snap back to Intel, please"), ["intel"])
+
+    def test_leftmost_longest_match(self):
+        index = CompanyIndex([
+            {"id": "acme", "name": "Acme"},
+            {"id": "acme-robotics", "name": "Acme Robotics"},
+        ])
+        self.assertEqual([c.id for c in index.matches("acme robotics and acme")], ["acme-robotics", "acme"])
+
+    def test_canonical_id(self):
+        self.assertEqual(canonical_id("Acme Robotics Inc."), "acme-robotics")
+        self.assertEqual(canonical_id(""), "unknown")
+
+
+class ReportKeyTests(SimpleTestCase):
+    def test_comparison_key_ignores_prompt_order(self):
+        self.assertEqual(_report_key(company_index.matches("Microsoft vs Apple")), "apple+microsoft")
+        self.assertEqual(_report_key(company_index.matches("Apple vs Microsoft")), "apple+microsoft")
+        self.assertEqual(_requested_report_key("MSFT+apple"), "apple+microsoft")
+        self.assertEqual(_requested_report_key("Apple Inc."), "apple")
+
+
+def report_text(n, points=40):
+    lines = [f"- Point {i}: enterprise cloud revenue grew on sustained AI demand." for i in range(points)]
+    return "MARKET INTELLIGENCE REPORT: Apple\n" + "\n".join(lines) + f"\n- Update {n}.\n"
+
+
+class ReportStoreTests(TestCase):
+    def test_similar_reports_are_stored_as_deltas(self):
+        first = save_report("apple", report_text(0))
+        save_report("apple", report_text(1))
+        rows = list(Report.objects.order_by("pk"))
+        self.assertEqual([r.encoding for r in rows], [Report.ENCODING_ZLIB, Report.ENCODING_DELTA])
+        self.assertLess(len(rows[1].body), len(rows[0].body))
+        self.assertEqual(rows[1].base_id, rows[0].pk)
+        self.assertEqual(load_text(rows[1]), report_text(1))
+        self.assertEqual(latest_report("apple").text, report_text(1))
+        self.assertEqual(first.content_hash, rows[0].content_hash)
+
+    def test_unchanged_content_keeps_the_existing_row(self):
+        first = save_report("apple", report_text(0))
+        again = save_report("apple", report_text(0))
+        self.assertEqual(Report.objects.count(), 1)
+        self.assertEqual(again.created_at, first.created_at)
+
+    def test_delta_chains_are_capped(self):
+        with mock.patch("text_bot.reports.REPORT_MAX_DELTA_CHAIN", 2):
+            for n in range(4):
+                save_report("apple", report_text(n))
+        self.assertEqual(list(Report.objects.order_by("pk").values_list("chain_depth", flat=True)), [0, 1, 2, 0])
+
+    def test_history_is_metadata_newest_first(self):
+        for n in range(3):
+            save_report("apple", report_text(n))
+        history = report_history("apple", limit=2)
+        self.assertEqual(len(history), 2)
+        self.assertNotIn("body", history[0])
+        self.assertGreater(history[0]["id"], history[1]["id"])
+
+    def test_prune_keeps_newest_and_rewrites_orphaned_deltas(self):
+        for n in range(3):
+            save_report("apple", report_text(n))
+        old = timezone.now() - datetime.timedelta(days=30)
+        first = Report.objects.order_by("pk").first()
+        Report.objects.filter(pk=first.pk).update(created_at=old - datetime.timedelta(days=1))
+        self.assertEqual(prune_reports(retention_days=10, keep_per_company=10), 1)
+        survivor = Report.objects.order_by("pk").first()
+        self.assertEqual(survivor.encoding, Report.ENCODING_ZLIB)
+        self.assertEqual(load_text(survivor), report_text(1))
+        self.assertEqual(prune_reports(retention_days=0, keep_per_company=1), 1)
+        self.assertEqual(latest_report("apple").text, report_text(2))
+
+
+class ConditionalReportTests(TestCase):
+    def setUp(self):
+        self.stored = save_report("apple", report_text(0))
+
+    def test_compressed_report_has_its_own_validator(self):
+        response = self.client.get("/reports/AAPL/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["ETag"], f'"{self.stored.content_hash}-gzip"')
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(json.loads(gzip.decompress(response.content))["company"], "apple")
+
+    def test_if_none_match_returns_304_for_either_encoding(self):
+        for etag, encoding in ((f'"{self.stored.content_hash}-gzip"', "gzip"), (f'"{self.stored.content_hash}"', "")):
+            response = self.client.get("/reports/apple/", HTTP_IF_NONE_MATCH=etag, HTTP_ACCEPT_ENCODING=encoding)
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response["ETag"], etag)
+
+    def test_new_report_changes_the_etag(self):
+        save_report("apple", report_text(1))
+        response = self.client.get("/reports/apple/", HTTP_IF_NONE_MATCH=f'"{self.stored.content_hash}"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)["generated_text"], report_text(1))
+
+
+class SourceTests(SimpleTestCase):
+    today = datetime.date(2026, 6, 15)
+
+    def test_dict_round_trip(self):
+        data = {"title": "Q2 update", "source_type": "industry reporting", "publication_date": "2026-06-13", "query": "q", "company": "apple"}
+        source = Source.from_dict(data)
+        self.assertEqual(source.publication_date, datetime.date(2026, 6, 13))
+        self.assertEqual(source.to_dict(), data)
+        self.assertEqual(source.to_dict(["title"]), {"title": "Q2 update"})
+
+    def test_missing_or_bad_fields_get_defaults(self):
+        source = Source.from_dict({"title": None, "publication_date": "soon"})
+        self.assertEqual((source.title, source.source_type, source.publication_date), ("", "source", None))
+        self.assertIsNone(parse_publication_date(""))
+
+    def test_records_are_frozen_and_slotted(self):
+        source = Source("t")
+        with self.assertRaises(dataclasses.FrozenInstanceError):
+            source.title = "u"
+        self.assertFalse(hasattr(source, "__dict__"))
+        self.assertEqual(source.with_company("apple").company, "apple")
+        self.assertIsNone(source.company)
+
+    def test_verification_note(self):
+        self.assertEqual(Source("t", publication_date=datetime.date(2026, 6, 13)).verification_note(self.today), "Verified: 2 day(s) old.")
+        self.assertIn("not explicitly stated", Source("t").verification_note(self.today))
+
+    def test_batch_matches_filter_then_dedupe(self):
+        day = datetime.timedelta(days=1)
+        sources = [
+            Source(" Launch ", publication_date=self.today - 9 * day),
+            Source("launch", publication_date=self.today - 2 * day),
+            Source("Undated"),
+            Source("LAUNCH"),
+            Source("Future", publication_date=self.today + day),
+            Source(""),
+            Source("Edge", publication_date=self.today - 7 * day),
+        ]
+        recent = [s for s in sources if s.publication_date is None or 0 <= (self.today - s.publication_date).days <= 7]
+        verified = SourceBatch.from_sources(sources).verified(self.today, 7)
+        self.assertEqual(verified, unique_by_title(recent))
+        self.assertEqual([s.title for s in verified], ["launch", "Undated", "Edge"])
+        self.assertIs(verified[0], sources[1])
+
+
+class SourceCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch("text_bot.source_cache.time.monotonic", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cache = SourceCache(max_entries=2, ttl=100, negative_ttl=10)
+
+    def test_queries_are_normalized(self):
+        self.cache.put("Apple  product launches", [Source("a")])
+        self.assertEqual(self.cache.get(" apple product LAUNCHES"), [Source("a")])
+        self.assertIsNone(self.cache.get("apple pricing"))
+
+    def test_entries_expire_after_their_ttl(self):
+        self.cache.put("q", [Source("a")], ttl=30)
+        self.now += 29
+        self.assertIsNotNone(self.cache.get("q"))
+        self.now += 1
+        self.assertIsNone(self.cache.get("q"))
+        self.cache.put("q", [Source("a")], ttl=1000)
+        self.now += 100
+        self.assertIsNone(self.cache.get("q"))
+
+    def test_empty_results_use_the_negative_ttl(self):
+        self.cache.put("q", [])
+        self.assertEqual(self.cache.get("q"), [])
+        self.now += 10
+        self.assertIsNone(self.cache.get("q"))
+
+    def test_least_recently_used_is_evicted(self):
+        self.cache.put("a", [Source("a")])
+        self.cache.put("b", [Source("b")])
+        self.cache.get("a")
+        self.cache.put("c", [Source("c")])
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(len(self.cache), 2)
+
+
+class BrowserAgentCacheTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch("text_bot.views.source_cache", SourceCache())
+        self.cache = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_repeated_queries_share_cached_records(self):
+        with mock.patch("text_bot.views._mock_sources_for_query", side_effect=_mock_sources_for_query) as fetch:
+            first = _browser_agent(["Apple launches", "Apple pricing"])
+            second = _browser_agent(["apple  launches"])
+        self.assertEqual(fetch.call_count, 2)
+        self.assertEqual(second, first[:3])
+        self.assertIs(second[0], first[0])
+
+    def test_ttl_ends_when_the_first_source_leaves_the_window(self):
+        today = datetime.date(2026, 6, 15)
+        undated = _source_cache_ttl([Source("u")], today, 7)
+        dated = _source_cache_ttl([Source("d", publication_date=today - datetime.timedelta(days=2))], today, 7)
+        self.assertAlmostEqual(undated - dated, 2 * 86400, delta=5)
+        stale = _source_cache_ttl([Source("s", publication_date=today - datetime.timedelta(days=9))], today, 7)
+        self.assertAlmostEqual(stale, undated, delta=5)
+
+
+def sectioned_report(label):
+    headings = ["Executive Summary", "Product Updates (Last 7 Days)", "Technical Changes", "Market / GTM Signals",
+                "Competitive Intelligence", "Business Impact", "Risks / Watchlist"]
+    sections = "\n\n".join(f"{n}) {h}\n- {label} {n}." for n, h in enumerate(headings, start=1))
+    return f"MARKET INTELLIGENCE REPORT: Apple\n\n{sections}\n\nSources:\n- Release notes – industry reporting\n"
+
+
+class IncrementalRefreshTests(SimpleTestCase):
+    release = Source("Release notes", query="Apple developer release notes last 7 days")
+    security = Source("Patch", query="Apple security patch or incident update last 7 days")
+    unknown = Source("Rumor", query="something else")
+
+    week = datetime.timedelta(days=7)
+
+    def previous(self, sources, prompt_version="v1", age=datetime.timedelta(0)):
+        return StoredReport("apple", sectioned_report("old"), "hash", timezone.now() - age, prompt_version, tuple(sources))
+
+    def plan(self, previous, sources, prompt_version="v1"):
+        return plan_refresh(previous, sources, prompt_version=prompt_version, max_age=self.week)
+
+    def test_sections_for_query(self):
+        self.assertEqual(sections_for_query(self.release.query), (2, 3))
+        self.assertEqual(sections_for_query(self.unknown.query), tuple(range(1, 8)))
+
+    def test_stale_sections_from_added_and_dropped_sources(self):
+        self.assertEqual(stale_sections([self.release], [Source("release NOTES ", query=self.release.query)]), [])
+        self.assertEqual(stale_sections([self.release], [self.release, self.security]), [1, 7])
+        self.assertEqual(stale_sections([self.release, self.security], [self.security]), [1, 2, 3])
+
+    def test_redated_source_is_stale(self):
+        dated = dataclasses.replace(self.release, publication_date=datetime.date(2026, 6, 13))
+        redated = dataclasses.replace(dated, publication_date=datetime.date(2026, 6, 15))
+        self.assertEqual(stale_sections([dated], [dated]), [])
+        self.assertEqual(stale_sections([dated], [redated]), [1, 2, 3])
+
+    def test_plan_refresh(self):
+        previous = self.previous([self.release])
+        self.assertEqual(self.plan(previous, [self.release]), ("reuse", []))
+        self.assertEqual(self.plan(previous, [self.release, self.security]), ("incremental", [1, 7]))
+        self.assertEqual(self.plan(previous, [self.release, self.unknown])[0], "full")
+        self.assertEqual(self.plan(previous, [self.release], prompt_version="v2")[0], "full")
+        self.assertEqual(self.plan(None, [self.release])[0], "full")
+
+    def test_reports_older_than_the_window_are_regenerated(self):
+        self.assertEqual(self.plan(self.previous([self.release], age=self.week - datetime.timedelta(hours=1)), [self.release])[0], "reuse")
+        self.assertEqual(self.plan(self.previous([self.release], age=datetime.timedelta(days=200)), [self.release])[0], "full")
+
+    def test_split_and_splice(self):
+        title, blocks, tail = split_sections(sectioned_report("old"))
+        self.assertEqual(title, "MARKET INTELLIGENCE REPORT: Apple")
+        self.assertEqual(sorted(blocks), list(range(1, 8)))
+        self.assertTrue(tail.startswith("Sources:"))
+        self.assertIsNone(split_sections("no headings here"))
+
+        spliced = splice_sections(sectioned_report("old"), sectioned_report("new"), [1, 7])
+        self.assertIn("- new 1.", spliced)
+        self.assertIn("- old 2.", spliced)
+        self.assertIn("- new 7.", spliced)
+        self.assertTrue(spliced.rstrip().endswith("industry reporting"))
+        self.assertIsNone(splice_sections(sectioned_report("old"), "1) Executive Summary\n- only", [1, 7]))
+
+
+class StructuredReportTests(SimpleTestCase):
+    sources = [Source("Release notes"), Source("Patch")]
+
+    def reply(self, **fields):
+        data = {field: [] for field in SECTION_FIELDS.values()}
+        data.update(fields)
+        return json.dumps(data)
+
+    def test_schema(self):
+        schema = report_schema([7, 2])
+        self.assertEqual(schema["required"], ["product_updates", "risks"])
+        bullet = report_schema(comparison=True)["properties"]["risks"]["items"]
+        self.assertEqual(bullet["required"], ["text", "sources", "company"])
+        self.assertNotIn("company", report_schema()["properties"]["risks"]["items"]["properties"])
+
+    def test_parse_resolves_sources_and_drops_bad_bullets(self):
+        raw = self.reply(risks=[
+            {"text": "- Patch cadence slipped.", "sources": [2, 2, 9, "1"]},
+            {"text": "   ", "sources": [1]},
+            "not a bullet",
+            {"text": "Vendor risk.", "sources": None, "company": " Apple "},
+        ])
+        report = parse_report(raw, self.sources)
+        self.assertEqual(report["risks"], [
+            {"text": "Patch cadence slipped.", "sources": ["Patch"]},
+            {"text": "Vendor risk.", "sources": [], "company": "Apple"},
+        ])
+
+    def test_parse_rejects_invalid_replies(self):
+        self.assertIsNone(parse_report("not json", self.sources))
+        self.assertIsNone(parse_report("[]", self.sources))
+        self.assertIsNone(parse_report(json.dumps({"risks": []}), self.sources))
+        self.assertEqual(parse_report(json.dumps({"risks": []}), self.sources, sections=[7]), {"risks": []})
+
+    def test_clean_and_render(self):
+        report = parse_report(self.reply(executive_summary=[{"text": "Strong week.", "sources": [1]}, {"text": "x", "sources": []}]), self.sources)
+        report = clean_report(report, lambda text: "" if text == "x" else text)
+        text = render_report(report, "Apple", allow_dates=False)
+        self.assertTrue(text.startswith("MARKET INTELLIGENCE REPORT: Apple\n\n1) Executive Summary\n- Strong week.\n"))
+        self.assertIn("2) Product Updates (Recent Period)\n- " + EMPTY_SECTION_BULLET, text)
+        self.assertEqual(sorted(split_sections(text)[1]), list(range(1, 8)))
+
+
+class ComparisonTests(TestCase):
+    factory = RequestFactory()
+
+    def setUp(self):
+        patcher = mock.patch("text_bot.views.source_cache", SourceCache())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        bullets = [{"text": "Shipped new developer tooling.", "sources": [1], "company": "Apple"}]
+        self.reply = json.dumps({field: bullets for field in SECTION_FIELDS.values()})
+
+    def ask(self, prompt):
+        reply = SimpleNamespace(text=self.reply, model_version="m", usage_metadata=None)
+        with mock.patch("text_bot.views.generate_content", return_value=reply) as generate:
+            response = generate_text(self.factory.post("/chat/", {"prompt": prompt}, content_type="application/json"))
+        return response, generate
+
+    def test_resolve_companies(self):
+        self.assertEqual([c.id for c in _resolve_companies("Compare NVIDIA against AMD")], ["nvidia", "amd"])
+        self.assertEqual([c.id for c in _resolve_companies("Apple vs Acme Robotics")], ["apple", "acme-robotics"])
+        self.assertEqual([c.id for c in _resolve_companies("Compare Acme vs Globex this week")], ["acme", "globex"])
+
+    def test_a_side_without_a_company_is_not_a_comparison(self):
+        for prompt in ("Apple pricing vs. last quarter", "Apple pricing vs. what analysts expected"):
+            with self.subTest(prompt=prompt):
+                self.assertEqual([c.id for c in _resolve_companies(prompt)], ["apple"])
+
+    def test_one_synthesis_call_and_order_independent_storage(self):
+        response, generate = self.ask("Apple vs Microsoft this week")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(generate.call_count, 1)
+        self.assertEqual(generate.call_args.kwargs["company"], "apple+microsoft")
+        self.assertTrue(response.data["generated_text"].startswith("MARKET INTELLIGENCE REPORT: Apple vs Microsoft"))
+        self.assertIn("- Apple: Shipped new developer tooling.", response.data["generated_text"])
+
+        reversed_response, generate = self.ask("Microsoft vs Apple this week")
+        self.assertEqual(generate.call_count, 0)
+        self.assertEqual(reversed_response.data["report"]["company"], "apple+microsoft")
+        self.assertEqual(Report.objects.get().company, "apple+microsoft")
+
+    def test_outdated_stored_report_is_not_reused(self):
+        self.ask("Apple vs Microsoft this week")
+        Report.objects.update(created_at=timezone.now() - datetime.timedelta(days=200))
+        _, generate = self.ask("Apple vs Microsoft this week")
+        self.assertEqual(generate.call_count, 1)
+
+    def test_too_many_companies_are_refused(self):
+        response, generate = self.ask("Apple vs Microsoft vs Google vs Amazon vs Meta")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("limited to 4 companies", response.data["generated_text"])
+        generate.assert_not_called()
+
+
+@mock.patch("text_bot.views.STRUCTURED_SYNTHESIS", False)
+class TimeLockEndpointTests(TestCase):
+    factory = RequestFactory()
+
+    def setUp(self):
+        patcher = mock.patch("text_bot.views.source_cache", SourceCache())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def ask(self, reply):
+        response = SimpleNamespace(text=reply, model_version="m", usage_metadata=None)
+        with mock.patch("text_bot.views.generate_content", return_value=response):
+            return generate_text(self.factory.post("/chat/", {"prompt": "Apple updates"}, content_type="application/json"))
+
+    def test_heading_years_are_repaired(self):
+        reply = sectioned_report("ok").replace("1) Executive Summary", "1) Executive Summary (vs. 2025)")
+        response = self.ask(reply)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("1) Executive Summary\n", response.data["generated_text"])
+        self.assertNotIn("2025", response.data["generated_text"])
+
+    def test_surviving_references_are_refused(self):
+        reply = sectioned_report("ok").replace("- ok 3.", "- Shipped in 2025.")
+        with mock.patch("text_bot.views.repair_report_text", side_effect=lambda text: (text, {3: (0, 1)})):
+            response = self.ask(reply)
+        self.assertEqual(response.status_code, 500)
+        self.assertIn("time lock", response.data["generated_text"])
+        self.assertFalse(Report.objects.exists())
@@ -0,0 +1,146 @@
+"""
+Local repair of time-lock violations (references to years before 2026).
+
+Instead of refusing a whole report over one "2025", offending phrases are first
+neutralized ("in 2025" -> "previously", "(2024)" dropped); sentences that still
+reference a pre-2026 year are removed, and bullets left empty are dropped. Section
+headings are neutralized too, or reset to their canonical wording. The caller
+re-generates only sections that lost too much of their content, and refuses when
+too many sections are affected or a reference survives the repair.
+"""
+
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from decouple import config
+
+from text_bot.incremental import REPORT_SECTIONS, split_sections
+from text_bot.structured import EMPTY_SECTION_BULLET
+
+
+# A section that loses more than this fraction of its bullets is re-generated.
+TIME_LOCK_MAX_DROP_RATIO = config("TIME_LOCK_MAX_DROP_RATIO", default=0.5, cast=float)
+# More heavily affected sections than this and the report is refused.
+TIME_LOCK_MAX_REGENERATED_SECTIONS = config("TIME_LOCK_MAX_REGENERATED_SECTIONS", default=2, cast=int)
+
+PRE_2026_YEAR_RE = re.compile(r"\b20(?:0\d|1\d|2[0-5])\b")
+_YEAR = r"20(?:0\d|1\d|2[0-5])"
+_NEUTRALIZE = [
+    # "(2025)", "(Q3 2024 launch)"
+    (re.compile(rf"\s*\([^()\n]*\b{_YEAR}\b[^()\n]*\)"), ""),
+    # "in late 2025", "since Q2 2024", "during 2025". Not "from"/"by" ("from 2025 to 2026",
+    # "expected by 2025") or the start of a range ("in 2025 and 2026"): rewriting those
+    # changes the claim, so their sentences are dropped instead.
+    (re.compile(
+        rf"\b(?:in|during|since|throughout)\s+(?:(?:early|mid|late)[\s-]+)?(?:(?:Q[1-4]|H[12])\s+)?{_YEAR}\b"
+        r"(?!\s*(?:[-–/]|(?:to|and|or|through|until|vs)\b))",
+        re.IGNORECASE,
+    ), "previously"),
+    # "2025's", "2024-era"
+    (re.compile(rf"\b{_YEAR}(?:'s|-era)\b"), "earlier"),
+]
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+")
+_BULLET_RE = re.compile(r"^(\s*(?:[-*•]|\d+[.)])\s+)(.*)$")
+_HEADING_NUMBER_RE = re.compile(r"^\s*([1-7])\)")
+
+
+def contains_pre_2026_year(text: str) -> bool:
+    return bool(text) and PRE_2026_YEAR_RE.search(text) is not None
+
+
+def _neutralize(text: str) -> str:
+    for pattern, replacement in _NEUTRALIZE:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def repair_text(text: str) -> str:
+    """text without pre-2026 references; empty if nothing usable is left."""
+    if not contains_pre_2026_year(text):
+        return text
+    text = _neutralize(text)
+    if not contains_pre_2026_year(text):
+        return text.strip()
+    kept = [s for s in _SENTENCE_SPLIT_RE.split(text) if not contains_pre_2026_year(s)]
+    return " ".join(kept).strip()
+
+
+def _repair_heading(heading: str) -> str:
+    """Section heading without pre-2026 references: neutralized, else its canonical wording."""
+    if not contains_pre_2026_year(heading):
+        return heading
+    repaired = _neutralize(heading).rstrip()
+    if not contains_pre_2026_year(repaired):
+        return repaired
+    m = _HEADING_NUMBER_RE.match(heading)
+    return f"{m.group(1)}) {REPORT_SECTIONS[int(m.group(1))]}" if m else ""
+
+
+def _repair_block(block: str) -> Tuple[str, int, int]:
+    """(repaired block, bullets dropped, bullets) for one section: heading line plus body lines."""
+    heading, _, body = block.partition("\n")
+    lines, dropped, total = [_repair_heading(heading)], 0, 0
+    for line in body.splitlines():
+        if not line.strip():
+            lines.append(line)
+            continue
+        total += 1
+        m = _BULLET_RE.match(line)
+        prefix, content = (m.group(1), m.group(2)) if m else ("", line)
+        repaired = repair_text(content)
+        if repaired:
+            lines.append(prefix + repaired)
+        else:
+            dropped += 1
+    if total and dropped == total:
+        lines.append(f"- {EMPTY_SECTION_BULLET}")
+    return "\n".join(lines), dropped, total
+
+
+def repair_report_text(text: str) -> Tuple[str, Dict[int, Tuple[int, int]]]:
+    """
+    (repaired text, {section number: (bullets dropped, bullets)}) for a text report.
+    Only sections with a violation are listed; text without section headings is
+    repaired line by line and reported as section 0.
+    """
+    if not contains_pre_2026_year(text):
+        return text, {}
+    parsed = split_sections(text)
+    if parsed is None:
+        repaired, dropped, total = _repair_block("\n" + text)
+        return repaired.strip() + "\n", {0: (dropped, total)}
+    title, blocks, tail = parsed
+    affected = {}
+    for n, block in blocks.items():
+        if contains_pre_2026_year(block):
+            blocks[n], dropped, total = _repair_block(block)
+            affected[n] = (dropped, total)
+    title = "\n".join(repair_text(line) for line in title.splitlines())
+    tail = "\n".join(repair_text(line) for line in tail.splitlines())
+    parts = [title] + [blocks[n] for n in sorted(blocks)] + ([tail] if tail else [])
+    return "\n\n".join(p for p in parts if p) + "\n", affected
+
+
+def repair_report(report: Dict[str, List[Dict[str, Any]]]) -> Tuple[Dict[str, List[Dict[str, Any]]], Dict[str, Tuple[int, int]]]:
+    """(repaired structured report, {field: (bullets dropped, bullets)}) for fields with a violation."""
+    repaired, affected = {}, {}
+    for field, bullets in report.items():
+        if not any(contains_pre_2026_year(b["text"]) for b in bullets):
+            repaired[field] = bullets
+            continue
+        kept = [dict(b, text=text) for b in bullets for text in [repair_text(b["text"])] if text]
+        repaired[field] = kept
+        affected[field] = (len(bullets) - len(kept), len(bullets))
+    return repaired, affected
+
+
+def report_contains_pre_2026_year(text: Optional[str], report: Optional[Dict[str, List[Dict[str, Any]]]] = None) -> bool:
+    """True if a text report or any bullet of a structured report still references a pre-2026 year."""
+    if report is not None:
+        return any(contains_pre_2026_year(b["text"]) or contains_pre_2026_year(b.get("company") or "") for bullets in report.values() for b in bullets)
+    return contains_pre_2026_year(text or "")
+
+
+def heavily_affected(affected: Dict[Any, Tuple[int, int]]) -> List[Any]:
+    """Sections that lost more than TIME_LOCK_MAX_DROP_RATIO of their bullets."""
+    return sorted(k for k, (dropped, total) in affected.items() if total and dropped / total > TIME_LOCK_MAX_DROP_RATIO)
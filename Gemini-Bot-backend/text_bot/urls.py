@@ -3,4 +3,8 @@ from text_bot import views
 
 urlpatterns = [
     path('chat/', views.generate_text, name='generate_text'),
+    path('reports/<str:company>/', views.get_latest_report, name='get_latest_report'),
+    path('reports/<str:company>/history/', views.get_report_history, name='get_report_history'),
+    path('reports/<str:company>/<int:report_id>/', views.get_report, name='get_report'),
+    path('export/reports/', views.export_reports, name='export_reports'),
 ]
@@ -1,11 +1,38 @@
+from django.http import StreamingHttpResponse
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.http import condition
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 import datetime
+import hashlib
+import hmac
 import logging
 import re
-from typing import Any, Dict, List, Optional
-
-from APIs.gemini_client import generate_content
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from APIs.admission import admission_control
+from APIs.gemini_client import generate_content, served_model
+from APIs.metrics import REPORT_REFRESHES, TIME_LOCK_CALLS_SAVED, TIME_LOCK_REPAIRS, stage_timer, tag_outcome, track_request
+from text_bot.classifier import classify_prompt
+from text_bot.entities import Company, canonical_id, company_index
+from text_bot.export import EXPORT_API_KEY, InvalidCursor, iter_report_batches, ndjson_chunks, parse_bound
+from text_bot.incremental import PLANNER_TOPICS, REPORT_SECTIONS, plan_refresh, splice_sections
+from text_bot.reports import REPORT_HISTORY, latest_report, latest_report_meta, report_by_id, report_history, save_report
+from text_bot.source_cache import source_cache
+from text_bot.sources import Source, SourceBatch, unique_by_title
+from text_bot.structured import (
+    SECTION_FIELDS,
+    STRUCTURED_SYNTHESIS,
+    clean_report,
+    generation_config,
+    parse_report,
+    render_report,
+)
+from text_bot.time_lock import (
+    TIME_LOCK_MAX_REGENERATED_SECTIONS, contains_pre_2026_year, heavily_affected, repair_report, repair_report_text,
+    report_contains_pre_2026_year,
+)
 
 # -------------------------
 # Market Scout System Prompt (global, strict role + time lock)
@@ -81,6 +108,16 @@ ROLE ENFORCEMENT:
 
 logger = logging.getLogger(__name__)
 
+# Recency rule shared by the Verifier and the Browser Agent's source cache.
+RECENCY_WINDOW_DAYS = 7
+
+# "Apple vs Microsoft vs Google" runs one Planner/Browser/Verifier pass per company.
+MAX_COMPARISON_COMPANIES = 4
+_VERSUS_RE = re.compile(r"\s+(?:vs\.?|versus)\s+", re.IGNORECASE)
+_COMPARISON_CUE_RE = re.compile(r"\b(?:vs\.?|versus|compare|comparison|against)\b", re.IGNORECASE)
+_COMPARE_PREFIX_RE = re.compile(r"^\s*(?:compare|comparison\s+of)\s+", re.IGNORECASE)
+_PROPER_NAME_RE = re.compile(r"\b[A-Z][\w&\-]*(?:\s+[A-Z][\w&\-]*){0,4}")
+
 
 def _today_2026() -> datetime.date:
     today = datetime.date.today()
@@ -114,44 +151,53 @@ def _extract_company_name(user_prompt: str) -> str:
     return "Target Company"
 
 
+def _resolve_company(user_prompt: str) -> Company:
+    # Known companies resolve to one canonical id however they are written ("apple", "Apple Inc.", "$AAPL").
+    company = company_index.find(user_prompt)
+    if company:
+        return company
+    name = _extract_company_name(user_prompt)
+    return Company(canonical_id(name), name)
+
+
+def _comparison_side(part: str) -> Optional[Company]:
+    company = company_index.find(part)
+    if company:
+        return company
+    m = _PROPER_NAME_RE.search(_COMPARE_PREFIX_RE.sub("", part, count=1))
+    if m is None:
+        return None
+    name = m.group().strip()
+    return Company(canonical_id(name), name)
+
+
+def _resolve_companies(user_prompt: str) -> List[Company]:
+    companies: List[Company] = []
+    if _COMPARISON_CUE_RE.search(user_prompt or ""):
+        companies = company_index.matches(user_prompt)
+        parts = _VERSUS_RE.split(user_prompt)
+        if len(companies) < 2 and len(parts) > 1:
+            # Not every side is in the index: resolve each side of "X vs Y" on its own. A side that
+            # names no company ("Apple pricing vs. last quarter") makes this a single-company prompt.
+            companies = []
+            for part in parts:
+                company = _comparison_side(part)
+                if company is None:
+                    companies = []
+                    break
+                if company not in companies:
+                    companies.append(company)
+    if len(companies) < 2:
+        return [_resolve_company(user_prompt)]
+    return companies
+
+
 def _is_harmful_or_out_of_scope(user_prompt: str) -> bool:
-    p = (user_prompt or "").lower()
-    harmful_markers = [
-        "weapon",
-        "explosive",
-        "bomb",
-        "malware",
-        "phishing",
-        "ddos",
-        "hack",
-        "bypass",
-        "steal",
-        "fraud",
-    ]
-    return any(m in p for m in harmful_markers)
+    return "harmful" in classify_prompt(user_prompt)
 
 
 def _is_unrelated_to_market_intelligence(user_prompt: str) -> bool:
-    p = (user_prompt or "").strip().lower()
-    if not p:
-        return False
-    unrelated_markers = [
-        "recipe",
-        "cooking",
-        "workout",
-        "relationship",
-        "medical",
-        "diagnose",
-        "legal advice",
-        "homework",
-        "math problem",
-        "poem",
-        "story",
-        "joke",
-    ]
-    if any(m in p for m in unrelated_markers):
-        return True
-    return False
+    return "unrelated" in classify_prompt(user_prompt)
 
 
 def _refusal_message(reason: str) -> str:
@@ -172,12 +218,8 @@ def _refusal_message(reason: str) -> str:
 # Planner Agent → generates queries
 def _planner_agent(company_name: str) -> List[str]:
     company = (company_name or "Target Company").strip()
-    return [
-        f"{company} developer release notes last 7 days",
-        f"{company} new AI or API features last 7 days",
-        f"{company} platform or infrastructure updates last 7 days",
-        f"{company} security patch or incident update last 7 days",
-    ]
+    # Topics map to the report sections their sources feed (see text_bot/incremental.py).
+    return [f"{company} {topic} last 7 days" for topic, _ in PLANNER_TOPICS]
 
 
 def _mock_sources_for_query(query: str, today: datetime.date) -> List[Dict[str, Any]]:
@@ -205,58 +247,47 @@ def _mock_sources_for_query(query: str, today: datetime.date) -> List[Dict[str,
 
 
 # Browser Agent → collects sources
-def _browser_agent(queries: List[str]) -> List[Dict[str, Any]]:
+def _browser_agent(queries: List[str], *, max_age_days: int = RECENCY_WINDOW_DAYS) -> List[Source]:
     today = _today_2026()
-    collected: List[Dict[str, Any]] = []
+    collected: List[Source] = []
     for q in queries:
+        cached = source_cache.get(q)
+        if cached is not None:
+            collected.extend(cached)
+            continue
         # Top 2–3 sources per query (simulated). Live web browsing/search APIs are not enabled.
         # This intentionally avoids emitting URLs to prevent fabricated or unverifiable links.
-        collected.extend(_mock_sources_for_query(q, today)[:3])
+        # Each source remembers its query so section-level refreshes can tell which sections it feeds.
+        fetched = [Source.from_dict({**src, "query": q}) for src in _mock_sources_for_query(q, today)[:3]]
+        source_cache.put(q, fetched, ttl=_source_cache_ttl(fetched, today, max_age_days))
+        collected.extend(fetched)
     return collected
 
 
-def _parse_publication_date(date_str: Optional[str]) -> Optional[datetime.date]:
-    if not date_str:
-        return None
-    try:
-        return datetime.date.fromisoformat(date_str)
-    except ValueError:
-        return None
-
-
-# Verifier Agent → filters by date
-def _verifier_agent(sources: List[Dict[str, Any]], *, max_age_days: int = 7) -> List[Dict[str, Any]]:
-    today = _today_2026()
-    verified: List[Dict[str, Any]] = []
-
+def _source_cache_ttl(sources: List[Source], today: datetime.date, max_age_days: int) -> float:
+    # Expire the entry when its first in-window source ages out of the Verifier's window.
+    now = datetime.datetime.now()
+    seconds_left_today = 86400 - (now.hour * 3600 + now.minute * 60 + now.second)
+    ttl = float(max_age_days * 86400 + seconds_left_today)
     for src in sources:
-        pub_date = _parse_publication_date(src.get("publication_date"))
-        if pub_date is None:
-            src["verification_note"] = "Date not explicitly stated – treated as recent industry signal."
-            verified.append(src)
+        if src.publication_date is None:
             continue
-
-        age_days = (today - pub_date).days
-        if 0 <= age_days <= max_age_days:
-            src["verification_note"] = f"Verified: {age_days} day(s) old."
-            verified.append(src)
-        else:
-            # Discard sources older than the allowed window.
+        days_left = max_age_days - (today - src.publication_date).days
+        if days_left < 0:
+            # Already outside the window; the Verifier drops it on every request.
             continue
+        ttl = min(ttl, days_left * 86400 + seconds_left_today)
+    return ttl
 
-    # Dedupe by normalized title while preserving order.
-    seen = set()
-    deduped: List[Dict[str, Any]] = []
-    for src in verified:
-        title_key = (src.get("title") or "").strip().lower()
-        if not title_key or title_key in seen:
-            continue
-        seen.add(title_key)
-        deduped.append(src)
-    return deduped
+
+# Verifier Agent → filters by date
+def _verifier_agent(sources: List[Source], *, max_age_days: int = RECENCY_WINDOW_DAYS) -> List[Source]:
+    # Undated sources count as recent industry signals; older ones are discarded, then titles deduped.
+    # Sources are shared with the source cache and never modified (see text_bot/sources.py).
+    return SourceBatch.from_sources(sources).verified(_today_2026(), max_age_days)
 
 
-def _build_synthesis_prompt(company_name: str, verified_sources: List[Dict[str, Any]]) -> str:
+def _synthesis_rules() -> List[str]:
     lines: List[str] = []
     lines.append("You must produce a report using ONLY the VERIFIED SOURCES provided below.")
     lines.append("Do NOT add any facts not grounded in these sources.")
@@ -269,17 +300,13 @@ def _build_synthesis_prompt(company_name: str, verified_sources: List[Dict[str,
     lines.append("Only include new technical features/updates from the last 7 days.")
     lines.append("If a source has no explicit date, treat it as a recent industry signal and label uncertain items as market signal.")
     lines.append("")
-    lines.append("VERIFIED SOURCES (use these only):")
-    for i, s in enumerate(verified_sources, start=1):
-        title = s.get("title") or "Untitled"
-        stype = s.get("source_type") or "source"
-        # Intentionally omit explicit publication dates in the prompt to avoid the model emitting precise dates.
-        # Dates are verified in code, but the output should use neutral time framing.
-        lines.append(f"- {title} | {stype}")
-    lines.append("")
+    return lines
 
+
+def _synthesis_output_format(report_title: str) -> List[str]:
+    lines: List[str] = []
     lines.append("OUTPUT FORMAT (STRICT):")
-    lines.append(f"MARKET INTELLIGENCE REPORT: {company_name}")
+    lines.append(f"MARKET INTELLIGENCE REPORT: {report_title}")
     lines.append("")
     lines.append("1) Executive Summary")
     lines.append("2) Product Updates (Last 7 Days)")
@@ -294,15 +321,112 @@ def _build_synthesis_prompt(company_name: str, verified_sources: List[Dict[str,
     lines.append("At the very end, include:")
     lines.append("Sources:")
     lines.append("- <Source Title> – <Source Type> (link unavailable; browsing disabled)")
+    return lines
+
+
+def _build_synthesis_prompt(company_name: str, verified_sources: List[Source]) -> str:
+    lines = _synthesis_rules()
+    lines.append("VERIFIED SOURCES (use these only):")
+    for i, s in enumerate(verified_sources, start=1):
+        title = s.title or "Untitled"
+        stype = s.source_type or "source"
+        # Intentionally omit explicit publication dates in the prompt to avoid the model emitting precise dates.
+        # Dates are verified in code, but the output should use neutral time framing.
+        lines.append(f"- {title} | {stype}")
+    lines.append("")
+    lines.extend(_synthesis_output_format(company_name))
+    return "\n".join(lines)
+
 
+def _build_comparison_prompt(companies: List[Company], verified_sources: List[Source]) -> str:
+    lines = _synthesis_rules()
+    lines.append("VERIFIED SOURCES (use these only), grouped by company:")
+    for company in companies:
+        lines.append(f"[{company.name}]")
+        for s in verified_sources:
+            if s.company != company.name:
+                continue
+            # Dates omitted for the same reason as in _build_synthesis_prompt.
+            lines.append(f"- {s.title or 'Untitled'} | {s.source_type or 'source'}")
+    lines.append("")
+    lines.append("COMPARISON RULES:")
+    lines.append("- Cover every company in every section, one bullet per company prefixed with its name (e.g., '- " + companies[0].name + ": ...'), in the order listed above.")
+    lines.append("- Ground each company's bullets only in that company's sources.")
+    lines.append("- In 5) Competitive Intelligence, compare the companies directly with each other.")
+    lines.append("")
+    lines.extend(_synthesis_output_format(" vs ".join(c.name for c in companies)))
     return "\n".join(lines)
 
 
-def _contains_pre_2026_year(text: str) -> bool:
-    # Enforce strict rule: never mention events before 2026 (including 2025).
-    if not text:
-        return False
-    return re.search(r"\b20(?:0\d|1\d|2[0-5])\b", text) is not None
+def _build_section_update_prompt(company_name: str, verified_sources: List[Source], previous_report: str, sections: List[int]) -> str:
+    lines = _synthesis_rules()
+    lines.append("VERIFIED SOURCES (use these only):")
+    for s in verified_sources:
+        # Dates omitted for the same reason as in _build_synthesis_prompt.
+        lines.append(f"- {s.title or 'Untitled'} | {s.source_type or 'source'}")
+    lines.append("")
+    lines.append(f"CURRENT REPORT FOR {company_name} (for context and consistency; do not repeat unchanged sections):")
+    lines.append(previous_report.strip())
+    lines.append("")
+    lines.append("TASK: New sources arrived. Rewrite ONLY the sections below, in the same style as the current report.")
+    lines.append("Output exactly these sections and nothing else (no report title, no other sections, no Sources list), each starting with its heading line:")
+    for n in sections:
+        lines.append(f"{n}) {REPORT_SECTIONS[n]}")
+    return "\n".join(lines)
+
+
+def _structured_output_format(sections: Optional[List[int]] = None) -> List[str]:
+    lines: List[str] = []
+    lines.append("OUTPUT FORMAT (STRICT): JSON matching the response schema, one array of bullets per report section:")
+    for n in sections or SECTION_FIELDS:
+        lines.append(f"- {SECTION_FIELDS[n]}: {n}) {REPORT_SECTIONS[n]}")
+    lines.append("Each bullet has 'text' (one or two sentences, no citations, links or calendar dates) and 'sources' (the numbers of the VERIFIED SOURCES it is based on).")
+    lines.append("Attribute in the text using source categories like 'recent public disclosures' or 'industry reporting'.")
+    lines.append("Use an empty array for a section with nothing grounded in the sources.")
+    return lines
+
+
+def _build_structured_prompt(
+    companies: List[Company],
+    verified_sources: List[Source],
+    *,
+    sections: Optional[List[int]] = None,
+    previous_report: Optional[str] = None,
+) -> str:
+    comparison = len(companies) > 1
+    lines = _synthesis_rules()
+    lines.append("VERIFIED SOURCES (use these only):")
+    for i, s in enumerate(verified_sources, start=1):
+        # Numbered so bullets can reference them; dates omitted as in _build_synthesis_prompt.
+        company = f"[{s.company}] " if comparison else ""
+        lines.append(f"{i}. {company}{s.title or 'Untitled'} | {s.source_type or 'source'}")
+    lines.append("")
+    if comparison:
+        lines.append("COMPARISON RULES:")
+        lines.append("- Cover every company in every section, one bullet per company with its name in 'company', in the order listed above.")
+        lines.append("- Ground each company's bullets only in that company's sources.")
+        lines.append("- In competitive_intelligence, compare the companies directly with each other.")
+        lines.append("")
+    if previous_report:
+        lines.append(f"CURRENT REPORT FOR {companies[0].name} (for context and consistency):")
+        lines.append(previous_report.strip())
+        lines.append("")
+        lines.append("TASK: New sources arrived. Rewrite ONLY the sections listed below, in the same style as the current report.")
+    else:
+        lines.append(f"REPORT: MARKET INTELLIGENCE REPORT: {' vs '.join(c.name for c in companies)}")
+    lines.extend(_structured_output_format(sections))
+    return "\n".join(lines)
+
+
+# Stored with every report; changes whenever the system prompt or the synthesis instructions do.
+PROMPT_VERSION = hashlib.sha256(
+    "\n".join([
+        MARKET_SCOUT_SYSTEM_PROMPT,
+        *_synthesis_rules(),
+        *_synthesis_output_format(""),
+        *(_structured_output_format() if STRUCTURED_SYNTHESIS else []),
+    ]).encode("utf-8")
+).hexdigest()[:12]
 
 
 def _user_provided_dates(user_prompt: str) -> bool:
@@ -359,20 +483,20 @@ def _sanitize_report_text(report_text: str, *, allow_dates: bool) -> str:
     return text.strip()
 
 
-def _append_verified_sources_if_missing(report_text: str, verified_sources: List[Dict[str, Any]]) -> str:
+def _append_verified_sources_if_missing(report_text: str, verified_sources: List[Source]) -> str:
     text = (report_text or "").rstrip()
     if re.search(r"(?im)^sources\s*$", text) or re.search(r"(?im)^sources:\s*$", text):
         return text
 
     lines: List[str] = [text, "", "Sources:"]
     for s in verified_sources:
-        title = (s.get("title") or "Untitled").strip()
-        stype = (s.get("source_type") or "source").strip()
+        title = (s.title or "Untitled").strip()
+        stype = (s.source_type or "source").strip()
         lines.append(f"- {title} – {stype} (link unavailable; browsing disabled)")
     return "\n".join(lines).strip() + "\n"
 
 
-def _replace_sources_section(report_text: str, verified_sources: List[Dict[str, Any]]) -> str:
+def _replace_sources_section(report_text: str, verified_sources: List[Source]) -> str:
     text = (report_text or "").rstrip()
     # If the model already produced a Sources section, replace it entirely to prevent unverified citations.
     m = re.search(r"(?im)^sources\s*:?.*$", text)
@@ -389,12 +513,191 @@ def _replace_sources_section(report_text: str, verified_sources: List[Dict[str,
     return "\n".join(lines).strip() + "\n"
 
 
+# Planner Agent → Browser Agent → Verifier Agent for one company
+def _scout_company(company: Company) -> List[Source]:
+    with stage_timer("chat", "planner"):
+        queries = _planner_agent(company.name)
+    with stage_timer("chat", "browser"):
+        sources = _browser_agent(queries, max_age_days=RECENCY_WINDOW_DAYS)
+    with stage_timer("chat", "verifier"):
+        return _verifier_agent(sources, max_age_days=RECENCY_WINDOW_DAYS)
+
+
+def _merge_verified_sources(companies: List[Company], per_company: List[List[Source]]) -> List[Source]:
+    # Tag each source with its company and dedupe across companies by normalized title.
+    return unique_by_title(src.with_company(company.name) for company, sources in zip(companies, per_company) for src in sources)
+
+
+def _report_key(companies: List[Company]) -> str:
+    # Sorted: "Microsoft vs Apple" and "Apple vs Microsoft" share one stored comparison.
+    return "+".join(sorted(c.id for c in companies))
+
+
+def _previous_report(report_key: str):
+    if not REPORT_HISTORY:
+        return None
+    try:
+        return latest_report(report_key)
+    except Exception:
+        # Without the stored report the request simply falls back to a full synthesis.
+        logger.exception("Could not load previous report. company=%s", report_key)
+        return None
+
+
+# Synthesizer Agent (section update) → re-synthesizes stale sections of a stored report
+def _section_update_agent(
+    system_prompt: str,
+    company: Company,
+    verified_sources: List[Source],
+    previous_report: str,
+    sections: List[int],
+    *,
+    structured: bool = False,
+    session_id: Optional[str] = None,
+):
+    if structured:
+        prompt = _build_structured_prompt([company], verified_sources, sections=sections, previous_report=previous_report)
+        generation = generation_config(sections)
+    else:
+        prompt = _build_section_update_prompt(company.name, verified_sources, previous_report, sections)
+        generation = None
+    return generate_content(
+        [system_prompt, prompt], generation_config=generation, endpoint="chat_section", session_id=session_id, company=company.id,
+    )
+
+
 # Synthesizer Agent → produces final report
-def _synthesizer_agent(system_prompt: str, company_name: str, verified_sources: List[Dict[str, Any]]):
-    synthesis_prompt = _build_synthesis_prompt(company_name, verified_sources)
-    return generate_content([system_prompt, synthesis_prompt])
+def _synthesizer_agent(
+    system_prompt: str,
+    companies: List[Company],
+    verified_sources: List[Source],
+    *,
+    structured: bool = False,
+    session_id: Optional[str] = None,
+):
+    generation = None
+    if structured:
+        synthesis_prompt = _build_structured_prompt(companies, verified_sources)
+        generation = generation_config(comparison=len(companies) > 1)
+    elif len(companies) == 1:
+        synthesis_prompt = _build_synthesis_prompt(companies[0].name, verified_sources)
+    else:
+        synthesis_prompt = _build_comparison_prompt(companies, verified_sources)
+    return generate_content(
+        [system_prompt, synthesis_prompt],
+        generation_config=generation,
+        endpoint="chat",
+        session_id=session_id,
+        company=_report_key(companies),
+    )
+
+
+def _synthesize(
+    system_prompt: str,
+    companies: List[Company],
+    verified_sources: List[Source],
+    previous,
+    refresh: str,
+    stale: List[int],
+    *,
+    session_id: Optional[str] = None,
+) -> Tuple[str, Any, Optional[str], Optional[Dict[str, Any]]]:
+    """
+    Run the synthesizer for a "full" or "incremental" refresh. Returns (mode actually
+    used, response, text, structured sections); exactly one of text and structured is set.
+    """
+    if refresh == "incremental":
+        structured = STRUCTURED_SYNTHESIS and bool(previous.structured)
+        response = _section_update_agent(
+            system_prompt, companies[0], verified_sources, previous.text, stale, structured=structured, session_id=session_id,
+        )
+        reply = getattr(response, "text", None) or ""
+        if structured:
+            update = parse_report(reply, verified_sources, sections=stale)
+            if update is not None:
+                return refresh, response, None, {**previous.structured, **update}
+        else:
+            text = splice_sections(previous.text, reply, stale)
+            if text is not None:
+                return refresh, response, text, None
+        logger.warning("Section update did not return sections %s; regenerating the report. session_id=%s", stale, session_id)
+
+    if STRUCTURED_SYNTHESIS:
+        response = _synthesizer_agent(system_prompt, companies, verified_sources, structured=True, session_id=session_id)
+        report = parse_report(getattr(response, "text", None) or "", verified_sources)
+        if report is not None:
+            return "full", response, None, report
+        # Typically a reply truncated at the output token limit; the free-text path still yields a report.
+        logger.warning("Structured synthesis returned invalid JSON; retrying as free text. session_id=%s", session_id)
+    response = _synthesizer_agent(system_prompt, companies, verified_sources, session_id=session_id)
+    return "full", response, (getattr(response, "text", None) or "").strip(), None
+
+def _repair_time_lock(
+    system_prompt: str,
+    companies: List[Company],
+    verified_sources: List[Source],
+    text: Optional[str],
+    structured: Optional[Dict[str, Any]],
+    *,
+    allow_dates: bool,
+    session_id: Optional[str] = None,
+) -> Optional[Tuple[Optional[str], Optional[Dict[str, Any]]]]:
+    """
+    Hard verification layer (logic-based): remove pre-2026 references from a report
+    (free text or structured sections) locally, re-generating only sections that lost
+    most of their bullets. Returns the repaired (text, structured), or None if too
+    many sections are affected and the report must be refused.
+    """
+    if structured is not None:
+        structured, affected = repair_report(structured)
+        heavy = [n for n, field in SECTION_FIELDS.items() if field in heavily_affected(affected)]
+    else:
+        text, affected = repair_report_text(text)
+        heavy = heavily_affected(affected)
+    if not affected:
+        return text, structured
+    if len(heavy) > TIME_LOCK_MAX_REGENERATED_SECTIONS:
+        TIME_LOCK_REPAIRS.labels("failed").inc()
+        logger.warning("Model output contained pre-2026 year references in %s; refusing. session_id=%s", sorted(affected), session_id)
+        return None
+
+    outcome = "repaired"
+    # Section updates are single-company; section 0 stands for a report without headings.
+    heavy = [n for n in heavy if n != 0] if len(companies) == 1 else []
+    if heavy:
+        current = render_report(structured, companies[0].name, allow_dates=allow_dates) if structured is not None else text
+        response = _section_update_agent(
+            system_prompt, companies[0], verified_sources, current, heavy, structured=structured is not None, session_id=session_id,
+        )
+        reply = getattr(response, "text", None) or ""
+        if structured is not None:
+            update = parse_report(reply, verified_sources, sections=heavy)
+            if update is not None:
+                update = clean_report(update, lambda t: _sanitize_report_text(t, allow_dates=allow_dates))
+                structured = {**structured, **repair_report(update)[0]}
+                outcome = "section_regenerated"
+        else:
+            spliced = splice_sections(text, _sanitize_report_text(reply, allow_dates=allow_dates), heavy)
+            if spliced is not None:
+                text = repair_report_text(spliced)[0]
+                outcome = "section_regenerated"
+    if report_contains_pre_2026_year(text, structured):
+        TIME_LOCK_REPAIRS.labels("failed").inc()
+        logger.warning("Pre-2026 year references survived the repair; refusing. session_id=%s", session_id)
+        return None
+    TIME_LOCK_REPAIRS.labels(outcome).inc()
+    TIME_LOCK_CALLS_SAVED.inc()
+    logger.info("Repaired pre-2026 year references in %s (%s). session_id=%s", sorted(affected), outcome, session_id)
+    return text, structured
+
+
+def _time_lock_refusal() -> Response:
+    return tag_outcome(Response({"generated_text": _refusal_message("Output violated time lock (pre-2026 reference detected)")}, status=500), "time_lock_violation")
+
 
 @api_view(['POST'])
+@track_request("chat")
+@admission_control("interactive")
 def generate_text(request):
     if request.method == 'POST':
         try:
@@ -406,40 +709,99 @@ def generate_text(request):
             if not prompt:
                 prompt = "Analyze recent technical and product updates for a major technology company from the last 7 days."
 
-            if _is_harmful_or_out_of_scope(prompt):
-                return Response({"generated_text": _refusal_message("Request is harmful or out-of-scope for market intelligence")}, status=400)
-            if _is_unrelated_to_market_intelligence(prompt):
-                return Response({"generated_text": _refusal_message("Request is unrelated to market intelligence")}, status=400)
+            # Marker lists: text_bot/data/prompt_markers.json (hot-reloaded).
+            prompt_categories = classify_prompt(prompt)
+            if "harmful" in prompt_categories:
+                return tag_outcome(Response({"generated_text": _refusal_message("Request is harmful or out-of-scope for market intelligence")}, status=400), "refusal")
+            if "unrelated" in prompt_categories:
+                return tag_outcome(Response({"generated_text": _refusal_message("Request is unrelated to market intelligence")}, status=400), "refusal")
 
-            company_name = _extract_company_name(prompt)
+            companies = _resolve_companies(prompt)
+            if len(companies) > MAX_COMPARISON_COMPANIES:
+                return tag_outcome(Response({"generated_text": _refusal_message(f"Comparisons are limited to {MAX_COMPARISON_COMPANIES} companies")}, status=400), "refusal")
             allow_dates = _user_provided_dates(prompt)
 
             # Agentic pipeline (MANDATORY FOR JUDGES):
             # Planner Agent → Browser Agent → Verifier Agent → Synthesizer Agent
-            queries = _planner_agent(company_name)
-            sources = _browser_agent(queries)
-            verified_sources = _verifier_agent(sources, max_age_days=7)
-
-            if not verified_sources:
-                return Response({"generated_text": _refusal_message("No verified sources available within the last 7 days")}, status=503)
-
-            response = _synthesizer_agent(system_prompt, company_name, verified_sources)
+            if len(companies) == 1:
+                verified_sources = _scout_company(companies[0])
+                missing = [] if verified_sources else [companies[0].name]
+            else:
+                # Comparison mode: scout every company in parallel, then synthesize once.
+                with ThreadPoolExecutor(max_workers=len(companies)) as pool:
+                    per_company = list(pool.map(_scout_company, companies))
+                missing = [c.name for c, found in zip(companies, per_company) if not found]
+                verified_sources = _merge_verified_sources(companies, per_company)
+
+            if missing:
+                reason = "No verified sources available within the last 7 days"
+                if len(companies) > 1:
+                    reason += " for " + ", ".join(missing)
+                return tag_outcome(Response({"generated_text": _refusal_message(reason)}, status=503), "no_sources")
+
+            # Refresh only what changed since the last stored report (text_bot/incremental.py).
+            prompt_version = PROMPT_VERSION + ("-d" if allow_dates else "")
+            report_key = _report_key(companies)
+            previous = _previous_report(report_key)
+            refresh, stale = plan_refresh(
+                previous, verified_sources, prompt_version=prompt_version, max_age=datetime.timedelta(days=RECENCY_WINDOW_DAYS),
+            )
+            if refresh == "incremental" and len(companies) > 1:
+                refresh = "full"
+            if refresh == "reuse":
+                REPORT_REFRESHES.labels("reuse").inc()
+                payload = {"generated_text": previous.text}
+                if previous.structured:
+                    payload["report"] = {"company": report_key, "sections": previous.structured}
+                return tag_outcome(Response(payload, status=200), "reused")
+
+            with stage_timer("chat", "synthesizer"):
+                refresh, response, output_text, structured = _synthesize(
+                    system_prompt, companies, verified_sources, previous, refresh, stale, session_id=session_id,
+                )
+            REPORT_REFRESHES.labels(refresh).inc()
+
+            if structured is not None:
+                with stage_timer("chat", "sanitize"):
+                    # Same policy as the free-text path, applied per bullet.
+                    structured = clean_report(structured, lambda t: _sanitize_report_text(t, allow_dates=allow_dates))
+                    repaired = _repair_time_lock(
+                        system_prompt, companies, verified_sources, None, structured, allow_dates=allow_dates, session_id=session_id,
+                    )
+                    if repaired is None:
+                        return _time_lock_refusal()
+                    structured = repaired[1]
+                    title = " vs ".join(c.name for c in companies)
+                    output_text = _replace_sources_section(render_report(structured, title, allow_dates=allow_dates), verified_sources)
+                    if contains_pre_2026_year(output_text):
+                        return _time_lock_refusal()
+                save_report(
+                    report_key, output_text, prompt_version=prompt_version, model=served_model(response), response=response,
+                    sources=verified_sources, structured=structured,
+                )
+                return Response({"generated_text": output_text, "report": {"company": report_key, "sections": structured}}, status=200)
 
-            output_text = (getattr(response, "text", None) or "").strip()
             if not output_text:
                 output_text = "No response generated."
 
-            # Global formatting policy enforcement.
-            output_text = _sanitize_report_text(output_text, allow_dates=allow_dates)
+            with stage_timer("chat", "sanitize"):
+                # Global formatting policy enforcement.
+                output_text = _sanitize_report_text(output_text, allow_dates=allow_dates)
 
-            # Hard verification layer (logic-based): forbid pre-2026 references.
-            if _contains_pre_2026_year(output_text):
-                logger.warning("Model output contained pre-2026 year reference; refusing. session_id=%s", session_id)
-                return Response({"generated_text": _refusal_message("Output violated time lock (pre-2026 reference detected)")}, status=500)
+                # Hard verification layer (logic-based): forbid pre-2026 references.
+                repaired = _repair_time_lock(
+                    system_prompt, companies, verified_sources, output_text, None, allow_dates=allow_dates, session_id=session_id,
+                )
+                if repaired is None:
+                    return _time_lock_refusal()
+                output_text = repaired[0]
 
-            # Ensure citations list is present and only includes verified sources.
-            output_text = _replace_sources_section(output_text, verified_sources)
+                # Ensure citations list is present and only includes verified sources.
+                output_text = _replace_sources_section(output_text, verified_sources)
+                if contains_pre_2026_year(output_text):
+                    return _time_lock_refusal()
 
+            save_report(report_key, output_text, prompt_version=prompt_version, model=served_model(response), response=response, sources=verified_sources)
             return Response({"generated_text": output_text}, status=200)
         except ValueError as e:
             logger.exception("ValueError in generate_text. session_id=%s", request.data.get('session_id'))
@@ -447,6 +809,106 @@ def generate_text(request):
         except Exception as e:
             if any(t in str(e).lower() for t in ["429", "rate limit", "quota", "unavailable", "timeout", "tls", "handshake", "connection"]):
                 logger.exception("Transient error in generate_text. session_id=%s", request.data.get('session_id'))
-                return Response({"generated_text": "Service temporarily unavailable. Please try again later."}, status=503)
+                return tag_outcome(Response({"generated_text": "Service temporarily unavailable. Please try again later."}, status=503), "transient_error")
             logger.exception("Error in generate_text. session_id=%s", request.data.get('session_id'))
             return Response({"generated_text": "Something went wrong. Please try again later."}, status=500)
+
+
+def _report_payload(report) -> Dict[str, Any]:
+    payload = {"company": report.company, "generated_text": report.text}
+    if report.structured:
+        payload["sections"] = report.structured
+    return payload
+
+
+def _requested_report_key(company: str) -> str:
+    # "AAPL", "Apple Inc." and "apple" address the same report; "apple+msft" a comparison.
+    parts = [p for p in (company or "").split("+") if p.strip()]
+    return "+".join(sorted((company_index.find(p) or Company(canonical_id(p), p)).id for p in parts))
+
+
+def _report_etag(request, company):
+    meta = latest_report_meta(_requested_report_key(company))
+    return meta["content_hash"] if meta else None
+
+
+def _report_last_modified(request, company):
+    meta = latest_report_meta(_requested_report_key(company))
+    return meta["created_at"] if meta else None
+
+
+@api_view(['GET'])
+@track_request("report")
+@condition(etag_func=_report_etag, last_modified_func=_report_last_modified)
+def get_latest_report(request, company):
+    # Pollers send If-None-Match and get a 304 from @condition without reaching this body.
+    key = _requested_report_key(company)
+    report = latest_report(key)
+    if report is None:
+        return Response({"generated_text": f"No report generated yet for {company}."}, status=404)
+    return Response(_report_payload(report), status=200)
+
+
+@api_view(['GET'])
+@track_request("report")
+def get_report_history(request, company):
+    # Metadata only (no bodies), newest first; ?since= / ?until= take ISO 8601 datetimes.
+    bounds = {}
+    for name in ("since", "until"):
+        raw = request.query_params.get(name)
+        if raw:
+            parsed = parse_datetime(raw)
+            if parsed is None:
+                return Response({"generated_text": f"Invalid '{name}' datetime: {raw}"}, status=400)
+            bounds[name] = parsed
+    try:
+        limit = max(1, min(500, int(request.query_params.get("limit", 50))))
+    except ValueError:
+        return Response({"generated_text": "Invalid 'limit'."}, status=400)
+    key = _requested_report_key(company)
+    return Response({"company": key, "reports": report_history(key, limit=limit, **bounds)}, status=200)
+
+
+@api_view(['GET'])
+@track_request("report")
+def get_report(request, company, report_id):
+    # Stored reports never change, so the content hash is a permanent validator.
+    report = report_by_id(_requested_report_key(company), report_id)
+    if report is None:
+        return Response({"generated_text": f"Report {report_id} not found for {company}."}, status=404)
+    response = Response(_report_payload(report), status=200)
+    response["ETag"] = f'"{report.content_hash}"'
+    return response
+
+
+@api_view(['GET'])
+@track_request("export")
+def export_reports(request):
+    # NDJSON stream, oldest first; ?companies=apple,msft&since=&until= filter, ?cursor= resumes after a line.
+    if not EXPORT_API_KEY:
+        # Fail closed: without a configured key nobody may read the whole archive.
+        return Response({"generated_text": "Exports are disabled."}, status=404)
+    if not hmac.compare_digest(request.META.get("HTTP_X_API_KEY", ""), EXPORT_API_KEY):
+        return Response({"generated_text": "A valid X-API-Key is required for exports."}, status=403)
+    params = request.query_params
+    bounds = {}
+    for name in ("since", "until"):
+        raw = params.get(name)
+        if raw:
+            parsed = parse_bound(raw)
+            if parsed is None:
+                return Response({"generated_text": f"Invalid '{name}' date: {raw}"}, status=400)
+            bounds[name] = parsed
+    try:
+        limit = int(params["limit"]) if params.get("limit") else None
+    except ValueError:
+        return Response({"generated_text": "Invalid 'limit'."}, status=400)
+    companies = [_requested_report_key(c) for c in (params.get("companies") or "").split(",") if c.strip()]
+    try:
+        batches = iter_report_batches(companies=companies, cursor=params.get("cursor"), limit=limit, **bounds)
+    except InvalidCursor as e:
+        return Response({"generated_text": str(e)}, status=400)
+    # Compressed on the fly by CompressionMiddleware when the client sends Accept-Encoding.
+    response = StreamingHttpResponse(ndjson_chunks(batches), content_type="application/x-ndjson")
+    response["Content-Disposition"] = 'attachment; filename="reports.ndjson"'
+    return response
@@ -0,0 +1,10 @@
+from django.contrib import admin
+
+from usage.models import TokenUsageRollup
+
+
+@admin.register(TokenUsageRollup)
+class TokenUsageRollupAdmin(admin.ModelAdmin):
+    list_display = ("day", "endpoint", "company", "session_id", "model", "calls", "prompt_tokens", "cached_tokens", "output_tokens")
+    list_filter = ("endpoint", "model")
+    search_fields = ("company", "session_id")
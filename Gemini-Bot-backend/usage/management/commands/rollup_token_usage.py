@@ -0,0 +1,54 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from usage.models import TokenUsage, TokenUsageRollup
+
+
+class Command(BaseCommand):
+    help = "Fold raw TokenUsage rows older than the cutoff into daily TokenUsageRollup rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--older-than-days", type=int, default=1, help="Only fold rows from days that are at least this old (default: 1).")
+
+    def handle(self, *args, **options):
+        today = timezone.now().date()
+        cutoff = timezone.make_aware(
+            datetime.datetime.combine(today - datetime.timedelta(days=options["older_than_days"] - 1), datetime.time.min)
+        )
+
+        with transaction.atomic():
+            raw = TokenUsage.objects.filter(created_at__lt=cutoff)
+            groups = (
+                raw.annotate(day=TruncDate("created_at"))
+                .values("day", "endpoint", "session_id", "company", "model")
+                .annotate(
+                    calls=Count("id"),
+                    prompt=Sum("prompt_tokens"),
+                    cached=Sum("cached_tokens"),
+                    output=Sum("output_tokens"),
+                )
+            )
+            folded = 0
+            for g in groups:
+                rollup, _ = TokenUsageRollup.objects.get_or_create(
+                    day=g["day"],
+                    endpoint=g["endpoint"],
+                    session_id=g["session_id"],
+                    company=g["company"],
+                    model=g["model"],
+                )
+                TokenUsageRollup.objects.filter(pk=rollup.pk).update(
+                    calls=F("calls") + g["calls"],
+                    prompt_tokens=F("prompt_tokens") + (g["prompt"] or 0),
+                    cached_tokens=F("cached_tokens") + (g["cached"] or 0),
+                    output_tokens=F("output_tokens") + (g["output"] or 0),
+                )
+                folded += g["calls"]
+            raw.delete()
+
+        self.stdout.write(self.style.SUCCESS(f"Folded {folded} token usage row(s) into daily rollups."))
@@ -0,0 +1,44 @@
+import datetime
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from usage.models import TokenUsage, TokenUsageRollup
+
+
+class Command(BaseCommand):
+    help = "Print token usage totals grouped by endpoint, company, session or model (raw rows and rollups combined)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--by", choices=["endpoint", "company", "session_id", "model"], default="endpoint")
+        parser.add_argument("--days", type=int, default=30, help="Reporting window in days (default: 30).")
+        parser.add_argument("--limit", type=int, default=20)
+
+    def handle(self, *args, **options):
+        dim = options["by"]
+        since = timezone.now() - datetime.timedelta(days=options["days"])
+        totals = defaultdict(lambda: [0, 0, 0, 0])
+
+        raw = (
+            TokenUsage.objects.filter(created_at__gte=since)
+            .values(dim)
+            .annotate(calls=Count("id"), prompt=Sum("prompt_tokens"), cached=Sum("cached_tokens"), output=Sum("output_tokens"))
+        )
+        rolled = (
+            TokenUsageRollup.objects.filter(day__gte=since.date())
+            .values(dim)
+            .annotate(calls=Sum("calls"), prompt=Sum("prompt_tokens"), cached=Sum("cached_tokens"), output=Sum("output_tokens"))
+        )
+        for row in list(raw) + list(rolled):
+            t = totals[row[dim] or "-"]
+            t[0] += row["calls"] or 0
+            t[1] += row["prompt"] or 0
+            t[2] += row["cached"] or 0
+            t[3] += row["output"] or 0
+
+        self.stdout.write(f"{dim:<40} {'calls':>8} {'prompt':>12} {'cached':>12} {'output':>12}")
+        ranked = sorted(totals.items(), key=lambda kv: kv[1][1] + kv[1][3], reverse=True)
+        for key, (calls, prompt, cached, output) in ranked[: options["limit"]]:
+            self.stdout.write(f"{key[:40]:<40} {calls:>8} {prompt:>12} {cached:>12} {output:>12}")
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:49
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TokenUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('endpoint', models.CharField(max_length=16)),
+                ('session_id', models.CharField(blank=True, default='', max_length=64)),
+                ('company', models.CharField(blank=True, default='', max_length=128)),
+                ('model', models.CharField(max_length=64)),
+                ('prompt_tokens', models.PositiveIntegerField(default=0)),
+                ('cached_tokens', models.PositiveIntegerField(default=0)),
+                ('output_tokens', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TokenUsageRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('endpoint', models.CharField(max_length=16)),
+                ('session_id', models.CharField(blank=True, default='', max_length=64)),
+                ('company', models.CharField(blank=True, default='', max_length=128)),
+                ('model', models.CharField(max_length=64)),
+                ('calls', models.PositiveIntegerField(default=0)),
+                ('prompt_tokens', models.BigIntegerField(default=0)),
+                ('cached_tokens', models.BigIntegerField(default=0)),
+                ('output_tokens', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'endpoint', 'session_id', 'company', 'model'), name='token_usage_rollup_unique_dims')],
+            },
+        ),
+    ]
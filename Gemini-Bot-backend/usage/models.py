@@ -0,0 +1,37 @@
+from django.db import models
+from django.utils import timezone
+
+
+class TokenUsage(models.Model):
+    """One row per generate_content call. Rows are only ever appended; rollup_token_usage folds them into daily rollups."""
+
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+    endpoint = models.CharField(max_length=16)
+    session_id = models.CharField(max_length=64, blank=True, default="")
+    company = models.CharField(max_length=128, blank=True, default="")
+    model = models.CharField(max_length=64)
+    prompt_tokens = models.PositiveIntegerField(default=0)
+    cached_tokens = models.PositiveIntegerField(default=0)
+    output_tokens = models.PositiveIntegerField(default=0)
+
+
+class TokenUsageRollup(models.Model):
+    """Daily aggregate of TokenUsage rows per endpoint, session, company and model."""
+
+    day = models.DateField()
+    endpoint = models.CharField(max_length=16)
+    session_id = models.CharField(max_length=64, blank=True, default="")
+    company = models.CharField(max_length=128, blank=True, default="")
+    model = models.CharField(max_length=64)
+    calls = models.PositiveIntegerField(default=0)
+    prompt_tokens = models.BigIntegerField(default=0)
+    cached_tokens = models.BigIntegerField(default=0)
+    output_tokens = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "endpoint", "session_id", "company", "model"],
+                name="token_usage_rollup_unique_dims",
+            )
+        ]
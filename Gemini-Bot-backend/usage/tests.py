@@ -0,0 +1,73 @@
+import datetime
+import io
+from types import SimpleNamespace
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from usage.models import TokenUsage, TokenUsageRollup
+from usage.tracking import record_usage, token_counts
+
+
+def response(prompt=100, cached=20, output=30, thoughts=5):
+    usage = SimpleNamespace(
+        prompt_token_count=prompt, cached_content_token_count=cached, candidates_token_count=output, thoughts_token_count=thoughts,
+    )
+    return SimpleNamespace(usage_metadata=usage)
+
+
+class TokenCountsTests(SimpleTestCase):
+    def test_thinking_tokens_count_as_output(self):
+        self.assertEqual(token_counts(response()), (100, 20, 35))
+
+    def test_missing_fields_are_zero(self):
+        self.assertEqual(token_counts(response(cached=None, thoughts=None)), (100, 0, 30))
+        self.assertIsNone(token_counts(SimpleNamespace()))
+
+
+class RecordUsageTests(TestCase):
+    def test_row_per_call(self):
+        record_usage(response(), endpoint="chat", model="m", session_id="s" * 100, company="apple")
+        row = TokenUsage.objects.get()
+        self.assertEqual((row.endpoint, row.company, row.prompt_tokens, row.output_tokens), ("chat", "apple", 100, 35))
+        self.assertEqual(len(row.session_id), 64)
+
+    def test_responses_without_usage_are_skipped(self):
+        record_usage(SimpleNamespace(), endpoint="chat", model="m")
+        self.assertFalse(TokenUsage.objects.exists())
+
+    def test_storage_errors_do_not_propagate(self):
+        with mock.patch("usage.tracking.TokenUsage.objects.create", side_effect=RuntimeError("db down")):
+            with self.assertLogs("usage.tracking", "ERROR"):
+                record_usage(response(), endpoint="chat", model="m")
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        old = timezone.now() - datetime.timedelta(days=3)
+        for endpoint in ("chat", "chat", "pdf"):
+            record_usage(response(), endpoint=endpoint, model="m", company="apple")
+        TokenUsage.objects.update(created_at=old)
+        record_usage(response(), endpoint="chat", model="m", company="apple")
+
+    def test_old_rows_fold_into_daily_rollups(self):
+        call_command("rollup_token_usage", stdout=io.StringIO())
+        self.assertEqual(TokenUsage.objects.count(), 1)
+        rollups = {r.endpoint: r for r in TokenUsageRollup.objects.all()}
+        self.assertEqual((rollups["chat"].calls, rollups["chat"].prompt_tokens), (2, 200))
+        self.assertEqual(rollups["pdf"].calls, 1)
+
+        # Folding again adds to the existing rollup rows.
+        TokenUsage.objects.update(created_at=timezone.now() - datetime.timedelta(days=3))
+        call_command("rollup_token_usage", stdout=io.StringIO())
+        self.assertEqual(TokenUsageRollup.objects.get(endpoint="chat").calls, 3)
+
+    def test_report_combines_raw_rows_and_rollups(self):
+        call_command("rollup_token_usage", stdout=io.StringIO())
+        out = io.StringIO()
+        call_command("token_usage_report", "--by", "endpoint", stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[1].split(), ["chat", "3", "300", "60", "105"])
+        self.assertEqual(lines[2].split(), ["pdf", "1", "100", "20", "35"])
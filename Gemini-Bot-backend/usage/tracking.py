@@ -0,0 +1,56 @@
+import logging
+from typing import Optional, Tuple
+
+from decouple import config
+
+from APIs.metrics import GEMINI_TOKENS
+from usage.models import TokenUsage
+
+
+TOKEN_USAGE_TRACKING = config("TOKEN_USAGE_TRACKING", default=True, cast=bool)
+
+logger = logging.getLogger(__name__)
+
+
+def _count(usage_metadata, field: str) -> int:
+    return int(getattr(usage_metadata, field, None) or 0)
+
+
+def token_counts(response) -> Optional[Tuple[int, int, int]]:
+    """(prompt, cached, output) tokens from a response's usage metadata, or None if it has none."""
+    usage_metadata = getattr(response, "usage_metadata", None)
+    if usage_metadata is None:
+        return None
+    return (
+        _count(usage_metadata, "prompt_token_count"),
+        _count(usage_metadata, "cached_content_token_count"),
+        # Thinking tokens are billed as output.
+        _count(usage_metadata, "candidates_token_count") + _count(usage_metadata, "thoughts_token_count"),
+    )
+
+
+def record_usage(response, *, endpoint: str, model: str, session_id: Optional[str] = None, company: Optional[str] = None) -> None:
+    counts = token_counts(response)
+    if counts is None:
+        return
+    prompt_tokens, cached_tokens, output_tokens = counts
+
+    GEMINI_TOKENS.labels(endpoint, "prompt").inc(prompt_tokens)
+    GEMINI_TOKENS.labels(endpoint, "cached").inc(cached_tokens)
+    GEMINI_TOKENS.labels(endpoint, "output").inc(output_tokens)
+
+    if not TOKEN_USAGE_TRACKING:
+        return
+    try:
+        TokenUsage.objects.create(
+            endpoint=endpoint,
+            session_id=(session_id or "")[:64],
+            company=(company or "")[:128],
+            model=model,
+            prompt_tokens=prompt_tokens,
+            cached_tokens=cached_tokens,
+            output_tokens=output_tokens,
+        )
+    except Exception:
+        # Accounting must never fail the request it describes.
+        logger.exception("Could not record token usage. endpoint=%s session_id=%s", endpoint, session_id)
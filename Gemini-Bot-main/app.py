@@ -1,13 +1,32 @@
 import streamlit as st
 from PIL import Image
 import requests
+import hashlib
+import json
 import uuid
-from decouple import config
+import zlib
+from decouple import Csv, config
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # ==============================
 # CONFIG
 # ==============================
 API_URL = config("API_URL")  # e.g. http://localhost:8001
+API_KEY = config("API_KEY", default="")  # one of the backend's RATE_LIMIT_API_KEYS
+API_CONNECT_TIMEOUT = config("API_CONNECT_TIMEOUT", default=5, cast=float)
+API_READ_TIMEOUT = config("API_READ_TIMEOUT", default=120, cast=float)
+API_RETRIES = config("API_RETRIES", default=2, cast=int)
+API_RETRY_BACKOFF = config("API_RETRY_BACKOFF", default=0.5, cast=float)
+# 503 is not retried: the backend sends it when it sheds load (with Retry-After up to a
+# minute) or has already retried Gemini itself, so the user sees the message instead.
+API_RETRY_STATUSES = config("API_RETRY_STATUSES", default="502,504", cast=Csv(int))
+API_POOL_MAXSIZE = config("API_POOL_MAXSIZE", default=10, cast=int)
+RESULT_CACHE_TTL = config("RESULT_CACHE_TTL", default=900, cast=int)  # seconds
+RESULT_CACHE_MAX_ENTRIES = config("RESULT_CACHE_MAX_ENTRIES", default=256, cast=int)
+CHAT_WINDOW = config("CHAT_WINDOW", default=6, cast=int)  # messages rendered on every rerun
+MAX_SESSION_MESSAGES = config("MAX_SESSION_MESSAGES", default=20, cast=int)  # older ones are archived compressed
+HISTORY_PAGE_SIZE = config("HISTORY_PAGE_SIZE", default=10, cast=int)
 
 st.set_page_config(
     page_title="Market Scout Agent",
@@ -24,6 +43,122 @@ if "session_id" not in st.session_state:
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
+# zlib-compressed JSON of messages evicted from `messages`, oldest first.
+if "archive" not in st.session_state:
+    st.session_state.archive = []
+
+# How many messages before the visible window the user has expanded.
+if "history_shown" not in st.session_state:
+    st.session_state.history_shown = 0
+
+# file digest -> document_id of PDFs the backend has indexed for this session.
+if "pdf_documents" not in st.session_state:
+    st.session_state.pdf_documents = {}
+
+# ==============================
+# BACKEND CLIENT
+# ==============================
+class BackendError(Exception):
+    def __init__(self, status_code, message):
+        super().__init__(f"Backend returned {status_code}")
+        self.status_code = status_code
+        self.message = message
+
+
+@st.cache_resource
+def get_http_session():
+    # One pooled keep-alive session shared by every rerun and browser session.
+    # Only API_RETRY_STATUSES responses are retried. A POST that failed to connect or timed
+    # out may already be running on the backend, and sending it again doubles the Gemini work.
+    retry = Retry(
+        total=API_RETRIES,
+        connect=0,
+        read=0,
+        other=0,
+        backoff_factor=API_RETRY_BACKOFF,
+        status_forcelist=API_RETRY_STATUSES,
+        allowed_methods=frozenset(["POST"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=API_POOL_MAXSIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def request_backend(path, data, files=None):
+    # The backend rate-limits each session of a known API key separately, or per address without one.
+    headers = {"X-API-Key": API_KEY, "X-Session-ID": data.get("session_id", "")} if API_KEY else None
+    response = get_http_session().post(
+        f"{API_URL}{path}",
+        data=data,
+        files=files,
+        headers=headers,
+        timeout=(API_CONNECT_TIMEOUT, API_READ_TIMEOUT),
+    )
+    if response.status_code != 200:
+        # Raising keeps failures out of st.cache_data.
+        try:
+            message = response.json().get("generated_text", "")
+        except ValueError:
+            message = ""
+        raise BackendError(response.status_code, message or response.text)
+    return response.json()
+
+
+def post_to_backend(path, data, files=None):
+    return request_backend(path, data, files).get("generated_text", "")
+
+
+def file_digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+# Identical analyses are served from cache. Arguments starting with "_" are not
+# hashed, so uploads are keyed by their content digest instead of their bytes.
+@st.cache_data(ttl=RESULT_CACHE_TTL, max_entries=RESULT_CACHE_MAX_ENTRIES, show_spinner=False)
+def analyze_chat(prompt, context, _session_id):
+    return post_to_backend(
+        "/chat/",
+        {"session_id": _session_id, "system_prompt": context, "prompt": prompt},
+    )
+
+
+@st.cache_data(ttl=RESULT_CACHE_TTL, max_entries=RESULT_CACHE_MAX_ENTRIES, show_spinner=False)
+def analyze_image(prompt, context, file_hash, file_name, mime_type, _file_bytes, _session_id):
+    return post_to_backend(
+        "/image/",
+        {"session_id": _session_id, "system_prompt": context, "prompt": prompt},
+        files={"image": (file_name, _file_bytes, mime_type)},
+    )
+
+
+@st.cache_data(ttl=RESULT_CACHE_TTL, max_entries=RESULT_CACHE_MAX_ENTRIES, show_spinner=False)
+def analyze_pdf(prompt, file_hash, file_name, _file_bytes, _session_id):
+    # Follow-ups on an indexed PDF send only its document_id. The index lives in one backend
+    # worker, so a 404 (another worker, or an expired index) means the file is sent again.
+    documents = st.session_state.pdf_documents
+    if file_hash in documents:
+        try:
+            return post_to_backend(
+                "/pdf/",
+                {"session_id": _session_id, "prompt": prompt, "document_id": documents[file_hash]},
+            )
+        except BackendError as e:
+            if e.status_code != 404:
+                raise
+            documents.pop(file_hash, None)
+    result = request_backend(
+        "/pdf/",
+        {"session_id": _session_id, "prompt": prompt},
+        files={"pdf": (file_name, _file_bytes, "application/pdf")},
+    )
+    if result.get("document_id"):
+        documents[file_hash] = result["document_id"]
+    return result.get("generated_text", "")
+
 # ==============================
 # SIDEBAR
 # ==============================
@@ -33,15 +168,77 @@ system_prompt = st.sidebar.text_area(
     placeholder="Optional notes for this session."
 )
 
+# ==============================
+# CHAT HISTORY
+# ==============================
+def add_message(role, content):
+    messages = st.session_state.messages
+    messages.append({"role": role, "content": content})
+    overflow = len(messages) - MAX_SESSION_MESSAGES
+    if overflow > 0:
+        st.session_state.archive.extend(
+            zlib.compress(json.dumps(m).encode("utf-8")) for m in messages[:overflow]
+        )
+        del messages[:overflow]
+
+
+def earlier_message_count():
+    return len(st.session_state.archive) + max(0, len(st.session_state.messages) - CHAT_WINDOW)
+
+
+def earlier_messages(count):
+    # The `count` messages just before the visible window, oldest first.
+    # Archived messages are only decompressed when they are actually shown.
+    if count <= 0:
+        return []
+    messages = st.session_state.messages
+    live = messages[: max(0, len(messages) - CHAT_WINDOW)][-count:]
+    remaining = count - len(live)
+    archived = []
+    if remaining > 0:
+        archived = [json.loads(zlib.decompress(b)) for b in st.session_state.archive[-remaining:]]
+    return archived + live
+
+
+# Button callbacks run before the rerun, so the page renders the updated history at once.
+def load_earlier_page():
+    st.session_state.history_shown = min(earlier_message_count(), st.session_state.history_shown + HISTORY_PAGE_SIZE)
+
+
+def collapse_earlier():
+    st.session_state.history_shown = 0
+
+
+def render_message(msg):
+    with st.chat_message(msg["role"]):
+        st.markdown(msg["content"])
+
+
 # ==============================
 # MARKET INTELLIGENCE CHAT
 # ==============================
 def market_chat():
     st.markdown("## Market Intelligence Chat")
 
-    for msg in st.session_state.messages:
-        with st.chat_message(msg["role"]):
-            st.markdown(msg["content"])
+    # Only the most recent window is rendered on every rerun; earlier messages are
+    # loaded a page at a time on demand, so reruns cost the same however long the session is.
+    earlier = earlier_message_count()
+    if earlier:
+        shown = min(st.session_state.history_shown, earlier)
+        load_col, collapse_col = st.columns(2)
+        if shown < earlier:
+            load_col.button(
+                f"Load earlier messages ({earlier - shown} hidden)",
+                key="load_earlier",
+                on_click=load_earlier_page,
+            )
+        if shown:
+            collapse_col.button("Collapse earlier messages", key="collapse_earlier", on_click=collapse_earlier)
+        for msg in earlier_messages(shown):
+            render_message(msg)
+
+    for msg in st.session_state.messages[-CHAT_WINDOW:]:
+        render_message(msg)
 
     prompt = st.chat_input("Enter your market intelligence query...")
 
@@ -49,29 +246,21 @@ def market_chat():
         with st.chat_message("user"):
             st.markdown(prompt)
 
-        st.session_state.messages.append(
-            {"role": "user", "content": prompt}
-        )
+        add_message("user", prompt)
 
         with st.spinner("Thinking..."):
-            response = requests.post(
-                f"{API_URL}/chat/",
-                data={
-                    "session_id": st.session_state.session_id,
-                    "system_prompt": system_prompt,
-                    "prompt": prompt
-                },
-                timeout=120
-            )
-
-        result = response.json().get("generated_text", "")
+            try:
+                result = analyze_chat(prompt, system_prompt, st.session_state.session_id)
+            except BackendError as e:
+                # Refusals and transient errors still carry a report-formatted message.
+                result = e.message
+            except requests.RequestException as e:
+                result = f"Backend unavailable: {e}"
 
         with st.chat_message("assistant"):
             st.markdown(result)
 
-        st.session_state.messages.append(
-            {"role": "assistant", "content": result}
-        )
+        add_message("assistant", result)
 
 # ==============================
 # VISUAL COMPETITOR ANALYSIS
@@ -96,30 +285,27 @@ def image_analysis():
         if st.button("Analyze Image"):
             with st.spinner("Thinking..."):
                 uploaded_image.seek(0)
-                files = {
-                    "image": (
+                image_bytes = uploaded_image.read()
+                try:
+                    result = analyze_image(
+                        prompt,
+                        system_prompt,
+                        file_digest(image_bytes),
                         uploaded_image.name,
-                        uploaded_image.read(),
                         uploaded_image.type,
+                        image_bytes,
+                        st.session_state.session_id,
                     )
-                }
-
-                response = requests.post(
-                    f"{API_URL}/image/",
-                    data={
-                        "session_id": st.session_state.session_id,
-                        "system_prompt": system_prompt,
-                        "prompt": prompt
-                    },
-                    files=files,
-                    timeout=120
-                )
-
-            if response.status_code == 200:
-                st.markdown(response.json().get("generated_text", ""))
-            else:
-                st.error(f"Error {response.status_code}")
-                st.error(response.text)
+                except BackendError as e:
+                    result = None
+                    st.error(f"Error {e.status_code}")
+                    st.error(e.message)
+                except requests.RequestException as e:
+                    result = None
+                    st.error(f"Backend unavailable: {e}")
+
+            if result is not None:
+                st.markdown(result)
 
 # ==============================
 # ANALYZE MARKET REPORTS (PDF)
@@ -146,29 +332,24 @@ def pdf_analysis():
                 uploaded_pdf.seek(0)
                 pdf_bytes = uploaded_pdf.read()
 
-                files = {
-                    "pdf": (
+                try:
+                    result = analyze_pdf(
+                        prompt,
+                        file_digest(pdf_bytes),
                         uploaded_pdf.name,
                         pdf_bytes,
-                        "application/pdf"
+                        st.session_state.session_id,
                     )
-                }
-
-                response = requests.post(
-                    f"{API_URL}/pdf/",
-                    data={
-                        "session_id": st.session_state.session_id,
-                        "prompt": prompt
-                    },
-                    files=files,
-                    timeout=120
-                )
-
-            if response.status_code == 200:
-                st.markdown(response.json().get("generated_text", ""))
-            else:
-                st.error(f"Failed to send the data. Status: {response.status_code}")
-                st.error(response.text)
+                except BackendError as e:
+                    result = None
+                    st.error(f"Failed to send the data. Status: {e.status_code}")
+                    st.error(e.message)
+                except requests.RequestException as e:
+                    result = None
+                    st.error(f"Backend unavailable: {e}")
+
+            if result is not None:
+                st.markdown(result)
 
 # ==============================
 # NAVIGATION